@@ -0,0 +1,51 @@
+from core.changes import record_changes
+from core.csv_import import CsvImporter
+from .models import Vendor, Customer, Broker
+
+
+class PartyImporter(CsvImporter):
+    """Create one party per row; every column maps straight onto a model field"""
+    model = None
+
+    def parse_row(self, values):
+        return values
+
+    def build(self, row):
+        party = self.model(**row)
+        party.full_clean(validate_unique=False, validate_constraints=False)
+        return party
+
+    def write_batch(self, parties):
+        self.model.objects.bulk_create(parties)
+        record_changes(self.model, [party.pk for party in parties])
+
+
+class VendorImporter(PartyImporter):
+    model = Vendor
+    models = (Vendor,)
+    columns = {
+        'name': ['name', 'supplier', 'vendor'],
+        'contact': ['contact', 'phone'],
+        'address': ['address', 'addr'],
+        'bank_details': ['bank_details', 'bank'],
+    }
+
+
+class CustomerImporter(PartyImporter):
+    model = Customer
+    models = (Customer,)
+    columns = {
+        'name': ['name', 'customer'],
+        'contact': ['contact', 'phone'],
+        'address': ['address', 'addr'],
+    }
+
+
+class BrokerImporter(PartyImporter):
+    model = Broker
+    models = (Broker,)
+    columns = {
+        'name': ['name', 'broker'],
+        'contact': ['contact', 'phone'],
+        'address': ['address', 'addr'],
+    }
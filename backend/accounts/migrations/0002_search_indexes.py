@@ -0,0 +1,17 @@
+from django.db import migrations
+from core.search import SearchIndexes
+
+
+class Migration(migrations.Migration):
+    # Indexes are built CONCURRENTLY, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        SearchIndexes('vendors', trigram=['name', 'contact']),
+        SearchIndexes('customers', trigram=['name', 'contact']),
+        SearchIndexes('brokers', trigram=['name', 'contact']),
+    ]
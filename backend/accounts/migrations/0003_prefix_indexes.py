@@ -0,0 +1,17 @@
+from django.db import migrations
+from core.search import SearchIndexes
+
+
+class Migration(migrations.Migration):
+    # Indexes are built CONCURRENTLY, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0002_search_indexes'),
+    ]
+
+    operations = [
+        SearchIndexes('vendors', prefix=['name']),
+        SearchIndexes('customers', prefix=['name']),
+        SearchIndexes('brokers', prefix=['name']),
+    ]
@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction as db_transaction
+from django.db.models import F, Sum
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
+from core.changes import record_changes
 
 
 class Vendor(models.Model):
@@ -25,13 +28,31 @@ class Vendor(models.Model):
     def __str__(self):
         return self.name
     
+    @classmethod
+    def apply_balance_delta(cls, pk, delta):
+        """Atomically shift the stored balance by ``delta`` without reading it"""
+        if pk is None or not delta:
+            return
+        cls.objects.filter(pk=pk).update(
+            balance=F('balance') + delta,
+            updated_at=timezone.now()
+        )
+        record_changes(cls, [pk])
+
     def update_balance(self):
-        """Update vendor balance from transactions"""
+        """Recalculate vendor balance from the full transaction history.
+
+        Balances are maintained incrementally by ``Transaction``; this is
+        the explicit repair path and should not be called while posting.
+        """
         from transactions.models import Transaction
-        transactions = Transaction.objects.filter(vendor=self)
-        balance = sum(t.get_signed_amount() for t in transactions)
-        self.balance = balance
-        self.save()
+        with db_transaction.atomic():
+            Vendor.objects.select_for_update().filter(pk=self.pk).first()
+            balance = Transaction.objects.filter(vendor=self).aggregate(
+                total=Sum(Transaction.signed_amount_expression())
+            )['total'] or Decimal('0')
+            self.balance = balance
+            self.save(update_fields=['balance', 'updated_at'])
 
 
 class Customer(models.Model):
@@ -55,13 +76,31 @@ class Customer(models.Model):
     def __str__(self):
         return self.name
     
+    @classmethod
+    def apply_balance_delta(cls, pk, delta):
+        """Atomically shift the stored balance by ``delta`` without reading it"""
+        if pk is None or not delta:
+            return
+        cls.objects.filter(pk=pk).update(
+            balance=F('balance') + delta,
+            updated_at=timezone.now()
+        )
+        record_changes(cls, [pk])
+
     def update_balance(self):
-        """Update customer balance from transactions"""
+        """Recalculate customer balance from the full transaction history.
+
+        Balances are maintained incrementally by ``Transaction``; this is
+        the explicit repair path and should not be called while posting.
+        """
         from transactions.models import Transaction
-        transactions = Transaction.objects.filter(customer=self)
-        balance = sum(t.get_signed_amount() for t in transactions)
-        self.balance = balance
-        self.save()
+        with db_transaction.atomic():
+            Customer.objects.select_for_update().filter(pk=self.pk).first()
+            balance = Transaction.objects.filter(customer=self).aggregate(
+                total=Sum(Transaction.signed_amount_expression())
+            )['total'] or Decimal('0')
+            self.balance = balance
+            self.save(update_fields=['balance', 'updated_at'])
 
 
 class Broker(models.Model):
@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from core.fieldsets import SparseFieldsetSerializer
 from .models import Vendor, Customer, Broker
 
 
-class VendorSerializer(serializers.ModelSerializer):
+class VendorSerializer(SparseFieldsetSerializer, serializers.ModelSerializer):
     """Serializer for Vendor model"""
     
     class Meta:
@@ -14,7 +15,7 @@ class VendorSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'balance', 'created_at', 'updated_at']
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(SparseFieldsetSerializer, serializers.ModelSerializer):
     """Serializer for Customer model"""
     
     class Meta:
@@ -26,7 +27,7 @@ class CustomerSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'balance', 'created_at', 'updated_at']
 
 
-class BrokerSerializer(serializers.ModelSerializer):
+class BrokerSerializer(SparseFieldsetSerializer, serializers.ModelSerializer):
     """Serializer for Broker model"""
 
     class Meta:
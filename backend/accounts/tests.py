@@ -0,0 +1,92 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from rest_framework.test import APITestCase
+from core.models import User
+from transactions.models import Bill, Invoice, PaymentRecord, Transaction
+from .models import Customer, Vendor
+
+
+class PaymentAllocationTests(APITestCase):
+    """One payment spread over a party's open documents, oldest due first"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('allocate', password='allocate'))
+        self.customer = Customer.objects.create(name='Customer', contact='c')
+        today = date.today()
+        # Created out of due-date order: FIFO must follow due_date, not pk
+        self.invoices = {
+            due: Invoice.objects.create(
+                invoice_number=f'INV-{due}', customer=self.customer, date=today - timedelta(days=30),
+                due_date=today - timedelta(days=due), total=Decimal('100')
+            )
+            for due in (5, 20, 10)
+        }
+        self.url = f'/api/customers/{self.customer.pk}/allocate_payment/'
+
+    def allocate(self, amount, **extra):
+        return self.client.post(self.url, {
+            'date': date.today().isoformat(), 'amount': amount, 'method': 'Bank', **extra,
+        }, format='json')
+
+    def invoice(self, due):
+        return Invoice.objects.get(pk=self.invoices[due].pk)
+
+    def test_fifo_by_due_date_with_partial_last_document(self):
+        response = self.allocate('150')
+        self.assertEqual(response.status_code, 200, response.data)
+
+        self.assertEqual(
+            [(payment['invoice'], Decimal(payment['amount'])) for payment in response.data['payments']],
+            [(self.invoices[20].pk, Decimal('100')), (self.invoices[10].pk, Decimal('50'))]
+        )
+        self.assertEqual(self.invoice(20).status, 'Paid')
+        self.assertEqual(self.invoice(10).status, 'Partially Paid')
+        self.assertEqual(self.invoice(10).amount_paid, Decimal('50'))
+        self.assertEqual(self.invoice(5).status, 'Pending')
+
+        transaction = Transaction.objects.get(customer=self.customer)
+        first = min(payment['id'] for payment in response.data['payments'])
+        self.assertEqual(transaction.reference_id, f'PAY-{first}')
+        self.assertEqual(transaction.amount, Decimal('150'))
+        self.assertEqual(Decimal(response.data['customer']['balance']), Decimal('-150'))
+
+    def test_amount_above_total_open_is_rejected(self):
+        response = self.allocate('300.01')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'].code, 'posting_error')
+        self.assertFalse(PaymentRecord.objects.exists())
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_explicit_split(self):
+        allocations = [
+            {'document': self.invoices[5].pk, 'amount': '30'},
+            {'document': self.invoices[10].pk, 'amount': '20'},
+        ]
+        response = self.allocate('50', allocations=allocations)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.invoice(5).amount_paid, Decimal('30'))
+        self.assertEqual(self.invoice(20).amount_paid, 0)
+        self.assertEqual(Transaction.objects.get().amount, Decimal('50'))
+
+        for amount, allocations in (
+            ('71', [{'document': self.invoices[5].pk, 'amount': '71'}]),
+            ('80', [{'document': self.invoices[5].pk, 'amount': '71'}, {'document': self.invoices[20].pk, 'amount': '9'}]),
+            ('40', [{'document': self.invoices[20].pk, 'amount': '30'}]),
+        ):
+            with self.subTest(allocations=allocations):
+                self.assertEqual(self.allocate(amount, allocations=allocations).status_code, 400)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_vendor_payment_spans_bills(self):
+        vendor = Vendor.objects.create(name='Vendor', contact='v')
+        for n in range(2):
+            Bill.objects.create(
+                bill_number=f'BILL-{n}', vendor=vendor, date=date.today(),
+                due_date=date.today() + timedelta(days=n), total=Decimal('40')
+            )
+        response = self.client.post(f'/api/vendors/{vendor.pk}/allocate_payment/', {
+            'date': date.today().isoformat(), 'amount': '80',
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertFalse(Bill.objects.exclude(status='Paid').exists())
+        self.assertEqual(Transaction.objects.get(vendor=vendor).amount, Decimal('80'))
@@ -4,19 +4,25 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
+from core.csv_import import CsvImportMixin
+from core.fieldsets import SparseFieldsetMixin
+from core.conditional import ConditionalGetMixin
+from core.search import RankedSearchFilter
+from .imports import VendorImporter, CustomerImporter, BrokerImporter
 from .models import Vendor, Customer, Broker
 from .serializers import VendorSerializer, CustomerSerializer, BrokerSerializer
 
 
-class VendorViewSet(viewsets.ModelViewSet):
+class VendorViewSet(CsvImportMixin, SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing vendors"""
     queryset = Vendor.objects.all()
     serializer_class = VendorSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, RankedSearchFilter]
     search_fields = ['name', 'contact']
     ordering_fields = ['name', 'balance', 'created_at']
     ordering = ['name']
+    csv_importer_class = VendorImporter
     
     @action(detail=True, methods=['get'])
     def transactions(self, request, pk=None):
@@ -25,10 +31,41 @@ class VendorViewSet(viewsets.ModelViewSet):
         from transactions.models import Transaction
         from transactions.serializers import TransactionSerializer
         
-        transactions = Transaction.objects.filter(vendor=vendor).order_by('-date')
+        transactions = Transaction.objects.filter(vendor=vendor).select_related('vendor', 'customer').order_by('-date')
         serializer = TransactionSerializer(transactions, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def ledger(self, request, pk=None):
+        """Paginated vendor statement with opening and running balances"""
+        vendor = self.get_object()
+        from transactions.ledger import party_ledger
+
+        return party_ledger(request, vendor=vendor)
+
+    @action(detail=True, methods=['post'])
+    def allocate_payment(self, request, pk=None):
+        """Apply one payment across open bills (FIFO by due date or explicit split)"""
+        vendor = self.get_object()
+        from transactions.serializers import PaymentAllocationSerializer, PaymentRecordSerializer
+        from transactions.services import allocate_vendor_payment
+
+        allocation_serializer = PaymentAllocationSerializer(data=request.data)
+        if allocation_serializer.is_valid():
+            payment_data = dict(allocation_serializer.validated_data)
+            allocations = [
+                (item['document'], item['amount'])
+                for item in payment_data.pop('allocations', [])
+            ]
+            payments = allocate_vendor_payment(vendor.pk, payment_data, allocations)
+            vendor.refresh_from_db()
+            return Response({
+                'vendor': self.get_serializer(vendor).data,
+                'payments': PaymentRecordSerializer(payments, many=True).data,
+            })
+
+        return Response(allocation_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
     @action(detail=True, methods=['post'])
     def update_balance(self, request, pk=None):
         """Manually recalculate vendor balance"""
@@ -38,15 +75,16 @@ class VendorViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(CsvImportMixin, SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing customers"""
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, RankedSearchFilter]
     search_fields = ['name', 'contact']
     ordering_fields = ['name', 'balance', 'created_at']
     ordering = ['name']
+    csv_importer_class = CustomerImporter
     
     @action(detail=True, methods=['get'])
     def transactions(self, request, pk=None):
@@ -55,10 +93,41 @@ class CustomerViewSet(viewsets.ModelViewSet):
         from transactions.models import Transaction
         from transactions.serializers import TransactionSerializer
         
-        transactions = Transaction.objects.filter(customer=customer).order_by('-date')
+        transactions = Transaction.objects.filter(customer=customer).select_related('vendor', 'customer').order_by('-date')
         serializer = TransactionSerializer(transactions, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def ledger(self, request, pk=None):
+        """Paginated customer statement with opening and running balances"""
+        customer = self.get_object()
+        from transactions.ledger import party_ledger
+
+        return party_ledger(request, customer=customer)
+
+    @action(detail=True, methods=['post'])
+    def allocate_payment(self, request, pk=None):
+        """Apply one payment across open invoices (FIFO by due date or explicit split)"""
+        customer = self.get_object()
+        from transactions.serializers import PaymentAllocationSerializer, PaymentRecordSerializer
+        from transactions.services import allocate_customer_payment
+
+        allocation_serializer = PaymentAllocationSerializer(data=request.data)
+        if allocation_serializer.is_valid():
+            payment_data = dict(allocation_serializer.validated_data)
+            allocations = [
+                (item['document'], item['amount'])
+                for item in payment_data.pop('allocations', [])
+            ]
+            payments = allocate_customer_payment(customer.pk, payment_data, allocations)
+            customer.refresh_from_db()
+            return Response({
+                'customer': self.get_serializer(customer).data,
+                'payments': PaymentRecordSerializer(payments, many=True).data,
+            })
+
+        return Response(allocation_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
     @action(detail=True, methods=['post'])
     def update_balance(self, request, pk=None):
         """Manually recalculate customer balance"""
@@ -68,12 +137,13 @@ class CustomerViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class BrokerViewSet(viewsets.ModelViewSet):
+class BrokerViewSet(CsvImportMixin, SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing brokers"""
     queryset = Broker.objects.all()
     serializer_class = BrokerSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, RankedSearchFilter]
     search_fields = ['name', 'contact']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
+    csv_importer_class = BrokerImporter
@@ -0,0 +1,155 @@
+from decimal import Decimal
+from django.db import models
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from inventory.models import InventoryItem, ItemMaster
+from transactions.models import BillItem, InvoiceItem
+
+# Groups served per request, however many pages; more are reported as truncated
+ANALYTICS_MAX_GROUPS = 5000
+
+PERIODS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+
+_money = models.DecimalField(max_digits=14, decimal_places=2)
+_ZERO = Value(Decimal('0'), output_field=_money)
+
+
+def _category(fabric_type_field):
+    """ItemMaster category of the row's fabric type, matched on the item name"""
+    return Subquery(
+        ItemMaster.objects.filter(name=OuterRef(fabric_type_field))
+        .order_by('code')
+        .values('category')[:1]
+    )
+
+
+def _share(line, document, figure):
+    """``figure`` of ``document`` allocated to a line by its share of the document total"""
+    return Case(
+        When(**{f'{document}__total__gt': 0},
+             then=line * F(f'{document}__{figure}') / F(f'{document}__total')),
+        default=_ZERO,
+        output_field=_money
+    )
+
+
+_line = F('meters') * F('price')
+_sales_paid = _share(_line, 'invoice', 'amount_paid')
+_purchases_paid = _share(_line, 'bill', 'amount_paid')
+
+# Source -> rows aggregated, their date, and the whitelisted dimensions and
+# measures. A dimension is ``(key, label)``: a field path or expression to
+# group and filter on, and the field reported next to it as ``<name>_name``.
+# Invoice and bill figures (paid, commission) are spread over their lines in
+# proportion to the line amounts, so they add up under any dimension.
+SOURCES = {
+    'sales': {
+        'model': InvoiceItem,
+        'date': 'invoice__date',
+        'dimensions': {
+            'customer': ('invoice__customer', 'invoice__customer__name'),
+            'broker': ('invoice__broker', 'invoice__broker__name'),
+            'vendor': ('inventory_item__vendor', 'inventory_item__vendor__name'),
+            'fabric_type': ('inventory_item__fabric_type', None),
+            'category': (_category('inventory_item__fabric_type'), None),
+        },
+        'measures': {
+            'meters': Sum('meters'),
+            'amount': Sum(_line, output_field=_money),
+            'paid': Sum(_sales_paid),
+            'outstanding': Sum(_line - _sales_paid, output_field=_money),
+            'commission': Sum(_share(_line, 'invoice', 'commission_amount')),
+        },
+    },
+    'purchases': {
+        'model': BillItem,
+        'date': 'bill__date',
+        'dimensions': {
+            'vendor': ('bill__vendor', 'bill__vendor__name'),
+            'fabric_type': ('inventory_item__fabric_type', None),
+            'category': (_category('inventory_item__fabric_type'), None),
+        },
+        'measures': {
+            'meters': Sum('meters'),
+            'amount': Sum(_line, output_field=_money),
+            'paid': Sum(_purchases_paid),
+            'outstanding': Sum(_line - _purchases_paid, output_field=_money),
+        },
+    },
+    'inventory': {
+        'model': InventoryItem,
+        'date': 'received_date',
+        'dimensions': {
+            'vendor': ('vendor', 'vendor__name'),
+            'fabric_type': ('fabric_type', None),
+            'category': (_category('fabric_type'), None),
+        },
+        'measures': {
+            'meters': Sum('meters'),
+            'amount': Sum(F('meters') * F('unit_price'), output_field=_money),
+        },
+    },
+}
+
+
+def dimension_names(source):
+    return [*SOURCES[source]['dimensions'], *PERIODS]
+
+
+def _key(expression):
+    return F(expression) if isinstance(expression, str) else expression
+
+
+def pivot(source, dimensions, measures, date_from=None, date_to=None, filters=None, ordering=None):
+    """``(totals, groups)``: ``measures`` over the whole selection, and a grouped queryset.
+
+    Everything compiles to one ``GROUP BY`` over the source's line table
+    (``date_trunc`` for periods), so slicing a year of trading costs one
+    aggregate query per page. Group columns are aliased ``d_*`` and
+    measures ``m_*``; ``format_group`` renames them. ``filters`` maps
+    dimension names to a value of their key; ``ordering`` lists dimension
+    or measure names, optionally prefixed with ``-``, before the default
+    order of the dimensions.
+    """
+    spec = SOURCES[source]
+    rows = spec['model'].objects.order_by()
+    if date_from:
+        rows = rows.filter(**{f"{spec['date']}__gte": date_from})
+    if date_to:
+        rows = rows.filter(**{f"{spec['date']}__lte": date_to})
+    for name, value in (filters or {}).items():
+        rows = rows.alias(**{f'f_{name}': _key(spec['dimensions'][name][0])}).filter(**{f'f_{name}': value})
+
+    columns, default_order = {}, []
+    for name in dimensions:
+        if name in PERIODS:
+            columns[f'd_{name}'] = PERIODS[name](spec['date'])
+            default_order.append(f'd_{name}')
+            continue
+        key, label = spec['dimensions'][name]
+        columns[f'd_{name}'] = _key(key)
+        if label:
+            columns[f'd_{name}_name'] = F(label)
+            default_order.append(f'd_{name}_name')
+        default_order.append(f'd_{name}')
+
+    aggregates = {f'm_{name}': spec['measures'][name] for name in measures}
+    totals = rows.aggregate(**aggregates)
+
+    order = []
+    for field in ordering or ():
+        name = field.lstrip('-')
+        prefix = 'm_' if name in measures else 'd_'
+        order.append(f"{'-' if field.startswith('-') else ''}{prefix}{name}")
+    groups = rows.values(**columns).annotate(**aggregates).order_by(*order, *default_order)
+    return format_group(totals), groups
+
+
+def format_group(row):
+    """Strip the column prefixes and turn the figures into rounded floats"""
+    group = {}
+    for column, value in row.items():
+        if column.startswith('m_'):
+            value = round(float(value or 0), 2)
+        group[column[2:]] = value
+    return group
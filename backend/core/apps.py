@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import authentication, changes, response_cache
+        from . import checks  # registers the system checks
+        authentication.connect_signals()
+        response_cache.connect_signals()
+        changes.connect_signals()
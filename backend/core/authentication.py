@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import RevokedToken, User
+
+# Claim carrying the user's token generation at issue; tokens without it
+# (issued before generations existed) count as generation 0
+GENERATION_CLAIM = 'gen'
+
+
+def _user_key(pk):
+    return f'auth:user:{pk}'
+
+
+def forget_user(pk):
+    cache.delete(_user_key(pk))
+
+
+def _forget_changed_user(sender, instance, **kwargs):
+    # Again on commit: a request may have cached the old row meanwhile
+    forget_user(instance.pk)
+    db_transaction.on_commit(lambda: forget_user(instance.pk))
+
+
+def connect_signals():
+    post_save.connect(_forget_changed_user, sender=User, dispatch_uid='auth_forget_saved_user')
+    post_delete.connect(_forget_changed_user, sender=User, dispatch_uid='auth_forget_deleted_user')
+
+
+def _check_generation(token, generation):
+    if token.get(GENERATION_CLAIM, 0) != generation:
+        raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that keeps the users it loads for a few seconds.
+
+    The user row is read at most once per ``AUTH_USER_CACHE_SECONDS``,
+    instead of on every request, and kept in the default cache. That cache
+    is shared by every worker in production (``core.E001``), so saving or
+    deleting a user, e.g. a deactivation or ``revoke_tokens``, drops the
+    entry for all of them at once.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            key = _user_key(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.AUTH_USER_CACHE_SECONDS)
+        _check_generation(validated_token, user.token_generation)
+        return user
+
+
+def revoke_token(token):
+    """Record a refresh token as spent until it expires; ``False`` if it already was"""
+    try:
+        with db_transaction.atomic():
+            RevokedToken.objects.create(
+                jti=token[api_settings.JTI_CLAIM],
+                expires_at=datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    """Login: stamps the user's token generation into the pair.
+
+    ``last_login`` is written with a single ``UPDATE`` and only when the
+    stored one is older than ``LAST_LOGIN_RESOLUTION_SECONDS``.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[GENERATION_CLAIM] = user.token_generation
+        return token
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        now = timezone.now()
+        resolution = timedelta(seconds=settings.LAST_LOGIN_RESOLUTION_SECONDS)
+        if self.user.last_login is None or now - self.user.last_login >= resolution:
+            User.objects.filter(pk=self.user.pk).update(last_login=now)
+        return data
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """Refresh: rejects revoked generations and refresh tokens already spent.
+
+    With rotation the presented token is recorded in ``RevokedToken``
+    before the new pair is issued; its unique ``jti`` makes a replayed
+    token, or two concurrent refreshes with the same one, fail.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        generation = (
+            User.objects.filter(pk=refresh[api_settings.USER_ID_CLAIM], is_active=True)
+            .values_list('token_generation', flat=True)
+            .first()
+        )
+        if generation is None or refresh.get(GENERATION_CLAIM, 0) != generation:
+            raise InvalidToken('Token has been revoked.')
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if not revoke_token(refresh):
+                raise InvalidToken('Token has already been used.')
+        elif RevokedToken.objects.filter(jti=refresh[api_settings.JTI_CLAIM]).exists():
+            raise InvalidToken('Token has been revoked.')
+        return super().validate(attrs)
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    """Logout: spends a refresh token so it can no longer be refreshed"""
+    refresh = serializers.CharField(write_only=True)
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        revoke_token(self.token_class(attrs['refresh']))
+        return {}
@@ -0,0 +1,68 @@
+from django.db.models import Count, Q, Sum
+from accounts.models import Vendor, Customer, Broker
+from inventory.models import InventoryItem, ItemMaster
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+def _lots(prefix, params, limit):
+    lots = InventoryItem.objects.filter(
+        Q(lot_number__istartswith=prefix) | Q(fabric_type__istartswith=prefix)
+    )
+    if params.get('vendor', '').isdigit():
+        lots = lots.filter(vendor_id=params['vendor'])
+    if params.get('in_stock') == 'true':
+        lots = lots.filter(available_meters__gt=0)
+    if params.get('is_billed') in ('true', 'false'):
+        lots = lots.filter(is_billed=params['is_billed'] == 'true')
+    return lots.order_by('lot_number', 'fabric_type').values(
+        'id', 'lot_number', 'fabric_type', 'vendor', 'meters', 'unit_price',
+        'available_meters', 'is_billed'
+    )[:limit]
+
+
+def _fabric_types(prefix, params, limit):
+    return (
+        InventoryItem.objects.filter(fabric_type__istartswith=prefix)
+        .values('fabric_type')
+        .annotate(lots=Count('id'), available_meters=Sum('available_meters'))
+        .order_by('fabric_type')[:limit]
+    )
+
+
+def _parties(model, *fields):
+    def complete(prefix, params, limit):
+        return model.objects.filter(name__istartswith=prefix).order_by('name').values(*fields)[:limit]
+    return complete
+
+
+def _item_codes(prefix, params, limit):
+    return (
+        ItemMaster.objects.filter(is_active=True)
+        .filter(Q(code__istartswith=prefix) | Q(name__istartswith=prefix))
+        .order_by('code')
+        .values('id', 'code', 'name', 'category', 'standard_price')[:limit]
+    )
+
+
+# Kind -> (lookup, models whose writes change its answers)
+SOURCES = {
+    'lots': (_lots, (InventoryItem,)),
+    'fabric_types': (_fabric_types, (InventoryItem,)),
+    'vendors': (_parties(Vendor, 'id', 'name', 'contact', 'balance'), (Vendor,)),
+    'customers': (_parties(Customer, 'id', 'name', 'contact', 'balance'), (Customer,)),
+    'brokers': (_parties(Broker, 'id', 'name', 'contact'), (Broker,)),
+    'item_codes': (_item_codes, (ItemMaster,)),
+}
+
+
+def autocomplete(prefix, kinds, params, limit):
+    """Top ``limit`` prefix matches per kind, one query each.
+
+    Matching is case-insensitive on the start of lot numbers, fabric
+    types, party names and item codes; on PostgreSQL each of those columns
+    has a ``text_pattern_ops`` index on ``UPPER()``, which is what
+    ``istartswith`` compiles to.
+    """
+    return {kind: list(SOURCES[kind][0](prefix, params, limit)) for kind in kinds}
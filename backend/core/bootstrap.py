@@ -0,0 +1,100 @@
+from django.db.models import F, Q
+from accounts.models import Vendor, Customer, Broker
+from inventory.models import InventoryItem
+from transactions.models import (
+    Transaction, PaymentRecord, CommissionPayment, Invoice, InvoiceItem,
+    Bill, BillItem
+)
+from .changes import current_cursor
+
+# Keys match the list serializers, so clients can map either response
+VENDOR_FIELDS = ('id', 'name', 'contact', 'address', 'bank_details', 'balance')
+CUSTOMER_FIELDS = ('id', 'name', 'contact', 'address', 'balance')
+BROKER_FIELDS = ('id', 'name', 'contact', 'address')
+INVENTORY_FIELDS = (
+    'id', 'lot_number', 'fabric_type', 'meters', 'unit_price', 'vendor',
+    'received_date', 'is_billed', 'available_meters'
+)
+INVOICE_FIELDS = (
+    'id', 'invoice_number', 'customer', 'broker', 'commission_type',
+    'commission_value', 'commission_amount', 'commission_paid', 'date',
+    'due_date', 'status', 'total', 'amount_paid', 'notes'
+)
+BILL_FIELDS = (
+    'id', 'bill_number', 'vendor', 'date', 'due_date', 'status', 'total',
+    'amount_paid', 'notes'
+)
+ITEM_FIELDS = ('id', 'inventory_item', 'meters', 'price')
+PAYMENT_FIELDS = ('id', 'date', 'amount', 'method', 'bank_name', 'tid')
+TRANSACTION_FIELDS = (
+    'id', 'transaction_type', 'date', 'amount', 'description', 'reference_id',
+    'vendor', 'customer'
+)
+
+BOOTSTRAP_MODELS = (
+    Vendor, Customer, Broker, InventoryItem, Invoice, Bill, PaymentRecord,
+    CommissionPayment,
+)
+HISTORY_MODELS = (Invoice, Bill, PaymentRecord, CommissionPayment, Transaction)
+
+
+def _grouped(queryset, parent_field, fields):
+    """``{parent id: [row, ...]}`` from a single ``values()`` query"""
+    groups = {}
+    for row in queryset.values(parent_field, *fields).order_by(parent_field, 'id'):
+        groups.setdefault(row.pop(parent_field), []).append(row)
+    return groups
+
+
+def _invoices(queryset):
+    invoices = list(queryset.values(*INVOICE_FIELDS, broker_name=F('broker__name')))
+    ids = queryset.values('id')
+    items = _grouped(InvoiceItem.objects.filter(invoice_id__in=ids), 'invoice_id', ITEM_FIELDS)
+    payments = _grouped(PaymentRecord.objects.filter(invoice_id__in=ids), 'invoice_id', PAYMENT_FIELDS)
+    commissions = _grouped(CommissionPayment.objects.filter(invoice_id__in=ids), 'invoice_id', PAYMENT_FIELDS)
+    for invoice in invoices:
+        invoice['items'] = items.get(invoice['id'], [])
+        invoice['payment_records'] = payments.get(invoice['id'], [])
+        invoice['commission_payments'] = commissions.get(invoice['id'], [])
+    return invoices
+
+
+def _bills(queryset):
+    bills = list(queryset.values(*BILL_FIELDS))
+    ids = queryset.values('id')
+    items = _grouped(BillItem.objects.filter(bill_id__in=ids), 'bill_id', ITEM_FIELDS)
+    payments = _grouped(PaymentRecord.objects.filter(bill_id__in=ids), 'bill_id', PAYMENT_FIELDS)
+    for bill in bills:
+        bill['items'] = items.get(bill['id'], [])
+        bill['payment_records'] = payments.get(bill['id'], [])
+    return bills
+
+
+def working_set():
+    """Parties, lots that can still be billed or sold, and unpaid documents.
+
+    ``cursor`` is taken first, so a client that continues with the changes
+    feed from it cannot miss a write made while the snapshot was read.
+    """
+    cursor = current_cursor()
+    return {
+        'cursor': cursor,
+        'vendors': list(Vendor.objects.values(*VENDOR_FIELDS)),
+        'customers': list(Customer.objects.values(*CUSTOMER_FIELDS)),
+        'brokers': list(Broker.objects.values(*BROKER_FIELDS)),
+        'inventory': list(
+            InventoryItem.objects.filter(Q(is_billed=False) | Q(available_meters__gt=0))
+            .values(*INVENTORY_FIELDS)
+        ),
+        'invoices': _invoices(Invoice.objects.exclude(status='Paid')),
+        'bills': _bills(Bill.objects.exclude(status='Paid')),
+    }
+
+
+def history():
+    """Paid documents and the transaction log, for history screens and ledgers"""
+    return {
+        'invoices': _invoices(Invoice.objects.filter(status='Paid')),
+        'bills': _bills(Bill.objects.filter(status='Paid')),
+        'transactions': list(Transaction.objects.values(*TRANSACTION_FIELDS)),
+    }
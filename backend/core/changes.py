@@ -0,0 +1,143 @@
+from datetime import timedelta
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Max, Min
+from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .events import announce
+from .models import Change
+
+# Feed key -> (model label, viewset whose queryset and serializer shape the rows)
+CHANGE_FEEDS = {
+    'vendors': ('accounts.Vendor', 'accounts.views.VendorViewSet'),
+    'customers': ('accounts.Customer', 'accounts.views.CustomerViewSet'),
+    'brokers': ('accounts.Broker', 'accounts.views.BrokerViewSet'),
+    'inventory': ('inventory.InventoryItem', 'inventory.views.InventoryItemViewSet'),
+    'invoices': ('transactions.Invoice', 'transactions.views.InvoiceViewSet'),
+    'bills': ('transactions.Bill', 'transactions.views.BillViewSet'),
+    'transactions': ('transactions.Transaction', 'transactions.views.TransactionViewSet'),
+}
+
+
+
+class CursorExpired(Exception):
+    """Changes after the cursor have been pruned; the client must reload from bootstrap"""
+
+
+TRACKED_MODELS = {label for label, _ in CHANGE_FEEDS.values()}
+FEED_KEYS = {label: key for key, (label, _) in CHANGE_FEEDS.items()}
+
+
+def record_changes(model, pks):
+    """Append ``pks`` of ``model`` to the change log.
+
+    Saves and deletes are recorded by signals; set-based ``update()`` and
+    ``bulk_create()`` paths must call this themselves, inside the same
+    transaction as the write. Open event streams are told on commit.
+    """
+    label = model._meta.label
+    if label not in TRACKED_MODELS:
+        return
+    pks = [pk for pk in pks if pk is not None]
+    Change.objects.bulk_create([Change(model=label, object_id=pk) for pk in pks])
+    announce(FEED_KEYS[label], pks)
+
+
+def _record_instance(sender, instance, **kwargs):
+    record_changes(sender, [instance.pk])
+
+
+def connect_signals():
+    for label in TRACKED_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(_record_instance, sender=model, dispatch_uid=f'changes-save-{label}')
+        post_delete.connect(_record_instance, sender=model, dispatch_uid=f'changes-delete-{label}')
+
+
+def _settled_before():
+    return timezone.now() - timedelta(seconds=settings.CHANGES_SETTLE_SECONDS)
+
+
+def current_cursor():
+    """Sequence a new client can start from after loading full tables.
+
+    Only settled changes count: a lower id may still belong to a transaction
+    that has not committed, and starting past it would skip that write.
+    """
+    return Change.objects.filter(created_at__lte=_settled_before()).aggregate(
+        cursor=Max('id')
+    )['cursor'] or 0
+
+
+def prune_changes(before):
+    """Delete changes logged before ``before``, keeping the newest one.
+
+    The newest row is kept so the sequence never restarts and
+    ``read_changes`` can tell a pruned cursor from a current one.
+    """
+    newest = Change.objects.aggregate(newest=Max('id'))['newest']
+    if newest is None:
+        return 0
+    deleted, _ = Change.objects.filter(created_at__lt=before, id__lt=newest).delete()
+    return deleted
+
+
+def read_changes(since, limit):
+    """Return ``(cursor, has_more, {label: {pk, ...}})`` for changes after ``since``.
+
+    Sequence values are allocated before commit, so a reader can see id
+    ``n + 1`` while ``n`` is still in flight. Every row read is served, but
+    the cursor stops at the first gap until the row after it is older than
+    ``CHANGES_SETTLE_SECONDS`` (the gap is then taken to be a rolled-back
+    write). Rows past the gap are served again on the next read, which is
+    harmless because clients apply them idempotently.
+
+    Raises ``CursorExpired`` when ``since`` is older than the oldest change
+    kept by ``prune_changes``.
+    """
+    rows = list(
+        Change.objects.filter(id__gt=since)
+        .order_by('id')
+        .values_list('id', 'model', 'object_id', 'created_at')[:limit + 1]
+    )
+    if rows and rows[0][0] > since + 1:
+        # Only a gap right after the cursor needs the extra query
+        if rows[0][0] == Change.objects.aggregate(first=Min('id'))['first']:
+            raise CursorExpired
+    settled_before = _settled_before()
+
+    cursor = since
+    blocked = False
+    changed = {}
+    for change_id, label, object_id, created_at in rows[:limit]:
+        changed.setdefault(label, set()).add(object_id)
+        if not blocked and change_id != cursor + 1 and created_at > settled_before:
+            blocked = True
+        if not blocked:
+            cursor = change_id
+
+    has_more = len(rows) > limit and not blocked
+    return cursor, has_more, changed
+
+
+def changed_rows(request, changed):
+    """Serialize the current state of changed objects, plus tombstones.
+
+    One query (plus the viewset's prefetches) per changed model. Objects
+    that no longer exist are reported by id under ``deleted``.
+    """
+    changes, deleted = {}, {}
+    for key, (label, viewset_path) in CHANGE_FEEDS.items():
+        pks = changed.get(label)
+        if not pks:
+            continue
+        viewset = import_string(viewset_path)
+        rows = list(viewset.queryset.filter(pk__in=pks).order_by('pk'))
+        if rows:
+            serializer = viewset.serializer_class(rows, many=True, context={'request': request})
+            changes[key] = serializer.data
+        missing = pks - {row.pk for row in rows}
+        if missing:
+            deleted[key] = sorted(missing)
+    return changes, deleted
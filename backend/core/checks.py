@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries live in a single worker process
+PER_PROCESS_CACHES = {'django.core.cache.backends.locmem.LocMemCache'}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Cached summaries, their version counters and token users must be shared by every worker.
+
+    With a per-process cache a write bumps the version, or drops a changed
+    user, in one worker only, and the others keep serving their stale
+    copies until they time out.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PER_PROCESS_CACHES:
+        return []
+    return [Error(
+        f'The default cache ({backend}) is per process, so cached summaries and '
+        'token users go stale in every worker but the one that wrote.',
+        hint='Set CACHE_BACKEND to a shared cache, e.g. '
+             'django.core.cache.backends.db.DatabaseCache (run createcachetable) or '
+             'django.core.cache.backends.redis.RedisCache.',
+        id='core.E001',
+    )]
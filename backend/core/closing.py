@@ -0,0 +1,51 @@
+from django.db import connections, router
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from .models import PeriodLock
+
+PERIOD_LOCK_ID = 1
+
+
+class PeriodClosed(APIException):
+    """A write dated inside a closed period"""
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'The period is closed.'
+    default_code = 'period_closed'
+
+
+# Shared row lock clause per database; SQLite serializes writers anyway
+_SHARE_LOCK = {'postgresql': 'FOR SHARE', 'mysql': 'LOCK IN SHARE MODE'}
+
+
+def closed_through():
+    """Last day of the latest closed period, or ``None`` when nothing is closed.
+
+    Read from the ``PeriodLock`` row under a shared lock, held until the
+    caller's transaction ends: ``close_period`` waits until then, and a
+    read that had to wait for a close sees the month it closed.
+    """
+    connection = connections[router.db_for_write(PeriodLock)]
+    quote = connection.ops.quote_name
+    lock = next(iter(PeriodLock.objects.raw(
+        f"SELECT {quote('id')}, {quote('closed_through')} FROM {quote(PeriodLock._meta.db_table)} "
+        f"WHERE {quote('id')} = %s {_SHARE_LOCK.get(connection.vendor, '')}",
+        [PERIOD_LOCK_ID], using=connection.alias
+    )), None)
+    return lock and lock.closed_through
+
+
+def ensure_open(*dates):
+    """Raise ``PeriodClosed`` if any of ``dates`` is in a closed period, with one query.
+
+    Called inside the posting transaction before anything is written, for
+    the dates a write adds, moves or removes.
+    """
+    dates = [date for date in dates if date is not None]
+    if not dates:
+        return
+    end = closed_through()
+    if end is not None and min(dates) <= end:
+        raise PeriodClosed(
+            f'Postings dated on or before {end.isoformat()} are in a closed period; '
+            'reopen it to change them.'
+        )
@@ -0,0 +1,103 @@
+import hashlib
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from .models import Change
+from .response_cache import get_versions
+
+
+def _etag(fingerprint):
+    return quote_etag(hashlib.sha1(repr(fingerprint).encode()).hexdigest())
+
+
+def data_etag(*models, extra=()):
+    """Strong ETag for a response built from ``models``.
+
+    Combines the models' cache version counters, bumped once a write has
+    committed, with the head of the change log, which every worker sees
+    even when the cache is per-process.
+    """
+    head = Change.objects.aggregate(head=Max('id'))['head'] or 0
+    return _etag((get_versions(*models), head, tuple(extra)))
+
+
+def etag_matches(request, etag):
+    return etag in parse_etags(request.headers.get('If-None-Match', ''))
+
+
+def with_validators(response, etag, last_modified=None):
+    """Set ``ETag`` (and ``Last-Modified``) with headers asking clients to revalidate"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    response['Cache-Control'] = 'private, no-cache'
+    response['Vary'] = 'Authorization'
+    return response
+
+
+def conditional_response(request, etag, build, last_modified=None):
+    """``304`` when the client already holds ``etag``, else ``build()`` as ``200``.
+
+    ``Cache-Control: no-cache`` lets browsers keep the body and revalidate
+    it with ``If-None-Match`` on every load.
+    """
+    if etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(build())
+    return with_validators(response, etag, last_modified)
+
+
+class ConditionalGetMixin:
+    """ViewSet mixin validating ``list`` and ``retrieve`` with ETags.
+
+    A list's ETag comes from ``Max(conditional_field)`` and ``Count`` over the
+    filtered queryset, a detail's from the object's ``conditional_field``,
+    both alongside the full request path. Viewsets whose rows embed other
+    models (names, nested lots) list them in ``conditional_models`` so
+    writes to those change the ETag too. A matching ``If-None-Match`` is
+    answered with ``304`` before the page is fetched or serialized.
+    """
+    conditional_field = 'updated_at'
+    conditional_models = ()
+
+    def state_etag(self, *state):
+        fingerprint = (self.request.get_full_path(), *state)
+        if self.conditional_models:
+            return data_etag(*self.conditional_models, extra=fingerprint)
+        return _etag(fingerprint)
+
+    def queryset_validators(self, queryset, *extra):
+        """``(last_modified, etag)`` for a whole queryset, in one aggregate query.
+
+        ``extra`` values shaping the response beyond the queryset (a row
+        limit, say) are folded into the ETag.
+        """
+        state = queryset.order_by().aggregate(last=Max(self.conditional_field), count=Count('pk'))
+        return state['last'], self.state_etag(state['last'], state['count'], *extra)
+
+    def list(self, request, *args, **kwargs):
+        last_modified, etag = self.queryset_validators(self.filter_queryset(self.get_queryset()))
+        if etag_matches(request, etag):
+            return with_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+        return with_validators(super().list(request, *args, **kwargs), etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            last_modified = (
+                self.filter_queryset(self.get_queryset()).prefetch_related(None)
+                .filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+                .values_list(self.conditional_field, flat=True).first()
+            )
+        except (TypeError, ValueError, ValidationError):
+            last_modified = None
+        if last_modified is None:
+            # Let the regular lookup produce the 404
+            return super().retrieve(request, *args, **kwargs)
+        etag = self.state_etag(last_modified)
+        if etag_matches(request, etag):
+            return with_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+        return with_validators(super().retrieve(request, *args, **kwargs), etag, last_modified)
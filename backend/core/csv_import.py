@@ -0,0 +1,312 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DatabaseError, transaction as db_transaction
+from django.utils.dateparse import parse_date
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.response import Response
+from .money import CENT
+from .response_cache import bump_version_on_commit
+
+
+class RowError(Exception):
+    """Validation failure of a single CSV row, as ``{column: message}``"""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def row_errors(exc):
+    """Normalise a ``RowError`` or Django ``ValidationError`` to a dict"""
+    if isinstance(exc, RowError):
+        return exc.errors
+    if hasattr(exc, 'error_dict'):
+        return {field: ' '.join(messages) for field, messages in exc.message_dict.items()}
+    return {'non_field_errors': ' '.join(exc.messages)}
+
+
+def parse_decimal(value, field, required=True):
+    """Parse ``1,234.50``-style numbers, rejecting anything else"""
+    cleaned = (value or '').replace(',', '').replace(' ', '')
+    if not cleaned:
+        if required:
+            raise RowError({field: 'This field is required.'})
+        return None
+    try:
+        number = Decimal(cleaned)
+    except InvalidOperation:
+        raise RowError({field: f'"{value}" is not a number.'})
+    if not number.is_finite():
+        raise RowError({field: f'"{value}" is not a number.'})
+    return number
+
+
+def parse_id(value, field):
+    """Parse an optional primary key column"""
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise RowError({field: f'"{value}" is not a valid id.'})
+
+
+def parse_date_value(value, field, required=True):
+    if not value:
+        if required:
+            raise RowError({field: 'This field is required.'})
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise RowError({field: 'Expected a date in YYYY-MM-DD format.'})
+    return parsed
+
+
+def parse_items_cell(value):
+    """Parse the ``items`` column into ``[(reference, meters, price), ...]``.
+
+    The cell is either a JSON array of ``{inventory_item, meters, price}``
+    objects or the compact ``reference|meters|price;...`` form, where the
+    reference is an inventory id or a lot number.
+    """
+    value = (value or '').strip()
+    if not value:
+        raise RowError({'items': 'At least one item is required.'})
+
+    if value.startswith('['):
+        try:
+            entries = [
+                (str(entry.get('inventory_item', '')), str(entry.get('meters', '')), str(entry.get('price', '')))
+                for entry in json.loads(value)
+            ]
+        except (ValueError, AttributeError):
+            raise RowError({'items': 'Invalid JSON item list.'})
+    else:
+        entries = []
+        for part in value.split(';'):
+            if not part.strip():
+                continue
+            pieces = [piece.strip() for piece in part.split('|')]
+            if len(pieces) != 3:
+                raise RowError({'items': f'"{part}" is not in reference|meters|price form.'})
+            entries.append(tuple(pieces))
+
+    items = []
+    for reference, meters, price in entries:
+        reference = reference.strip()
+        if not reference:
+            raise RowError({'items': 'Every item needs an inventory id or lot number.'})
+        meters = parse_decimal(meters, 'items')
+        price = parse_decimal(price, 'items')
+        if meters < CENT:
+            raise RowError({'items': f'Meters for {reference} must be at least 0.01.'})
+        if price < 0:
+            raise RowError({'items': f'Price for {reference} cannot be negative.'})
+        items.append((reference, meters, price))
+    if not items:
+        raise RowError({'items': 'At least one item is required.'})
+    return items
+
+
+class NameResolver:
+    """Map names (or numeric ids) of a model to primary keys.
+
+    Names are looked up once per batch with a single ``name__in`` query and
+    remembered for the rest of the import. Names shared by several rows
+    are reported as ambiguous rather than guessed.
+    """
+
+    def __init__(self, model, label):
+        self.model = model
+        self.label = label
+        self.names = {}
+        self.ids = set()
+
+    def prefetch(self, names=(), ids=()):
+        names = {name for name in names if name and name not in self.names}
+        ids = {pk for pk in ids if pk not in self.ids}
+        if names:
+            found = {}
+            for name, pk in self.model.objects.filter(name__in=names).values_list('name', 'pk'):
+                found.setdefault(name, []).append(pk)
+            for name in names:
+                self.names[name] = found.get(name, [])
+        if ids:
+            self.ids.update(self.model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+    def resolve(self, name, pk, field):
+        if pk is not None:
+            if pk not in self.ids:
+                raise RowError({field: f'{self.label} {pk} does not exist.'})
+            return pk
+        if not name:
+            raise RowError({field: f'A {self.label.lower()} name or id is required.'})
+        matches = self.names.get(name, [])
+        if not matches:
+            raise RowError({field: f'{self.label} "{name}" does not exist.'})
+        if len(matches) > 1:
+            raise RowError({field: f'{self.label} name "{name}" is ambiguous; use {field}_id.'})
+        return matches[0]
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def fail(self, row, errors):
+        self.errors.append({'row': row, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+        }
+
+
+class CsvImporter:
+    """Stream a CSV upload into the database in batches.
+
+    Subclasses declare ``columns`` (field name to accepted header aliases,
+    matched case-insensitively) and implement:
+
+    * ``parse_row(values)`` – turn one row into plain Python values without
+      touching the database, raising ``RowError`` for bad input.
+    * ``prepare_batch(rows)`` – resolve references for a whole batch with a
+      constant number of queries.
+    * ``build(row)`` – validate one parsed row against the prepared lookups
+      and return what ``write_batch`` needs, raising ``RowError``.
+    * ``write_batch(objects)`` – insert a batch with ``bulk_create``.
+
+    Each batch is written in its own transaction, so a database error only
+    fails the rows of that batch. ``finish()`` runs once after the last
+    batch. Row numbers count the header as row ``1``, like a spreadsheet.
+    """
+    columns = {}
+    batch_size = 500
+    models = ()
+
+    def __init__(self, upload):
+        self.upload = upload
+        self.result = ImportResult()
+
+    def lines(self):
+        """Decode the upload one line at a time, so a bad byte fails the row it is in"""
+        self.upload.file.seek(0)
+        for number, line in enumerate(self.upload.file):
+            line = line.decode('utf-8')
+            yield line.lstrip('\ufeff') if number == 0 else line
+
+    def check_readable(self):
+        """Read the upload through once as CSV, raising ``ValidationError`` at the first bad row.
+
+        Catches what ``csv`` and the decoder reject (a field over the size
+        limit, bytes that are not UTF-8) up front, so a malformed file
+        cannot fail halfway through the import.
+        """
+        number = 0
+        try:
+            for number, _ in enumerate(csv.reader(self.lines()), start=1):
+                pass
+        except (csv.Error, UnicodeDecodeError) as exc:
+            raise ValidationError({'file': f'Row {number + 1} could not be read: {exc}'})
+
+    def read_rows(self):
+        """Yield ``(row_number, {field: value})`` without loading the whole file"""
+        reader = csv.DictReader(self.lines())
+        headers = {(name or '').strip().lower(): name for name in reader.fieldnames or []}
+        mapping = {
+            field: [headers[alias] for alias in aliases if alias in headers]
+            for field, aliases in self.columns.items()
+        }
+        for number, raw in enumerate(reader, start=2):
+            values = {}
+            for field, sources in mapping.items():
+                values[field] = next(
+                    (raw[source].strip() for source in sources if (raw.get(source) or '').strip()),
+                    ''
+                )
+            yield number, values
+
+    def batches(self):
+        batch = []
+        for number, values in self.read_rows():
+            try:
+                batch.append((number, self.parse_row(values)))
+            except RowError as exc:
+                self.result.fail(number, exc.errors)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def run(self):
+        self.check_readable()
+        for batch in self.batches():
+            self.prepare_batch([row for _, row in batch])
+            objects = []
+            for number, row in batch:
+                try:
+                    objects.append((number, self.build(row)))
+                except (RowError, DjangoValidationError) as exc:
+                    self.result.fail(number, row_errors(exc))
+            if not objects:
+                continue
+            try:
+                with db_transaction.atomic():
+                    self.write_batch([obj for _, obj in objects])
+                    if self.models:
+                        bump_version_on_commit(*self.models)
+            except (DatabaseError, APIException) as exc:
+                for number, _ in objects:
+                    self.result.fail(number, {'non_field_errors': f'Batch could not be saved: {exc}'})
+                continue
+            self.result.created += len(objects)
+            self.batch_written(objects)
+        self.finish()
+        return self.result.as_dict()
+
+    def parse_row(self, values):
+        raise NotImplementedError
+
+    def prepare_batch(self, rows):
+        pass
+
+    def build(self, row):
+        raise NotImplementedError
+
+    def write_batch(self, objects):
+        raise NotImplementedError
+
+    def batch_written(self, objects):
+        pass
+
+    def finish(self):
+        pass
+
+
+class CsvImportMixin:
+    """ViewSet mixin adding ``POST import_csv/`` backed by ``csv_importer_class``.
+
+    The upload is sent as multipart form data in the ``file`` field. The
+    response reports ``created``, ``failed`` and per-row ``errors``.
+    """
+    csv_importer_class = None
+
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
+    def import_csv(self, request):
+        """Bulk-import rows from an uploaded CSV file"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': 'Upload a CSV file in the "file" field.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.csv_importer_class(upload).run())
@@ -0,0 +1,162 @@
+import asyncio
+import functools
+import json
+import logging
+import select
+import threading
+import time
+from django.conf import settings
+from django.db import connection, connections, transaction as db_transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Feeds with more changed ids than this are announced as ``null`` (many)
+EVENT_MAX_IDS = 100
+
+
+def compact_event(feed, ids):
+    """``{feed: [ids]}``, or ``{feed: None}`` when there are too many to list"""
+    ids = sorted(set(ids))
+    return {feed: ids if len(ids) <= EVENT_MAX_IDS else None}
+
+
+def merge_events(event, other):
+    """Union of two events; a feed that is ``None`` in either stays ``None``"""
+    merged = dict(event)
+    for feed, ids in other.items():
+        if feed not in merged:
+            merged[feed] = ids
+        elif merged[feed] is None or ids is None:
+            merged[feed] = None
+        else:
+            merged.update(compact_event(feed, merged[feed] + ids))
+    return merged
+
+
+def _offer(queue, event):
+    # A slow stream never loses an event: the backlog is folded into one
+    while queue.full():
+        event = merge_events(queue.get_nowait(), event)
+    queue.put_nowait(event)
+
+
+class LocalBroker:
+    """In-process fan-out from committed writes to open event streams.
+
+    Only streams served by the same process hear an event, which is enough
+    for a single worker, SQLite setups and tests. Each stream owns an
+    ``asyncio.Queue`` that is fed thread-safely from whichever thread
+    committed the write.
+    """
+    queue_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self):
+        """Queue of events for a stream running on the current event loop"""
+        queue = asyncio.Queue(self.queue_size)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def publish(self, event):
+        """Announce ``event`` once the current transaction commits"""
+        db_transaction.on_commit(lambda: self.deliver(event))
+
+    def deliver(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # The stream's event loop has shut down
+                self.unsubscribe(queue)
+
+
+class PostgresBroker(LocalBroker):
+    """Fan-out across worker processes with PostgreSQL ``LISTEN``/``NOTIFY``.
+
+    ``pg_notify`` runs inside the writing transaction, so PostgreSQL only
+    delivers it on commit and drops it on rollback. Every process keeps one
+    listening connection on a daemon thread, started with its first stream,
+    and hands notifications to its local subscribers.
+    """
+    channel = 'textileflow_changes'
+    poll_timeout = 5
+    reconnect_delay = 5
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, event):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, json.dumps(event)])
+
+    def subscribe(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name='change-events-listener', daemon=True
+                )
+                self._listener.start()
+        return super().subscribe()
+
+    def _listen(self):
+        while True:
+            wrapper = connections.create_connection('default')
+            try:
+                wrapper.ensure_connection()
+                raw = wrapper.connection
+                with raw.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                while True:
+                    if select.select([raw], [], [], self.poll_timeout)[0]:
+                        raw.poll()
+                        while raw.notifies:
+                            self.deliver(json.loads(raw.notifies.pop(0).payload))
+            except Exception:
+                logger.exception('Change event listener lost its connection; reconnecting')
+                time.sleep(self.reconnect_delay)
+            finally:
+                wrapper.close()
+
+
+@functools.lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.CHANGE_EVENTS_BROKER)()
+
+
+def announce(feed, ids):
+    """Tell open streams that ``ids`` of ``feed`` changed, once committed"""
+    if ids:
+        get_broker().publish(compact_event(feed, ids))
+
+
+async def event_stream(broker, queue):
+    """Server-sent events for ``queue``, with comments as keep-alives.
+
+    Events already waiting when the stream wakes are merged, so a burst of
+    writes reaches the client as one ``changes`` event.
+    """
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), settings.CHANGE_EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            while not queue.empty():
+                event = merge_events(event, queue.get_nowait())
+            yield f'event: changes\ndata: {json.dumps(event)}\n\n'
+    finally:
+        broker.unsubscribe(queue)
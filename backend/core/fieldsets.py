@@ -0,0 +1,145 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_paths(value):
+    """``'id,items.meters'`` -> ``{'id': {}, 'items': {'meters': {}}}``"""
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for part in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(part, {})
+    return tree
+
+
+class SparseFieldsetSerializer:
+    """Serializer mixin narrowed by a ``fields`` tree and widened by ``expand``.
+
+    Without either the serializer keeps its full shape. ``fields`` keeps only
+    the named fields; a nested serializer named without sub-fields keeps all
+    of its own. ``Meta.expandable_fields`` maps a foreign key to the
+    serializer that replaces its id when the key is expanded.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        self.sparse_fields = fields or None
+        self.expand = expand or {}
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in self.expand:
+            if name in expandable:
+                fields[name] = expandable[name](read_only=True)
+
+        requested = set(self.sparse_fields or ()) | set(self.expand)
+        unknown = requested - set(fields)
+        unknown |= {
+            name for name in self.expand
+            if name in fields and name not in expandable
+            and not isinstance(getattr(fields[name], 'child', fields[name]), SparseFieldsetSerializer)
+        }
+        if unknown:
+            raise serializers.ValidationError({
+                'fields': f"Unknown or non-expandable field(s): {', '.join(sorted(unknown))}."
+            })
+
+        if self.sparse_fields:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        for name, field in fields.items():
+            nested = getattr(field, 'child', field)
+            if isinstance(nested, SparseFieldsetSerializer):
+                nested.sparse_fields = (self.sparse_fields or {}).get(name) or None
+                nested.expand = self.expand.get(name, {})
+        return fields
+
+
+def related_lookups(serializer, model):
+    """``select_related`` paths and ``Prefetch`` objects for what ``serializer`` reads.
+
+    Forward relations read through a dotted source or a nested serializer
+    are joined; reverse and many-to-many relations are prefetched with a
+    queryset optimized for the nested serializer in turn.
+    """
+    select, prefetch = set(), {}
+    for field in serializer.fields.values():
+        nested = getattr(field, 'child', field)
+        if not isinstance(nested, serializers.BaseSerializer):
+            nested = None
+
+        current, path = model, []
+        attrs = field.source_attrs
+        for position, attr in enumerate(attrs):
+            try:
+                relation = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            if not relation.is_relation:
+                break
+            last = position == len(attrs) - 1
+            if relation.one_to_many or relation.many_to_many:
+                lookup = '__'.join(path + [attr])
+                queryset = relation.related_model._default_manager.all()
+                if nested is not None and last:
+                    queryset = optimize_queryset(queryset, nested)
+                prefetch.setdefault(lookup, Prefetch(lookup, queryset=queryset))
+                break
+            if last and nested is None:
+                # Only the foreign key value, which is on this row already
+                break
+            path.append(attr)
+            current = relation.related_model
+            select.add('__'.join(path))
+            if last:
+                prefix = '__'.join(path)
+                child_select, child_prefetch = related_lookups(nested, current)
+                select.update(f'{prefix}__{lookup}' for lookup in child_select)
+                for item in child_prefetch:
+                    lookup = f'{prefix}__{item.prefetch_through}'
+                    prefetch.setdefault(lookup, Prefetch(lookup, queryset=item.queryset))
+    return sorted(select), list(prefetch.values())
+
+
+def optimize_queryset(queryset, serializer):
+    """``queryset`` with exactly the joins and prefetches ``serializer`` needs"""
+    select, prefetch = related_lookups(serializer, queryset.model)
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class SparseFieldsetMixin:
+    """ViewSet mixin serving ``?fields=`` and ``?expand=`` on reads.
+
+    Both take comma separated, dotted paths, e.g.
+    ``?fields=id,invoice_number,total,items.meters&expand=customer``. The
+    queryset's joins and prefetches are derived from the requested shape,
+    so a header-only list never touches the item tables.
+    """
+
+    def sparse_fieldset_kwargs(self):
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return {}
+        params = self.request.query_params
+        return {
+            'fields': parse_paths(params.get('fields')),
+            'expand': parse_paths(params.get('expand')),
+        }
+
+    def get_serializer(self, *args, **kwargs):
+        if issubclass(self.get_serializer_class(), SparseFieldsetSerializer):
+            for key, value in self.sparse_fieldset_kwargs().items():
+                kwargs.setdefault(key, value)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not issubclass(self.get_serializer_class(), SparseFieldsetSerializer):
+            return queryset
+        return optimize_queryset(queryset, self.get_serializer())
@@ -0,0 +1,23 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.changes import prune_changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete change log rows older than CHANGES_RETENTION_DAYS; run daily. '
+        'Clients with an older cursor are told to resync from bootstrap.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Retention window in days (default: CHANGES_RETENTION_DAYS).'
+        )
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.CHANGES_RETENTION_DAYS
+        deleted = prune_changes(timezone.now() - timedelta(days=days))
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} changes older than {days} days.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete revoked refresh tokens that have expired anyway; run daily '
+        'to keep the revocation table to the tokens still in their lifetime.'
+    )
+
+    def handle(self, *args, **options):
+        deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} expired revoked tokens.'))
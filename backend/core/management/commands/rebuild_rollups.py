@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from core.models import DailyRollup
+from core.rollups import filter_dates, rebuild_rollups, rollup_rows
+
+
+def _date_option(value):
+    try:
+        date = parse_date(value) if value else None
+    except ValueError:
+        date = None
+    if value and date is None:
+        raise CommandError(f'Invalid date {value!r}; expected YYYY-MM-DD.')
+    return date
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the daily rollup of sales, purchases, payments, expenses and '
+        'commissions from the posted documents, for backfills and repairs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', help='First day to rebuild (default: the earliest)')
+        parser.add_argument('--date-to', help='Last day to rebuild (default: the latest)')
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report rollup rows that differ from the documents',
+        )
+
+    def handle(self, *args, **options):
+        date_from = _date_option(options['date_from'])
+        date_to = _date_option(options['date_to'])
+
+        if not options['check']:
+            written = rebuild_rollups(date_from, date_to)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} rollup rows.'))
+            return
+
+        key = ('date', 'kind', 'party', 'category', 'method')
+        expected = {
+            tuple(row[field] for field in key): (row['count'], row['amount'])
+            for row in rollup_rows(date_from=date_from, date_to=date_to)
+        }
+        stored = {
+            tuple(row[field] for field in key): (row['count'], row['amount'])
+            for row in filter_dates(DailyRollup.objects.all(), date_from, date_to)
+            .exclude(count=0, amount=0)
+            .values(*key, 'count', 'amount')
+        }
+        drifted = sorted(
+            (row_key for row_key in expected.keys() | stored.keys()
+             if expected.get(row_key, (0, 0)) != stored.get(row_key, (0, 0))),
+            key=str
+        )
+        for row_key in drifted:
+            if options['verbosity'] >= 2:
+                self.stdout.write(
+                    f"  {row_key}: stored={stored.get(row_key)} expected={expected.get(row_key)}"
+                )
+        if drifted:
+            self.stdout.write(self.style.WARNING(f'{len(drifted)} rollup rows drifted.'))
+            self.stdout.write('Run again without --check to rebuild.')
+        else:
+            self.stdout.write(self.style.SUCCESS('Rollup matches the documents.'))
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:46
+
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    """Aggregate every posted document into the new table"""
+    from core.rollups import rebuild_rollups
+    rebuild_rollups(model=apps.get_model('core', 'DailyRollup'), get_model=apps.get_model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_change_log'),
+        ('transactions', '0004_search_indexes'),
+        ('expenses', '0003_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('kind', models.CharField(choices=[('sale', 'Sale'), ('purchase', 'Purchase'), ('receipt', 'Receipt'), ('payment', 'Payment'), ('expense', 'Expense'), ('commission', 'Commission'), ('commission_payment', 'Commission payment')], max_length=20)),
+                ('party', models.PositiveIntegerField(default=0)),
+                ('category', models.CharField(blank=True, default='', max_length=50)),
+                ('method', models.CharField(blank=True, default='', max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'daily_rollups',
+                'ordering': ['date', 'kind'],
+                'indexes': [models.Index(fields=['kind', 'date'], name='daily_rollup_kind_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'kind', 'party', 'category', 'method'), name='daily_rollup_key'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
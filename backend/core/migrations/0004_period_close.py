@@ -0,0 +1,119 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClosedPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(unique=True)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='closed_periods', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'closed_periods',
+                'ordering': ['-end_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('fabric_type', models.CharField(max_length=255)),
+                ('lots', models.IntegerField()),
+                ('received_meters', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('on_hand_meters', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('cogs', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('aging', models.JSONField(default=dict)),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='core.closedperiod')),
+            ],
+            options={
+                'db_table': 'inventory_snapshots',
+                'ordering': ['fabric_type'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OpenDocumentSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_type', models.CharField(choices=[('invoice', 'Invoice'), ('bill', 'Bill')], max_length=10)),
+                ('document', models.PositiveIntegerField()),
+                ('number', models.CharField(max_length=100)),
+                ('party', models.PositiveIntegerField()),
+                ('party_name', models.CharField(max_length=255)),
+                ('date', models.DateField()),
+                ('due_date', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('paid', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('outstanding', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='open_documents', to='core.closedperiod')),
+            ],
+            options={
+                'db_table': 'open_document_snapshots',
+                'ordering': ['document_type', 'due_date', 'number'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PartyBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('party_type', models.CharField(choices=[('customer', 'Customer'), ('vendor', 'Vendor'), ('broker', 'Broker')], max_length=10)),
+                ('party', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=255)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='party_balances', to='core.closedperiod')),
+            ],
+            options={
+                'db_table': 'party_balance_snapshots',
+                'ordering': ['party_type', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfitLossSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(choices=[('revenue', 'Revenue'), ('cogs', 'Cost of sales'), ('expense', 'Expense'), ('commission', 'Commission')], max_length=20)),
+                ('category', models.CharField(blank=True, default='', max_length=100)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='profit_and_loss', to='core.closedperiod')),
+            ],
+            options={
+                'db_table': 'profit_loss_snapshots',
+                'ordering': ['section', 'category'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='inventorysnapshot',
+            constraint=models.UniqueConstraint(fields=('period', 'method', 'fabric_type'), name='inventory_snapshot_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='opendocumentsnapshot',
+            constraint=models.UniqueConstraint(fields=('period', 'document_type', 'document'), name='open_document_snapshot_key'),
+        ),
+        migrations.AddIndex(
+            model_name='partybalancesnapshot',
+            index=models.Index(fields=['party_type', 'party'], name='party_balance_snapshot_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='partybalancesnapshot',
+            constraint=models.UniqueConstraint(fields=('period', 'party_type', 'party'), name='party_balance_snapshot_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='profitlosssnapshot',
+            constraint=models.UniqueConstraint(fields=('period', 'section', 'category'), name='profit_loss_snapshot_key'),
+        ),
+    ]
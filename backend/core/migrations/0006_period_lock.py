@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-17 04:21
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def create_lock_row(apps, schema_editor):
+    """The single lock row, holding the end of the latest closed period"""
+    ClosedPeriod = apps.get_model('core', 'ClosedPeriod')
+    PeriodLock = apps.get_model('core', 'PeriodLock')
+    PeriodLock.objects.create(
+        pk=1, closed_through=ClosedPeriod.objects.aggregate(end=Max('end_date'))['end']
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_token_revocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('closed_through', models.DateField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'period_lock',
+            },
+        ),
+        migrations.RunPython(create_lock_row, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import F
 
 
 class User(AbstractUser):
@@ -12,6 +13,8 @@ class User(AbstractUser):
     
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='cashier')
     name = models.CharField(max_length=255)
+    # Stamped into issued tokens; raising it revokes every token issued before
+    token_generation = models.PositiveIntegerField(default=0)
     
     class Meta:
         db_table = 'users'
@@ -20,3 +23,264 @@ class User(AbstractUser):
     
     def __str__(self):
         return f"{self.name} ({self.username})"
+
+    def save(self, *args, **kwargs):
+        # A new password (set_password, not a hash upgrade on login)
+        # revokes the tokens issued under the old one
+        if self.pk is not None and self._password is not None:
+            self.token_generation += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'token_generation'}
+        super().save(*args, **kwargs)
+
+    def revoke_tokens(self):
+        """Revoke every access and refresh token issued to the user so far"""
+        self.token_generation = F('token_generation') + 1
+        self.save(update_fields=['token_generation'])
+        self.refresh_from_db(fields=['token_generation'])
+
+
+class RevokedToken(models.Model):
+    """A refresh token spent by rotation or logout, kept until it would have expired.
+
+    Replaces simplejwt's outstanding/blacklist tables: only revoked tokens
+    are stored, and ``prune_tokens`` drops them once expired.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'revoked_tokens'
+
+    def __str__(self):
+        return self.jti
+
+
+class Change(models.Model):
+    """One write to a synced row; the auto-increment id is the change sequence.
+
+    Rows are never updated. The changes feed reads them in id order and
+    serves the current state of each changed object, or a tombstone when
+    the object no longer exists.
+    """
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'changes'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.id} {self.model}:{self.object_id}"
+
+
+class DailyRollup(models.Model):
+    """Totals of one day's postings, kept current by ``core.rollups``.
+
+    ``party`` is the customer, vendor or broker id the kind refers to
+    (0 for expenses); ``category`` and ``method`` are the expense category
+    and payment method where the kind has them, else blank.
+    """
+
+    KINDS = [
+        ('sale', 'Sale'),
+        ('purchase', 'Purchase'),
+        ('receipt', 'Receipt'),
+        ('payment', 'Payment'),
+        ('expense', 'Expense'),
+        ('commission', 'Commission'),
+        ('commission_payment', 'Commission payment'),
+    ]
+
+    date = models.DateField()
+    kind = models.CharField(max_length=20, choices=KINDS)
+    party = models.PositiveIntegerField(default=0)
+    category = models.CharField(max_length=50, blank=True, default='')
+    method = models.CharField(max_length=20, blank=True, default='')
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'daily_rollups'
+        ordering = ['date', 'kind']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'kind', 'party', 'category', 'method'], name='daily_rollup_key'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'date'], name='daily_rollup_kind_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.kind} #{self.party}: {self.amount}"
+
+
+class ClosedPeriod(models.Model):
+    """A closed month: postings dated up to ``end_date`` are frozen.
+
+    Months close in order, so every day up to the latest ``end_date`` is
+    closed. Closing writes the snapshot tables below, which historical
+    reports read instead of re-aggregating the month.
+    """
+    start_date = models.DateField()
+    end_date = models.DateField(unique=True)
+    closed_at = models.DateTimeField(auto_now_add=True)
+    closed_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='closed_periods'
+    )
+
+    class Meta:
+        db_table = 'closed_periods'
+        ordering = ['-end_date']
+
+    def __str__(self):
+        return f"{self.start_date:%Y-%m}"
+
+
+class PeriodLock(models.Model):
+    """The one row that serializes closing a period with the postings into it.
+
+    ``closed_through`` mirrors the latest ``ClosedPeriod.end_date``.
+    Postings read it under a shared row lock (``ensure_open``); closing or
+    reopening a period updates it, so a close waits for the postings in
+    flight and postings that were waiting see the new date.
+    """
+    closed_through = models.DateField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'period_lock'
+
+
+class PartyBalanceSnapshot(models.Model):
+    """Balance of a customer, vendor or broker at the end of a closed period.
+
+    Only non-zero balances are stored. A broker's balance is the
+    commission accrued but not yet paid.
+    """
+
+    PARTY_TYPES = [
+        ('customer', 'Customer'),
+        ('vendor', 'Vendor'),
+        ('broker', 'Broker'),
+    ]
+
+    period = models.ForeignKey(ClosedPeriod, on_delete=models.CASCADE, related_name='party_balances')
+    party_type = models.CharField(max_length=10, choices=PARTY_TYPES)
+    party = models.PositiveIntegerField()
+    name = models.CharField(max_length=255)
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        db_table = 'party_balance_snapshots'
+        ordering = ['party_type', 'name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'party_type', 'party'], name='party_balance_snapshot_key'
+            ),
+        ]
+        indexes = [
+            # Ledger opening balances: latest period of one party
+            models.Index(fields=['party_type', 'party'], name='party_balance_snapshot_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.party_type} #{self.party}: {self.balance}"
+
+
+class InventorySnapshot(models.Model):
+    """Inventory valuation of one fabric type over a closed period, per costing method"""
+    period = models.ForeignKey(ClosedPeriod, on_delete=models.CASCADE, related_name='inventory')
+    method = models.CharField(max_length=10)
+    fabric_type = models.CharField(max_length=255)
+    lots = models.IntegerField()
+    received_meters = models.DecimalField(max_digits=14, decimal_places=2)
+    on_hand_meters = models.DecimalField(max_digits=14, decimal_places=2)
+    value = models.DecimalField(max_digits=14, decimal_places=2)
+    cogs = models.DecimalField(max_digits=14, decimal_places=2)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+    # Aging bucket label -> {"meters": ..., "value": ...}
+    aging = models.JSONField(default=dict)
+
+    class Meta:
+        db_table = 'inventory_snapshots'
+        ordering = ['fabric_type']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'method', 'fabric_type'], name='inventory_snapshot_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.method} {self.fabric_type}: {self.value}"
+
+
+class ProfitLossSnapshot(models.Model):
+    """One profit and loss line of a closed period.
+
+    ``category`` is the item master category for revenue and cost of
+    sales, the expense category for expenses, and blank for commission.
+    """
+
+    SECTIONS = [
+        ('revenue', 'Revenue'),
+        ('cogs', 'Cost of sales'),
+        ('expense', 'Expense'),
+        ('commission', 'Commission'),
+    ]
+
+    period = models.ForeignKey(ClosedPeriod, on_delete=models.CASCADE, related_name='profit_and_loss')
+    section = models.CharField(max_length=20, choices=SECTIONS)
+    category = models.CharField(max_length=100, blank=True, default='')
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        db_table = 'profit_loss_snapshots'
+        ordering = ['section', 'category']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'section', 'category'], name='profit_loss_snapshot_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.section} {self.category}: {self.amount}"
+
+
+class OpenDocumentSnapshot(models.Model):
+    """An invoice or bill left unpaid at the end of a closed period"""
+
+    DOCUMENT_TYPES = [
+        ('invoice', 'Invoice'),
+        ('bill', 'Bill'),
+    ]
+
+    period = models.ForeignKey(ClosedPeriod, on_delete=models.CASCADE, related_name='open_documents')
+    document_type = models.CharField(max_length=10, choices=DOCUMENT_TYPES)
+    document = models.PositiveIntegerField()
+    number = models.CharField(max_length=100)
+    party = models.PositiveIntegerField()
+    party_name = models.CharField(max_length=255)
+    date = models.DateField()
+    due_date = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2)
+    paid = models.DecimalField(max_digits=14, decimal_places=2)
+    outstanding = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        db_table = 'open_document_snapshots'
+        ordering = ['document_type', 'due_date', 'number']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'document_type', 'document'], name='open_document_snapshot_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.document_type} {self.number}: {self.outstanding}"
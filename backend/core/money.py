@@ -0,0 +1,8 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+CENT = Decimal('0.01')
+
+
+def money(value):
+    """Round to cents the way the database rounds ``numeric(…, 2)``"""
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
@@ -0,0 +1,145 @@
+from django.core import signing
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_filter(ordering, values):
+    """``Q`` matching rows strictly after ``values`` in ``ordering``.
+
+    ``ordering`` is a sequence of field names, each optionally prefixed with
+    ``-`` for descending order. This is the expanded form of the row-value
+    comparison ``(a, b, c) > (x, y, z)``, which every backend can serve from
+    a composite index.
+    """
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
+
+
+def _reverse(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination keyed on every column of ``ordering``.
+
+    Unlike DRF's ``CursorPagination``, which positions on the first ordering
+    field plus an offset, the cursor stores the full composite key of the
+    boundary row, so pages with many equal dates are still index range
+    scans. The last field must be unique (normally ``id``). Cursors are
+    signed; a tampered or malformed one is a ``400``.
+    """
+    ordering = ('-date', '-created_at', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor.'
+    cursor_salt = 'core.pagination'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, row, reverse):
+        values = [getattr(row, field.lstrip('-')) for field in self.ordering]
+        # Full isoformat: the boundary must round-trip to the microsecond
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+        token = signing.dumps({'v': values, 'r': reverse}, salt=self.cursor_salt)
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = signing.loads(token, salt=self.cursor_salt)
+            fields = [model._meta.get_field(field.lstrip('-')) for field in self.ordering]
+            if len(payload['v']) != len(fields):
+                raise ValueError
+            values = [field.to_python(value) for field, value in zip(fields, payload['v'])]
+            return values, bool(payload.get('r'))
+        except (signing.BadSignature, TypeError, ValueError, KeyError, DjangoValidationError):
+            raise ValidationError({self.cursor_query_param: self.invalid_cursor_message})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = _reverse(self.ordering) if reverse else list(self.ordering)
+        queryset = queryset.order_by(*[
+            F(field.lstrip('-')).desc() if field.startswith('-') else F(field).asc()
+            for field in ordering
+        ])
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(ordering, position))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        self.next_link = self.previous_link = None
+        if rows and has_next:
+            self.next_link = self.encode_cursor(rows[-1], reverse=False)
+        if rows and has_previous:
+            self.previous_link = self.encode_cursor(rows[0], reverse=True)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_link,
+            'previous': self.previous_link,
+            'results': data,
+        })
+
+
+class OptionalCursorPaginationMixin:
+    """Serve ``?pagination=cursor`` requests with keyset pagination.
+
+    Without the parameter the viewset keeps its configured page-number
+    pagination, so existing clients are unaffected. Cursor pages always use
+    ``cursor_pagination_class.ordering``; the ``ordering`` parameter is
+    ignored in that mode.
+    """
+    cursor_pagination_class = KeysetPagination
+
+    def is_cursor_paginated(self):
+        return self.request.query_params.get('pagination') == 'cursor'
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.is_cursor_paginated():
+                self._paginator = self.cursor_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def optionally_paginated_response(self, queryset):
+        """Response for custom list actions that are unpaginated by default"""
+        if self.is_cursor_paginated():
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
@@ -0,0 +1,32 @@
+from django.utils.dateparse import parse_date
+
+DATE_FORMAT_ERROR = 'Expected a date in YYYY-MM-DD format.'
+
+
+def query_date(params, name, errors):
+    """Parse query parameter ``name`` as a date; ``None`` when it is absent.
+
+    A malformed or impossible date (``2024-02-30``) is added to ``errors``
+    and also gives ``None``, so callers can collect every problem before
+    raising one ``ValidationError``.
+    """
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        errors[name] = DATE_FORMAT_ERROR
+    return parsed
+
+
+def query_dates(params, names, errors):
+    """``{name: date}`` for each of ``names`` given in ``params``"""
+    dates = {}
+    for name in names:
+        parsed = query_date(params, name, errors)
+        if parsed is not None:
+            dates[name] = parsed
+    return dates
@@ -0,0 +1,146 @@
+import functools
+import hashlib
+import time
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+# Models whose writes invalidate cached summaries, as ``app_label.ModelName``
+VERSIONED_MODELS = [
+    'core.DailyRollup',
+    'core.ClosedPeriod',
+    'accounts.Vendor',
+    'accounts.Customer',
+    'accounts.Broker',
+    'inventory.InventoryItem',
+    'inventory.ItemMaster',
+    'transactions.Transaction',
+    'transactions.PaymentRecord',
+    'transactions.CommissionPayment',
+    'transactions.Invoice',
+    'transactions.Bill',
+    'expenses.Expense',
+]
+
+# How long a computation may hold the lock, and how long waiters wait for it
+COMPUTE_LOCK_TIMEOUT = 30
+COMPUTE_WAIT_TIMEOUT = 15
+COMPUTE_POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+def _version_key(label):
+    return f'model-version:{label.lower()}'
+
+
+def _model_label(model):
+    return model if isinstance(model, str) else model._meta.label
+
+
+def get_versions(*models):
+    """Return the current version counter of each model, creating missing ones"""
+    keys = [_version_key(_model_label(model)) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seed from the clock so an evicted counter never reuses old keys
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(*models):
+    """Invalidate every cached response that depends on ``models``.
+
+    Called automatically on save/delete; bulk ``update()`` paths that bypass
+    model signals must call it themselves.
+    """
+    for model in models:
+        key = _version_key(_model_label(model))
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_version_on_commit(*models):
+    """``bump_version`` once the current transaction commits"""
+    db_transaction.on_commit(lambda: bump_version(*models))
+
+
+def _bump_on_commit(sender, **kwargs):
+    bump_version_on_commit(sender)
+
+
+def connect_signals():
+    for label in VERSIONED_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(_bump_on_commit, sender=model, dispatch_uid=f'response-cache-save-{label}')
+        post_delete.connect(_bump_on_commit, sender=model, dispatch_uid=f'response-cache-delete-{label}')
+
+
+def get_or_compute(key, compute, timeout):
+    """Return ``compute()`` cached under ``key``, computing it at most once at a time.
+
+    ``compute`` returns ``(cacheable, value)``. When several requests miss
+    together, the one that wins the lock computes while the rest poll the
+    cache for its result; if the winner fails they fall back to computing.
+    """
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, COMPUTE_LOCK_TIMEOUT):
+        deadline = time.monotonic() + COMPUTE_WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(COMPUTE_POLL_INTERVAL)
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            if cache.get(lock_key) is None:
+                break
+        return compute()[1]
+
+    try:
+        cacheable, value = compute()
+        if cacheable:
+            cache.set(key, value, timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def cached_response(*models):
+    """Cache a read-only viewset action until any of ``models`` is written.
+
+    The key covers the viewset, action, URL kwargs, query parameters, the
+    current date (for ``overdue`` style actions) and the version counters of
+    ``models``. Only ``200`` responses are cached.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            versions = get_versions(*models)
+            params = sorted(request.query_params.lists())
+            fingerprint = hashlib.sha1(repr((
+                type(self).__name__, method.__name__, sorted(kwargs.items()),
+                params, timezone.localdate().isoformat(), versions,
+            )).encode()).hexdigest()
+
+            def compute():
+                response = method(self, request, *args, **kwargs)
+                return response.status_code == status.HTTP_200_OK, (response.status_code, response.data)
+
+            status_code, data = get_or_compute(
+                f'response:{fingerprint}', compute, settings.SUMMARY_CACHE_TIMEOUT
+            )
+            return Response(data, status=status_code)
+        return wrapper
+    return decorator
@@ -0,0 +1,281 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.apps import apps
+from django.db import NotSupportedError, connections, router, transaction as db_transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth, TruncWeek, TruncYear
+from django.utils import timezone
+from .models import DailyRollup
+from .response_cache import bump_version_on_commit
+
+KINDS = [kind for kind, _ in DailyRollup.KINDS]
+PERIODS = {'day': None, 'week': TruncWeek, 'month': TruncMonth, 'year': TruncYear}
+BREAKDOWNS = ('party', 'category', 'method')
+
+# Series rows served per request
+ROLLUP_MAX_ROWS = 5000
+
+# Rows per upsert statement, well under SQLite's bound parameter limit
+_UPSERT_CHUNK = 100
+
+
+def entry(kind, date, amount, party=None, category='', method='', count=1):
+    """One rollup delta: ``((date, kind, party, category, method), count, amount)``"""
+    return (date, kind, party or 0, category or '', method or ''), count, amount
+
+
+def reversed_entries(entries):
+    return [(key, -count, -amount) for key, count, amount in entries]
+
+
+def entry_dates(entries):
+    return {date for (date, *_), _, _ in entries}
+
+
+def invoice_entries(invoice, payments=False):
+    """The sale and accrued commission of an invoice, with its payments if asked.
+
+    Payments are booked under the invoice's current customer and broker, so
+    reversing the entries of an edited invoice moves them with it.
+    """
+    entries = [entry('sale', invoice.date, invoice.total, invoice.customer_id)]
+    if invoice.broker_id and invoice.commission_amount:
+        entries.append(entry('commission', invoice.date, invoice.commission_amount, invoice.broker_id))
+    if payments:
+        entries += [
+            entry('receipt', payment.date, payment.amount, invoice.customer_id, method=payment.method)
+            for payment in invoice.payment_records.all()
+        ]
+        entries += [
+            entry('commission_payment', payment.date, payment.amount, invoice.broker_id, method=payment.method)
+            for payment in invoice.commission_payments.all()
+        ]
+    return entries
+
+
+def bill_entries(bill, payments=False):
+    """The purchase of a bill, with its payments if asked (see ``invoice_entries``)"""
+    entries = [entry('purchase', bill.date, bill.total, bill.vendor_id)]
+    if payments:
+        entries += [
+            entry('payment', payment.date, payment.amount, bill.vendor_id, method=payment.method)
+            for payment in bill.payment_records.all()
+        ]
+    return entries
+
+
+def expense_entries(expense):
+    return [entry('expense', expense.date, expense.amount,
+                  category=expense.category, method=expense.payment_method)]
+
+
+def filter_dates(rows, date_from, date_to):
+    """``rows`` dated within the inclusive range; either bound may be ``None``"""
+    if date_from:
+        rows = rows.filter(date__gte=date_from)
+    if date_to:
+        rows = rows.filter(date__lte=date_to)
+    return rows
+
+
+def post_rollups(entries):
+    """Add ``entries`` to the daily rollup, inside the caller's posting transaction.
+
+    Deltas for the same key are merged first, then every key is upserted,
+    adding to the stored count and amount, so concurrent postings never lose
+    an increment. Keys are written in sorted order, so two postings touching
+    the same rows cannot deadlock.
+
+    ``bulk_create(update_conflicts=True)`` can only overwrite columns, not
+    add to them, so the statement is written per backend: ``ON CONFLICT DO
+    UPDATE`` on PostgreSQL and SQLite, ``ON DUPLICATE KEY UPDATE`` on MySQL.
+    Other databases are not supported.
+    """
+    totals = defaultdict(lambda: [0, Decimal('0')])
+    for key, count, amount in entries:
+        totals[key][0] += count
+        totals[key][1] += amount
+    rows = [(key, count, amount) for key, (count, amount) in sorted(totals.items()) if count or amount]
+    if not rows:
+        return
+
+    connection = connections[router.db_for_write(DailyRollup)]
+    ops, quote = connection.ops, connection.ops.quote_name
+    table = quote(DailyRollup._meta.db_table)
+    key_columns = ', '.join(quote(column) for column in ('date', 'kind', 'party', 'category', 'method'))
+    count_column, amount_column, updated_column = quote('count'), quote('amount'), quote('updated_at')
+    if connection.vendor in ('postgresql', 'sqlite'):
+        upsert = (
+            f"ON CONFLICT ({key_columns}) DO UPDATE SET "
+            f"{count_column} = {table}.{count_column} + EXCLUDED.{count_column}, "
+            f"{amount_column} = {table}.{amount_column} + EXCLUDED.{amount_column}, "
+            f"{updated_column} = EXCLUDED.{updated_column}"
+        )
+    elif connection.vendor == 'mysql':
+        upsert = (
+            "ON DUPLICATE KEY UPDATE "
+            f"{count_column} = {count_column} + VALUES({count_column}), "
+            f"{amount_column} = {amount_column} + VALUES({amount_column}), "
+            f"{updated_column} = VALUES({updated_column})"
+        )
+    else:
+        raise NotSupportedError(f'The daily rollup cannot be posted on {connection.display_name}.')
+    now = ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), _UPSERT_CHUNK):
+            chunk = rows[start:start + _UPSERT_CHUNK]
+            params = []
+            for (date, kind, party, category, method), count, amount in chunk:
+                params += [
+                    ops.adapt_datefield_value(date), kind, party, category, method, count,
+                    ops.adapt_decimalfield_value(amount, 14, 2), now,
+                ]
+            cursor.execute(
+                f"INSERT INTO {table} ({key_columns}, {count_column}, {amount_column}, {updated_column}) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(chunk))} {upsert}",
+                params
+            )
+    bump_version_on_commit(DailyRollup)
+
+
+def rollup_rows(get_model=apps.get_model, date_from=None, date_to=None):
+    """Rollup rows aggregated from the posted documents, one query per kind.
+
+    ``get_model`` resolves ``app_label.ModelName``, so migrations can pass
+    their historical ``apps.get_model``.
+    """
+    Invoice = get_model('transactions.Invoice')
+    Bill = get_model('transactions.Bill')
+    PaymentRecord = get_model('transactions.PaymentRecord')
+    CommissionPayment = get_model('transactions.CommissionPayment')
+    Expense = get_model('expenses.Expense')
+    blank = Value('')
+
+    # kind -> (rows, party, category, method, amount)
+    sources = {
+        'sale': (Invoice.objects.all(), F('customer_id'), blank, blank, F('total')),
+        'purchase': (Bill.objects.all(), F('vendor_id'), blank, blank, F('total')),
+        'receipt': (
+            PaymentRecord.objects.filter(invoice__isnull=False),
+            F('invoice__customer_id'), blank, F('method'), F('amount')
+        ),
+        'payment': (
+            PaymentRecord.objects.filter(bill__isnull=False),
+            F('bill__vendor_id'), blank, F('method'), F('amount')
+        ),
+        'expense': (Expense.objects.all(), Value(0), F('category'), F('payment_method'), F('amount')),
+        'commission': (
+            Invoice.objects.filter(broker__isnull=False).exclude(commission_amount=0),
+            F('broker_id'), blank, blank, F('commission_amount')
+        ),
+        'commission_payment': (
+            CommissionPayment.objects.all(),
+            Coalesce(F('invoice__broker_id'), Value(0)), blank, F('method'), F('amount')
+        ),
+    }
+    for kind, (rows, party, category, method, amount) in sources.items():
+        groups = (
+            filter_dates(rows, date_from, date_to)
+            .order_by()
+            .annotate(r_party=party, r_category=category, r_method=method)
+            .values('date', 'r_party', 'r_category', 'r_method')
+            .annotate(r_count=Count('pk'), r_amount=Sum(amount))
+        )
+        for group in groups.iterator(chunk_size=2000):
+            yield {
+                'date': group['date'], 'kind': kind, 'party': group['r_party'],
+                'category': group['r_category'], 'method': group['r_method'],
+                'count': group['r_count'], 'amount': group['r_amount'] or 0,
+            }
+
+
+def rebuild_rollups(date_from=None, date_to=None, model=DailyRollup, get_model=apps.get_model, batch_size=1000):
+    """Replace the rollup rows of a date range (default: all) with freshly aggregated ones"""
+    with db_transaction.atomic():
+        filter_dates(model.objects.all(), date_from, date_to).delete()
+
+        written, batch = 0, []
+        for row in rollup_rows(get_model, date_from, date_to):
+            batch.append(model(**row))
+            if len(batch) >= batch_size:
+                model.objects.bulk_create(batch)
+                written, batch = written + len(batch), []
+        model.objects.bulk_create(batch)
+        bump_version_on_commit(DailyRollup)
+    return written + len(batch)
+
+
+def rollup_series(period, kinds, date_from=None, date_to=None, by=None, filters=None):
+    """Count and amount per period and kind (and ``by``), ordered by period"""
+    rows = filter_dates(DailyRollup.objects.filter(kind__in=kinds, **(filters or {})), date_from, date_to)
+    bucket = F('date') if PERIODS[period] is None else PERIODS[period]('date')
+    columns = ['period', 'kind', *([by] if by else [])]
+    return (
+        rows.order_by()
+        .annotate(period=bucket)
+        .values(*columns)
+        .annotate(total_count=Sum('count'), total_amount=Sum('amount'))
+        .order_by(*columns)
+    )
+
+
+def rollup_summary(date_from=None, date_to=None):
+    """Per-kind totals of a date range and the balances left open at its end.
+
+    One query over the rollup: ``open`` figures (sales less receipts,
+    purchases less payments, commission less commission paid) cover all
+    history up to ``date_to`` regardless of ``date_from``.
+    """
+    in_range = Q(date__gte=date_from) if date_from else Q()
+    rows = filter_dates(DailyRollup.objects.all(), None, date_to)
+    groups = (
+        rows.order_by()
+        .values('kind', 'category')
+        .annotate(
+            range_count=Coalesce(Sum('count', filter=in_range), 0),
+            range_amount=Sum('amount', filter=in_range),
+            to_date=Sum('amount'),
+        )
+    )
+    kinds = {kind: {'count': 0, 'amount': 0.0} for kind in KINDS}
+    to_date = dict.fromkeys(KINDS, 0.0)
+    by_category = {}
+    for group in groups:
+        amount = float(group['range_amount'] or 0)
+        kinds[group['kind']]['count'] += group['range_count']
+        kinds[group['kind']]['amount'] = round(kinds[group['kind']]['amount'] + amount, 2)
+        to_date[group['kind']] += float(group['to_date'] or 0)
+        if group['kind'] == 'expense' and group['range_count']:
+            by_category[group['category']] = round(amount, 2)
+    return {
+        'kinds': kinds,
+        'expenses_by_category': by_category,
+        'cash_in': kinds['receipt']['amount'],
+        'cash_out': round(
+            kinds['payment']['amount'] + kinds['expense']['amount'] + kinds['commission_payment']['amount'], 2
+        ),
+        'open': {
+            'receivables': round(to_date['sale'] - to_date['receipt'], 2),
+            'payables': round(to_date['purchase'] - to_date['payment'], 2),
+            'commission': round(to_date['commission'] - to_date['commission_payment'], 2),
+        },
+    }
+
+
+def expense_totals(date_from=None, date_to=None, category=None, method=None):
+    """``(totals, by_category)`` of expenses from the rollup, as ``summarize`` returns them"""
+    rows = filter_dates(DailyRollup.objects.filter(kind='expense'), date_from, date_to)
+    if category:
+        rows = rows.filter(category=category)
+    if method:
+        rows = rows.filter(method=method)
+    groups = rows.order_by().values('category').annotate(total_count=Sum('count'), total_amount=Sum('amount'))
+    by_category = {
+        group['category']: {'count': group['total_count'], 'amount': group['total_amount'] or 0}
+        for group in groups
+    }
+    totals = {
+        'count': sum(group['count'] for group in by_category.values()),
+        'amount': sum((group['amount'] for group in by_category.values()), Decimal('0')),
+    }
+    return totals, by_category
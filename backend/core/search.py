@@ -0,0 +1,179 @@
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connections
+from django.db.migrations.operations.base import Operation
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+# Text search configuration of the tsvector indexes and queries: no stemming
+# or stop words, so codes and names inside notes still match
+SEARCH_CONFIG = 'simple'
+
+
+def prefix_query(text):
+    """``tsquery`` matching every word of ``text`` as a prefix, or ``None``"""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return SearchQuery(
+        ' & '.join(f'{word}:*' for word in words), search_type='raw', config=SEARCH_CONFIG
+    )
+
+
+class RankedSearchFilter(filters.SearchFilter):
+    """``?search=`` served from trigram and full-text indexes on PostgreSQL.
+
+    ``search_fields`` keep their ``icontains`` meaning, which a ``pg_trgm``
+    GIN index answers; a related field (``customer__name``) is matched in
+    its own table and joined back by key, so each table uses its index.
+    ``search_text_fields`` are free text, matched word by word as prefixes
+    against a ``tsvector`` index. Results are ordered by relevance unless
+    ``?ordering=`` is given, so this backend goes after ``OrderingFilter``.
+
+    Other databases get the plain ``SearchFilter`` over both field lists,
+    ranked by how the whole search matches a field: exactly, as a prefix,
+    or anywhere.
+    """
+
+    def get_search_fields(self, view, request):
+        return [
+            *(super().get_search_fields(view, request) or ()),
+            *getattr(view, 'search_text_fields', ()),
+        ]
+
+    def filter_queryset(self, request, queryset, view):
+        if connections[queryset.db].vendor != 'postgresql':
+            queryset = super().filter_queryset(request, queryset, view)
+            return self.fallback_rank(request, queryset, view)
+
+        terms = self.get_search_terms(request)
+        fields = super().get_search_fields(view, request) or ()
+        text_fields = getattr(view, 'search_text_fields', ())
+        if not terms or not (fields or text_fields):
+            return queryset
+
+        vectors = {f'_search_{field}': SearchVector(field, config=SEARCH_CONFIG) for field in text_fields}
+        if vectors:
+            queryset = queryset.annotate(**vectors)
+        for term in terms:
+            condition = Q()
+            for field in fields:
+                condition |= self.term_condition(queryset.model, field, term)
+            query = prefix_query(term)
+            if query is not None:
+                for alias in vectors:
+                    condition |= Q(**{alias: query})
+            queryset = queryset.filter(condition)
+
+        search = ' '.join(terms)
+        scores = [TrigramSimilarity(field, search) for field in fields]
+        query = prefix_query(search)
+        if query is not None:
+            scores += [SearchRank(F(alias), query) for alias in vectors]
+        if not scores:
+            return queryset
+        rank = scores[0] if len(scores) == 1 else Greatest(*scores)
+        queryset = queryset.annotate(search_rank=Coalesce(rank, Value(0.0), output_field=FloatField()))
+        return self.ranked(request, queryset)
+
+    def fallback_rank(self, request, queryset, view):
+        """Order ``queryset`` by exact (3), prefix (2) and substring (1) matches, best field first"""
+        terms = self.get_search_terms(request)
+        fields = self.get_search_fields(view, request)
+        if not terms or not fields:
+            return queryset
+        search = ' '.join(terms)
+        scores = [
+            Case(
+                When(**{f'{field}__iexact': search}, then=Value(3)),
+                When(**{f'{field}__istartswith': search}, then=Value(2)),
+                When(**{f'{field}__icontains': search}, then=Value(1)),
+                default=Value(0),
+            )
+            for field in fields
+        ]
+        rank = scores[0] if len(scores) == 1 else Greatest(*scores)
+        queryset = queryset.annotate(search_rank=Coalesce(rank, Value(0), output_field=FloatField()))
+        return self.ranked(request, queryset)
+
+    def ranked(self, request, queryset):
+        """``queryset`` by descending ``search_rank``, unless ``?ordering=`` was given"""
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        return queryset.order_by('-search_rank', *ordering)
+
+    def term_condition(self, model, field, term):
+        """``icontains`` on ``field``, through a subquery on the related table for joined fields"""
+        relation, _, remainder = field.partition('__')
+        if remainder:
+            related = model._meta.get_field(relation)
+            if related.many_to_one:
+                matches = related.related_model._default_manager.filter(
+                    self.term_condition(related.related_model, remainder, term)
+                ).values('pk')
+                return Q(**{f'{relation}__in': matches})
+        return Q(**{f'{field}__icontains': term})
+
+
+class SearchIndexes(Operation):
+    """Create search indexes on PostgreSQL; a no-op elsewhere.
+
+    All are expression indexes matching what the queries compile to:
+    ``UPPER(column::text)`` for ``icontains`` on ``trigram`` columns, the
+    ``tsvector`` of ``search_text_fields`` for ``text`` columns, and a
+    ``text_pattern_ops`` B-tree on ``UPPER(column::text)`` for
+    ``istartswith`` on ``prefix`` columns. Indexes
+    are built ``CONCURRENTLY``, so the migration must set ``atomic = False``.
+    """
+    reduces_to_sql = True
+    reversible = True
+
+    def __init__(self, table, trigram=(), text=(), prefix=()):
+        self.table = table
+        self.trigram = list(trigram)
+        self.text = list(text)
+        self.prefix = list(prefix)
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def index_names(self):
+        return (
+            [f'{self.table}_{column}_trgm' for column in self.trigram]
+            + [f'{self.table}_{column}_tsv' for column in self.text]
+            + [f'{self.table}_{column}_prefix' for column in self.prefix]
+        )
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        quote = schema_editor.quote_name
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in self.trigram:
+            schema_editor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(f"{self.table}_{column}_trgm")} '
+                f'ON {quote(self.table)} USING gin ((UPPER({quote(column)}::text)) gin_trgm_ops)'
+            )
+        for column in self.text:
+            schema_editor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(f"{self.table}_{column}_tsv")} '
+                f'ON {quote(self.table)} USING gin '
+                f"(to_tsvector('{SEARCH_CONFIG}'::regconfig, COALESCE({quote(column)}, '')))"
+            )
+        for column in self.prefix:
+            schema_editor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(f"{self.table}_{column}_prefix")} '
+                f'ON {quote(self.table)} ((UPPER({quote(column)}::text)) text_pattern_ops)'
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for name in self.index_names():
+            schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(name)}')
+
+    def describe(self):
+        return f'Create search indexes on {self.table}'
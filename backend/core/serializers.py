@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import User
+from .models import ClosedPeriod, OpenDocumentSnapshot, PartyBalanceSnapshot, User
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -22,3 +22,37 @@ class UserCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         user = User.objects.create_user(**validated_data)
         return user
+
+
+class ClosedPeriodSerializer(serializers.ModelSerializer):
+    """Serializer for ClosedPeriod model"""
+    closed_by_name = serializers.CharField(source='closed_by.name', read_only=True, default=None)
+
+    class Meta:
+        model = ClosedPeriod
+        fields = ['id', 'start_date', 'end_date', 'closed_at', 'closed_by', 'closed_by_name']
+        read_only_fields = fields
+
+
+class ClosePeriodSerializer(serializers.Serializer):
+    """Input for closing a month, e.g. ``{"month": "2026-01"}``"""
+    month = serializers.DateField(input_formats=['%Y-%m', 'iso-8601'])
+
+
+class PartyBalanceSnapshotSerializer(serializers.ModelSerializer):
+    """Serializer for PartyBalanceSnapshot model"""
+
+    class Meta:
+        model = PartyBalanceSnapshot
+        fields = ['party_type', 'party', 'name', 'balance']
+
+
+class OpenDocumentSnapshotSerializer(serializers.ModelSerializer):
+    """Serializer for OpenDocumentSnapshot model"""
+
+    class Meta:
+        model = OpenDocumentSnapshot
+        fields = [
+            'document_type', 'document', 'number', 'party', 'party_name',
+            'date', 'due_date', 'total', 'paid', 'outstanding'
+        ]
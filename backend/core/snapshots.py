@@ -0,0 +1,283 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction as db_transaction
+from django.db.models import F, Max, Min, OuterRef, Subquery, Sum
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from accounts.models import Broker, Customer, Vendor
+from inventory.models import InventoryItem, ItemMaster
+from inventory.valuation import METHODS, MEASURES, ValuationRows, format_row
+from transactions.models import CommissionPayment, Invoice, Bill, PaymentRecord, Transaction
+from .analytics import pivot
+from .closing import PERIOD_LOCK_ID
+from .models import (
+    ClosedPeriod, DailyRollup, InventorySnapshot, OpenDocumentSnapshot,
+    PartyBalanceSnapshot, PeriodLock, ProfitLossSnapshot
+)
+from .response_cache import bump_version_on_commit
+from .rollups import expense_totals, filter_dates
+from .summaries import sum_subquery
+
+SECTIONS = [section for section, _ in ProfitLossSnapshot.SECTIONS]
+
+# Snapshot rows per INSERT
+_BATCH = 1000
+
+
+def month_bounds(day):
+    """First and last day of the month containing ``day``"""
+    start = day.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def _party_balances(period):
+    end = period.end_date
+    transactions = Transaction.objects.filter(date__lte=end)
+    signed = Transaction.signed_amount_expression()
+    parties = {
+        'customer': Customer.objects.annotate(snapshot_balance=sum_subquery(transactions, 'customer', signed)),
+        'vendor': Vendor.objects.annotate(snapshot_balance=sum_subquery(transactions, 'vendor', signed)),
+        'broker': Broker.objects.annotate(
+            snapshot_balance=sum_subquery(Invoice.objects.filter(date__lte=end), 'broker', F('commission_amount'))
+            - sum_subquery(CommissionPayment.objects.filter(date__lte=end), 'invoice__broker', F('amount'))
+        ),
+    }
+    for party_type, rows in parties.items():
+        rows = rows.exclude(snapshot_balance=0).order_by().values_list('pk', 'name', 'snapshot_balance')
+        for pk, name, balance in rows.iterator(chunk_size=2000):
+            yield PartyBalanceSnapshot(
+                period=period, party_type=party_type, party=pk, name=name, balance=balance
+            )
+
+
+def _inventory(period):
+    for method in METHODS:
+        rows = ValuationRows(
+            InventoryItem.objects.all(), method, period.end_date, period.start_date, 'fabric_type'
+        )
+        for row in rows:
+            yield InventorySnapshot(
+                period=period, method=method, fabric_type=row['fabric_type'], lots=row['lots'],
+                aging=format_row(row)['aging'], **{name: row[name] or 0 for name in MEASURES}
+            )
+
+
+def _open_documents(period):
+    end = period.end_date
+    documents = (
+        ('invoice', Invoice, 'invoice_number', 'customer'),
+        ('bill', Bill, 'bill_number', 'vendor'),
+    )
+    for document_type, model, number_field, party_field in documents:
+        rows = (
+            model.objects.filter(date__lte=end)
+            .annotate(paid_to_date=sum_subquery(PaymentRecord.objects.filter(date__lte=end), document_type, F('amount')))
+            .filter(total__gt=F('paid_to_date'))
+            .order_by()
+            .values_list(
+                'pk', number_field, f'{party_field}_id', f'{party_field}__name',
+                'date', 'due_date', 'total', 'paid_to_date'
+            )
+        )
+        for pk, number, party, party_name, date, due_date, total, paid in rows.iterator(chunk_size=2000):
+            yield OpenDocumentSnapshot(
+                period=period, document_type=document_type, document=pk, number=number,
+                party=party, party_name=party_name, date=date, due_date=due_date,
+                total=total, paid=paid, outstanding=total - paid
+            )
+
+
+def _profit_and_loss(period):
+    for (section, category), amount in live_profit_and_loss(period.start_date, period.end_date).items():
+        if amount:
+            yield ProfitLossSnapshot(period=period, section=section, category=category, amount=amount)
+
+
+def _write(model, objects):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= _BATCH:
+            model.objects.bulk_create(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+
+
+def _lock_periods():
+    """Lock the ``PeriodLock`` row for update, for the rest of the transaction"""
+    lock, _ = PeriodLock.objects.select_for_update().get_or_create(pk=PERIOD_LOCK_ID)
+    return lock
+
+
+def close_period(month, user=None):
+    """Close the month containing ``month``: freeze its postings and write its snapshots.
+
+    Months close in order and only once they have ended. The first close
+    may be any month; everything dated before it is closed along with it.
+    """
+    start, end = month_bounds(month)
+    if end >= timezone.localdate():
+        raise ValidationError({'month': 'Only months that have ended can be closed.'})
+    with db_transaction.atomic():
+        # Waits for postings holding the shared lock from ensure_open
+        lock = _lock_periods()
+        latest = ClosedPeriod.objects.order_by('-end_date').first()
+        if latest is not None and start <= latest.end_date:
+            raise ValidationError({'month': f'{start:%Y-%m} is already closed.'})
+        if latest is not None and start != latest.end_date + timedelta(days=1):
+            raise ValidationError({
+                'month': f'Close {latest.end_date + timedelta(days=1):%Y-%m} first; months close in order.'
+            })
+        period = ClosedPeriod.objects.create(start_date=start, end_date=end, closed_by=user)
+        lock.closed_through = end
+        lock.save(update_fields=['closed_through'])
+        _write(PartyBalanceSnapshot, _party_balances(period))
+        _write(InventorySnapshot, _inventory(period))
+        _write(ProfitLossSnapshot, _profit_and_loss(period))
+        _write(OpenDocumentSnapshot, _open_documents(period))
+        bump_version_on_commit(ClosedPeriod)
+    return period
+
+
+def reopen_period(period):
+    """Delete the latest closed period and its snapshots, unfreezing its postings"""
+    with db_transaction.atomic():
+        lock = _lock_periods()
+        latest = ClosedPeriod.objects.order_by('-end_date').first()
+        if latest.pk != period.pk:
+            raise ValidationError(f'Only the latest closed period ({latest}) can be reopened.')
+        period.delete()
+        lock.closed_through = (
+            ClosedPeriod.objects.order_by('-end_date').values_list('end_date', flat=True).first()
+        )
+        lock.save(update_fields=['closed_through'])
+        bump_version_on_commit(ClosedPeriod)
+
+
+def balance_snapshot(party_type, party, before):
+    """``(end_date, balance)`` of a party at the latest period closed before ``before``, or ``None``"""
+    balance = PartyBalanceSnapshot.objects.filter(
+        period=OuterRef('pk'), party_type=party_type, party=party
+    ).values('balance')[:1]
+    snapshot = (
+        ClosedPeriod.objects.filter(end_date__lt=before)
+        .annotate(balance=Subquery(balance))
+        .order_by('-end_date')
+        .values_list('end_date', 'balance')
+        .first()
+    )
+    if snapshot is None:
+        return None
+    end_date, balance = snapshot
+    return end_date, balance or Decimal('0')
+
+
+def inventory_snapshot(method, as_of, period_from):
+    """``(totals, groups)`` by fabric type from the snapshot of a closed month, or ``None``.
+
+    Only a valuation of exactly a closed month (``period_from`` its first
+    day, ``as_of`` its last) has a snapshot.
+    """
+    snapshots = InventorySnapshot.objects.filter(
+        period__start_date=period_from, period__end_date=as_of, method=method
+    )
+    groups = []
+    for snapshot in snapshots:
+        group = {
+            'fabric_type': snapshot.fabric_type,
+            'lots': snapshot.lots,
+            **{name: round(float(getattr(snapshot, name)), 2) for name in MEASURES},
+        }
+        group['gross_margin'] = round(group['revenue'] - group['cogs'], 2)
+        group['aging'] = snapshot.aging
+        groups.append(group)
+    if not groups:
+        return None
+
+    totals = {'lots': sum(group['lots'] for group in groups)}
+    for name in (*MEASURES, 'gross_margin'):
+        totals[name] = round(sum(group[name] for group in groups), 2)
+    totals['aging'] = {
+        label: {
+            figure: round(sum(group['aging'][label][figure] for group in groups), 2)
+            for figure in ('meters', 'value')
+        }
+        for label in groups[0]['aging']
+    }
+    return totals, groups
+
+
+def live_profit_and_loss(date_from, date_to):
+    """``{(section, category): amount}`` computed from the documents and the daily rollup.
+
+    Revenue and cost of sales are grouped by the item master category of
+    the fabric type (FIFO cost), expenses by expense category; commission
+    is accrued by invoice date.
+    """
+    lines = defaultdict(Decimal)
+    _, revenue = pivot('sales', ['category'], ['amount'], date_from, date_to)
+    for group in revenue:
+        lines[('revenue', group['d_category'] or '')] += group['m_amount'] or 0
+
+    # Lowest code wins, as in core.analytics
+    categories = dict(ItemMaster.objects.order_by('-code').values_list('name', 'category'))
+    cogs = ValuationRows(InventoryItem.objects.all(), 'fifo', date_to, date_from, 'fabric_type')
+    for row in cogs:
+        lines[('cogs', categories.get(row['fabric_type'], ''))] += round(row['cogs'] or 0, 2)
+
+    _, expenses = expense_totals(date_from, date_to)
+    for category, group in expenses.items():
+        lines[('expense', category)] += group['amount']
+
+    commission = filter_dates(DailyRollup.objects.filter(kind='commission'), date_from, date_to)
+    lines[('commission', '')] += commission.aggregate(total=Sum('amount'))['total'] or 0
+    return lines
+
+
+def profit_and_loss(date_from, date_to):
+    """Profit and loss lines over a range, and the closed span and live ranges behind them.
+
+    Closed months inside the range are read from their snapshots; only the
+    rest is computed live. Closed months are contiguous, so that is at most
+    a head before them and a tail after.
+    """
+    periods = ClosedPeriod.objects.filter(start_date__gte=date_from, end_date__lte=date_to)
+    span = periods.aggregate(first=Min('start_date'), last=Max('end_date'))
+    lines = defaultdict(Decimal)
+    segments = [(date_from, date_to)]
+    if span['first'] is not None:
+        snapshots = (
+            ProfitLossSnapshot.objects.filter(period__in=periods)
+            .order_by()
+            .values('section', 'category')
+            .annotate(total=Sum('amount'))
+        )
+        for row in snapshots:
+            lines[(row['section'], row['category'])] += row['total']
+        segments = [
+            (date_from, span['first'] - timedelta(days=1)),
+            (span['last'] + timedelta(days=1), date_to),
+        ]
+
+    live = [(start, end) for start, end in segments if start <= end]
+    for start, end in live:
+        for key, amount in live_profit_and_loss(start, end).items():
+            lines[key] += amount
+    closed = (span['first'], span['last']) if span['first'] is not None else None
+    return lines, closed, live
+
+
+def format_profit_and_loss(lines):
+    """Sections with totals and amounts by category, gross profit and net profit"""
+    sections = {section: {'total': 0.0, 'by_category': {}} for section in SECTIONS}
+    for (section, category), amount in sorted(lines.items()):
+        if amount:
+            sections[section]['by_category'][category] = round(float(amount), 2)
+            sections[section]['total'] = round(sections[section]['total'] + float(amount), 2)
+    gross_profit = round(sections['revenue']['total'] - sections['cogs']['total'], 2)
+    return {
+        **sections,
+        'gross_profit': gross_profit,
+        'net_profit': round(gross_profit - sections['expense']['total'] - sections['commission']['total'], 2),
+    }
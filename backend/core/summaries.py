@@ -0,0 +1,63 @@
+from decimal import Decimal
+from django.db import models
+from django.db.models import OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+
+def summarize(queryset, measures, group_field=None, group_values=()):
+    """Compute totals and per-group figures in a single aggregate query.
+
+    ``measures`` maps an output name to ``(AggregateClass, field)``, e.g.
+    ``{'count': (Count, 'id'), 'amount': (Sum, 'total')}``. Every measure
+    is computed over the whole queryset and once per ``group_values``
+    entry as a conditional aggregate (``filter=Q(group_field=value)``).
+
+    Returns ``(totals, groups)`` where ``groups`` maps each group value to
+    its own measure dict. Missing sums are reported as ``0``.
+    """
+    aggregates = {}
+    for name, (function, field) in measures.items():
+        aggregates[f'{name}__all'] = function(field)
+        for index, value in enumerate(group_values):
+            aggregates[f'{name}__g{index}'] = function(
+                field, filter=Q(**{group_field: value})
+            )
+
+    row = queryset.order_by().aggregate(**aggregates)
+
+    totals = {name: row[f'{name}__all'] or 0 for name in measures}
+    groups = {
+        value: {name: row[f'{name}__g{index}'] or 0 for name in measures}
+        for index, value in enumerate(group_values)
+    }
+    return totals, groups
+
+
+def sum_subquery(queryset, outer_field, expression, places=2):
+    """Correlated ``SUM`` over ``queryset`` grouped on the outer row's pk.
+
+    Rounded to ``places`` decimals in the database; ``None`` leaves it unrounded.
+    """
+    totals = (
+        queryset.filter(**{outer_field: OuterRef('pk')})
+        .order_by()
+        .values(outer_field)
+        .annotate(total=Sum(expression))
+        .values('total')
+    )
+    money = models.DecimalField(max_digits=14, decimal_places=2)
+    total = Subquery(totals, output_field=money)
+    if places is not None:
+        total = Round(total, places)
+    return Coalesce(total, Value(Decimal('0')), output_field=money)
+
+
+class SummaryMixin:
+    """ViewSet mixin providing the queryset summary actions aggregate over.
+
+    The active filterset (including its date ranges), search and ordering
+    backends are applied, so a summary always matches the list it describes.
+    """
+
+    def get_summary_queryset(self):
+        return self.filter_queryset(self.get_queryset())
@@ -0,0 +1,609 @@
+import asyncio
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, timedelta
+from urllib.parse import parse_qs, urlsplit
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from accounts.models import Broker, Customer, Vendor
+from inventory.models import InventoryItem
+from transactions.models import Invoice, Transaction
+from .changes import record_changes
+from .events import get_broker
+from .models import Change, ClosedPeriod, PeriodLock, RevokedToken, User
+from .snapshots import month_bounds
+
+
+class ResponseCacheTests(APITestCase):
+    """Cached summaries are served until a committed write bumps their models' version"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user('cache', password='cache'))
+        self.customer = Customer.objects.create(name='Customer', contact='c')
+
+    def create_invoice(self, number, total):
+        with self.captureOnCommitCallbacks(execute=True):
+            Invoice.objects.create(
+                invoice_number=number, customer=self.customer, date=date.today(),
+                due_date=date.today(), total=Decimal(total)
+            )
+
+    def test_write_invalidates_cached_summary(self):
+        self.create_invoice('INV-1', '100')
+        self.assertEqual(self.client.get('/api/invoices/summary/').data['total_invoices'], 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/invoices/summary/').data['total_invoices'], 1)
+        self.assertEqual(len(queries), 0)
+
+        self.create_invoice('INV-2', '50')
+        summary = self.client.get('/api/invoices/summary/').data
+        self.assertEqual(summary['total_invoices'], 2)
+        self.assertEqual(summary['total_amount'], 150.0)
+
+    def test_deploy_check_requires_shared_cache(self):
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'response_cache',
+        }}
+        with override_settings(CACHES=local):
+            self.assertIn('core.E001', [error.id for error in run_checks(include_deployment_checks=True)])
+        with override_settings(CACHES=shared):
+            self.assertNotIn('core.E001', [error.id for error in run_checks(include_deployment_checks=True)])
+
+
+class KeysetPaginationTests(APITestCase):
+    """``?pagination=cursor`` walks every row once, in order, in both directions"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('pages', password='pages'))
+        customer = Customer.objects.create(name='Customer', contact='c')
+        today = date.today()
+        # Two dates, each with rows sharing date and created_at: only id breaks the ties
+        for n in range(7):
+            Invoice.objects.create(
+                invoice_number=f'INV-{n}', customer=customer, date=today - timedelta(days=n % 2),
+                due_date=today, total=Decimal('10')
+            )
+        Invoice.objects.update(created_at=timezone.now())
+        self.expected = list(
+            Invoice.objects.order_by('-date', '-created_at', '-id').values_list('pk', flat=True)
+        )
+
+    def walk(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append(response.data)
+            url = response.data['next']
+        return pages
+
+    def test_cursor_round_trip_with_ties(self):
+        pages = self.walk('/api/invoices/?pagination=cursor&page_size=2')
+        served = [row['id'] for page in pages for row in page['results']]
+        self.assertEqual(served, self.expected)
+        self.assertIsNone(pages[0]['previous'])
+
+        back = self.client.get(pages[-1]['previous']).data
+        self.assertEqual([row['id'] for row in back['results']], self.expected[4:6])
+        self.assertEqual(self.client.get(back['next']).data['results'], pages[-1]['results'])
+
+    def test_invalid_cursor_is_rejected(self):
+        next_url = self.client.get('/api/invoices/?pagination=cursor&page_size=2').data['next']
+        token = parse_qs(urlsplit(next_url).query)['cursor'][0]
+        payload, signature = token.split(':', 1)
+        forged = urlsafe_b64encode(
+            urlsafe_b64decode(payload + '==').replace(b'"r":false', b'"r":true')
+        ).decode().rstrip('=')
+        self.assertNotEqual(forged, payload)
+        for cursor in ('garbage', f'{forged}:{signature}', token[:-1]):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/invoices/', {'pagination': 'cursor', 'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.data)
+
+
+class ChangeFeedTests(APITestCase):
+    """The feed's cursor waits on unsettled gaps and pruned cursors are told to resync"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('feed', password='feed'))
+        self.vendors = [Vendor.objects.create(name=f'Vendor {n}', contact='v') for n in range(3)]
+        self.ids = list(Change.objects.order_by('id').values_list('id', flat=True))
+
+    def feed(self, since):
+        return self.client.get(f'/api/changes/?since={since}').data
+
+    def age(self, days=0, seconds=0):
+        Change.objects.update(created_at=timezone.now() - timedelta(days=days, seconds=seconds))
+
+    def test_cursor_stops_at_an_unsettled_gap(self):
+        # The middle write is still in flight (or rolled back)
+        Change.objects.filter(id=self.ids[1]).delete()
+        data = self.feed(self.ids[0] - 1)
+        self.assertEqual(data['cursor'], self.ids[0])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(
+            sorted(row['id'] for row in data['changes']['vendors']),
+            sorted(vendor.pk for vendor in self.vendors[::2])
+        )
+
+        self.age(seconds=31)
+        data = self.feed(self.ids[0])
+        self.assertEqual(data['cursor'], self.ids[2])
+        self.assertFalse(data['resync'])
+
+    def test_current_cursor_skips_unsettled_changes(self):
+        self.assertEqual(self.client.get('/api/changes/').data['cursor'], 0)
+        self.age(seconds=31)
+        self.assertEqual(self.client.get('/api/changes/').data['cursor'], self.ids[-1])
+
+    def test_pruned_cursor_is_told_to_resync(self):
+        self.age(days=31)
+        call_command('prune_changes', stdout=StringIO())
+        self.assertEqual(list(Change.objects.values_list('id', flat=True)), self.ids[-1:])
+
+        data = self.feed(self.ids[0])
+        self.assertTrue(data['resync'])
+        self.assertEqual((data['changes'], data['deleted']), ({}, {}))
+
+        Vendor.objects.create(name='Vendor 3', contact='v')
+        data = self.feed(self.ids[-1])
+        self.assertFalse(data['resync'])
+        self.assertEqual(len(data['changes']['vendors']), 1)
+
+
+class BootstrapTests(APITestCase):
+    """The startup snapshot holds the lots that can still be billed or sold"""
+
+    def test_sold_out_billed_lots_are_left_out(self):
+        self.client.force_authenticate(User.objects.create_user('boot', password='boot'))
+        vendor = Vendor.objects.create(name='Vendor', contact='v')
+        for lot, is_billed, available in (
+            ('UNBILLED', False, '0'), ('IN-STOCK', True, '5'), ('SOLD-OUT', True, '0'),
+        ):
+            InventoryItem.objects.create(
+                lot_number=lot, fabric_type='Cotton', meters=Decimal('10'), unit_price=Decimal('1'),
+                vendor=vendor, received_date=date.today(), is_billed=is_billed,
+                available_meters=Decimal(available)
+            )
+        inventory = self.client.get('/api/bootstrap/').data['inventory']
+        self.assertEqual(sorted(row['lot_number'] for row in inventory), ['IN-STOCK', 'UNBILLED'])
+
+
+
+class BooksMixin:
+    """A vendor, customer, broker and three received lots, plus document posting"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('books', password='books'))
+        self.vendor = Vendor.objects.create(name='Vendor', contact='v')
+        self.customer = Customer.objects.create(name='Customer', contact='c')
+        self.broker = Broker.objects.create(name='Broker')
+        self.lots = [
+            InventoryItem.objects.create(
+                lot_number=f'LOT-{n}', fabric_type='Cotton', meters=Decimal('100'),
+                unit_price=Decimal('5'), vendor=self.vendor, received_date=self.received,
+                available_meters=Decimal('100')
+            ).pk
+            for n in range(3)
+        ]
+
+    received = date.today()
+
+    def post(self, url, document, lots, day=None):
+        day = (day or date.today()).isoformat()
+        document.update(
+            date=day, due_date=day,
+            items=[{'inventory_item': lot, 'meters': '1', 'price': '7'} for lot in lots],
+        )
+        response = self.client.post(url, document, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def post_invoice(self, number, lots, day=None):
+        return self.post('/api/invoices/', {
+            'invoice_number': number, 'customer': self.customer.pk, 'broker': self.broker.pk,
+            'commission_type': 'Percentage', 'commission_value': '2',
+        }, lots, day)
+
+    def post_bill(self, number, lots, day=None):
+        return self.post('/api/bills/', {'bill_number': number, 'vendor': self.vendor.pk}, lots, day)
+
+
+class SparseFieldsetTests(BooksMixin, APITestCase):
+    """``?fields=`` narrows and ``?expand=`` nests, with the joins derived from the shape"""
+
+    def setUp(self):
+        super().setUp()
+        self.post_invoice('INV-1', self.lots[:2])
+        other = Customer.objects.create(name='Other', contact='o')
+        self.post('/api/invoices/', {'invoice_number': 'INV-2', 'customer': other.pk}, self.lots[2:])
+
+    def get(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/invoices/?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['results'], len(queries)
+
+    def test_fields_keep_only_the_listed_keys(self):
+        rows, _ = self.get('fields=id,invoice_number,items.meters')
+        self.assertEqual(len(rows), 2)
+        for row in rows:
+            self.assertEqual(set(row), {'id', 'invoice_number', 'items'})
+            self.assertTrue(row['items'])
+            self.assertEqual([set(item) for item in row['items']], [{'meters'}] * len(row['items']))
+
+    def test_expand_nests_without_extra_queries(self):
+        plain, plain_queries = self.get('fields=id,customer')
+        expanded, expanded_queries = self.get('fields=id,customer&expand=customer')
+        self.assertEqual(expanded_queries, plain_queries)
+        by_id = {row['id']: row['customer'] for row in plain}
+        for row in expanded:
+            self.assertEqual(row['customer']['id'], by_id[row['id']])
+            self.assertIn('name', row['customer'])
+
+    def test_unknown_fields_are_rejected(self):
+        for query in ('fields=id,nope', 'fields=items.nope', 'expand=total', 'expand=nope'):
+            with self.subTest(query):
+                response = self.client.get(f'/api/invoices/?{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('fields', response.data)
+
+
+class ConditionalGetTests(APITestCase):
+    """A stale ``If-None-Match`` gets the new body once a write has committed"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user('etag', password='etag'))
+        self.expenses = [
+            self.client.post('/api/expenses/', {
+                'date': date.today().isoformat(), 'category': 'Packing', 'description': f'Tape {n}',
+                'amount': '4', 'payment_method': 'Cash',
+            }).data['id']
+            for n in range(2)
+        ]
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def assertRevalidates(self, url, write):
+        """``url`` is ``304`` until ``write`` commits, then ``200`` with a new ETag"""
+        response = self.get(url)
+        etag = response['ETag']
+        self.assertEqual(self.get(url, etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertLess(write().status_code, 300)
+        fresh = self.get(url, etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], etag)
+        self.assertEqual(self.get(url, fresh['ETag']).status_code, 304)
+        return fresh.data
+
+    def test_update_changes_list_and_detail_etags(self):
+        first = f'/api/expenses/{self.expenses[0]}/'
+        data = self.assertRevalidates(
+            '/api/expenses/', lambda: self.client.patch(first, {'description': 'Boxes'})
+        )
+        self.assertIn('Boxes', [row['description'] for row in data['results']])
+        data = self.assertRevalidates(first, lambda: self.client.patch(first, {'amount': '9'}))
+        self.assertEqual(data['amount'], '9.00')
+
+    def test_delete_changes_list_etag(self):
+        # The older row: the list's latest updated_at stays the same
+        data = self.assertRevalidates(
+            '/api/expenses/', lambda: self.client.delete(f'/api/expenses/{self.expenses[0]}/')
+        )
+        self.assertEqual([row['id'] for row in data['results']], self.expenses[1:])
+        self.assertEqual(self.get(f'/api/expenses/{self.expenses[0]}/').status_code, 404)
+
+    def test_embedded_model_write_changes_etag(self):
+        customer = Customer.objects.create(name='Customer', contact='c')
+        Transaction.objects.create(
+            transaction_type='Invoice', date=date.today(), amount=Decimal('5'), customer=customer
+        )
+        data = self.assertRevalidates(
+            '/api/transactions/',
+            lambda: self.client.patch(f'/api/customers/{customer.pk}/', {'name': 'Renamed'})
+        )
+        self.assertEqual([row['customer_name'] for row in data['results']], ['Renamed'])
+
+
+class SearchFallbackTests(APITestCase):
+    """Off PostgreSQL, ``?search=`` keeps ``icontains`` matching and ranks exact, then prefix matches"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('search', password='search'))
+        vendor = Vendor.objects.create(name='Vendor', contact='v')
+        for n, (lot_number, fabric_type) in enumerate((
+            ('XLOT-1', 'Cotton'), ('LOT-10', 'Cotton'), ('OTHER', 'Silk'), ('LOT-1', 'Cotton'), ('L-2', 'Lot-1 blend'),
+        )):
+            InventoryItem.objects.create(
+                lot_number=lot_number, fabric_type=fabric_type, meters=Decimal('1'), unit_price=Decimal('1'),
+                vendor=vendor, received_date=date.today() - timedelta(days=n), available_meters=Decimal('1')
+            )
+
+    def lot_numbers(self, query):
+        response = self.client.get(f'/api/inventory/?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['lot_number'] for row in response.data['results']]
+
+    def test_matches_are_ranked(self):
+        # Ties keep the view's ordering, newest first
+        self.assertEqual(self.lot_numbers('search=lot-1'), ['LOT-1', 'LOT-10', 'L-2', 'XLOT-1'])
+        self.assertEqual(self.lot_numbers('search=silk'), ['OTHER'])
+        self.assertEqual(self.lot_numbers('search=nothing'), [])
+
+    def test_explicit_ordering_wins(self):
+        self.assertEqual(
+            self.lot_numbers('search=lot-1&ordering=received_date'), ['L-2', 'LOT-1', 'LOT-10', 'XLOT-1']
+        )
+
+
+class AutocompleteTests(APITestCase):
+    """Case-insensitive prefix matches per kind, capped by ``limit``"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('picker', password='picker'))
+        vendor = Vendor.objects.create(name='Lotus Mills', contact='v')
+        for name in ('Shah Fabric', 'shaheen Traders', 'Ali Shah'):
+            Customer.objects.create(name=name, contact='c')
+        for lot_number, available in (('LOT-2', '5'), ('lot-1', '0'), ('XLOT-3', '5'), ('LOT-10', '5')):
+            InventoryItem.objects.create(
+                lot_number=lot_number, fabric_type='Cotton', meters=Decimal('5'), unit_price=Decimal('1'),
+                vendor=vendor, received_date=date.today(), available_meters=Decimal(available)
+            )
+
+    def complete(self, query):
+        response = self.client.get(f'/api/autocomplete/?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_prefix_matches_ignore_case(self):
+        data = self.complete('q=LoT&kinds=lots,vendors,customers')
+        self.assertCountEqual([lot['lot_number'] for lot in data['lots']], ['lot-1', 'LOT-10', 'LOT-2'])
+        self.assertEqual([vendor['name'] for vendor in data['vendors']], ['Lotus Mills'])
+        self.assertEqual(data['customers'], [])
+        self.assertEqual(
+            [customer['name'] for customer in self.complete('q=SHAH&kinds=customers')['customers']],
+            ['Shah Fabric', 'shaheen Traders']
+        )
+        lots = self.complete('q=lot&kinds=lots&in_stock=true')['lots']
+        self.assertEqual([(lot['lot_number'], lot['available_meters']) for lot in lots], [
+            ('LOT-10', Decimal('5.00')), ('LOT-2', Decimal('5.00')),
+        ])
+
+    def test_limit(self):
+        self.assertEqual(len(self.complete('q=lot&kinds=lots&limit=2')['lots']), 2)
+        self.assertEqual(len(self.complete('q=lot&kinds=lots&limit=0')['lots']), 1)
+        with mock.patch('core.views.AUTOCOMPLETE_MAX_LIMIT', 3):
+            self.assertEqual(len(self.complete('q=&kinds=lots&limit=100')['lots']), 3)
+        for query in ('limit=many', 'kinds=lots,planets'):
+            with self.subTest(query):
+                response = self.client.get(f'/api/autocomplete/?q=lot&{query}')
+                self.assertEqual(response.status_code, 400)
+
+    def test_empty_query_lists_the_first_entries(self):
+        data = self.complete('limit=2')
+        self.assertEqual(set(data), {'lots', 'fabric_types', 'vendors', 'customers', 'brokers', 'item_codes'})
+        self.assertEqual([lot['lot_number'] for lot in data['lots']], ['LOT-10', 'LOT-2'])
+        self.assertEqual([customer['name'] for customer in data['customers']], ['Ali Shah', 'Shah Fabric'])
+        self.assertEqual(data['fabric_types'], [
+            {'fabric_type': 'Cotton', 'lots': 4, 'available_meters': Decimal('15.00')},
+        ])
+        self.assertEqual(data['brokers'], [])
+
+
+class DailyRollupTests(BooksMixin, APITestCase):
+    """Every posting path keeps ``daily_rollups`` equal to a rebuild from the documents"""
+
+    def test_postings_keep_rollup_current(self):
+        invoice = self.post_invoice('INV-1', self.lots[:2])
+        deleted = self.post_invoice('INV-2', self.lots[2:])
+        bill = self.post_bill('BILL-1', self.lots)
+        today = date.today().isoformat()
+        expense = self.client.post('/api/expenses/', {
+            'date': today, 'category': 'Packing', 'description': 'Tape', 'amount': '4',
+        })
+        for response in (
+            expense,
+            self.client.patch(f"/api/expenses/{expense.data['id']}/", {'category': 'Office Rent'}),
+            self.client.post(f'/api/invoices/{invoice}/add_payment/', {'date': today, 'amount': '5'}),
+            self.client.post(f'/api/invoices/{invoice}/settle_commission/', {'date': today, 'amount': '0.1'}),
+            self.client.patch(f'/api/bills/{bill}/', {'date': '2026-01-05'}, format='json'),
+            self.client.delete(f'/api/invoices/{deleted}/'),
+        ):
+            self.assertLess(response.status_code, 300, response.data)
+
+        output = StringIO()
+        call_command('rebuild_rollups', '--check', '-v', '2', stdout=output)
+        self.assertIn('Rollup matches the documents.', output.getvalue())
+
+    def test_impossible_dates_are_rejected(self):
+        for url in ('/api/rollups/', '/api/rollups/summary/'):
+            with self.subTest(url):
+                response = self.client.get(f'{url}?date_from=2024-02-30&date_to=2024-03-01')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(list(response.data), ['date_from'])
+
+    def test_truncated_only_when_rows_are_cut_off(self):
+        for n, day in enumerate(('2026-01-10', '2026-02-10', '2026-03-10')):
+            self.post_invoice(f'INV-{n}', self.lots[n:n + 1], date.fromisoformat(day))
+        for cap, rows, truncated in ((3, 3, False), (2, 2, True)):
+            with self.subTest(cap=cap), mock.patch('core.views.ROLLUP_MAX_ROWS', cap):
+                cache.clear()
+                data = self.client.get('/api/rollups/?period=month&kinds=sale').data
+                self.assertEqual((len(data['series']), data['truncated']), (rows, truncated))
+
+class PeriodCloseTests(BooksMixin, APITestCase):
+    """A closed month is frozen and its reports are served from the snapshots"""
+
+    start, end = month_bounds(date.today() - timedelta(days=40))
+    received = start
+
+    def test_closed_period_is_frozen_and_served_from_snapshots(self):
+        invoice = self.post_invoice('INV-1', self.lots[:2], self.start)
+        bill = self.post_bill('BILL-1', self.lots, self.start)
+        start, end = self.start, self.end
+        profit_loss = f'/api/periods/profit_loss/?date_from={start}&date_to={end}'
+        valuation = f'/api/inventory/valuation/?as_of={end}&period_from={start}'
+        ledger = f'/api/customers/{self.customer.pk}/ledger/?date_from={end + timedelta(days=1)}'
+        live = {url: self.client.get(url).data for url in (profit_loss, valuation, ledger)}
+
+        response = self.client.post('/api/periods/close/', {'month': start.isoformat()})
+        self.assertEqual(response.status_code, 201, response.data)
+        for response in (
+            self.client.patch(f'/api/invoices/{invoice}/', {'notes': 'Edited'}, format='json'),
+            self.client.delete(f'/api/bills/{bill}/'),
+            self.client.post(f'/api/invoices/{invoice}/add_payment/', {'date': end, 'amount': '1'}),
+            self.client.post('/api/expenses/', {
+                'date': end, 'category': 'Packing', 'description': 'Tape', 'amount': '4',
+            }),
+        ):
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['detail'].code, 'period_closed')
+
+        cache.clear()
+        snapshot = self.client.get(profit_loss).data
+        self.assertEqual(snapshot['closed'], {'date_from': start, 'date_to': end})
+        self.assertEqual(snapshot['live'], [])
+        for section in ('revenue', 'cogs', 'expense', 'commission', 'net_profit'):
+            self.assertEqual(snapshot[section], live[profit_loss][section], section)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(valuation).data, live[valuation])
+        self.assertLessEqual(len(queries), 1)
+        self.assertEqual(self.client.get(ledger).data, live[ledger])
+
+    def test_posting_into_a_closed_month_is_rejected(self):
+        response = self.client.post('/api/periods/close/', {'month': self.start.isoformat()})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(PeriodLock.objects.get().closed_through, self.end)
+
+        for day in (self.start, self.end):
+            response = self.client.post('/api/invoices/', {
+                'invoice_number': f'INV-{day}', 'customer': self.customer.pk,
+                'date': day.isoformat(), 'due_date': day.isoformat(),
+                'items': [{'inventory_item': self.lots[0], 'meters': '1', 'price': '7'}],
+            }, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['detail'].code, 'period_closed')
+        self.post_invoice('INV-AFTER', self.lots[:1], self.end + timedelta(days=1))
+
+        period = ClosedPeriod.objects.get()
+        self.assertEqual(self.client.post(f'/api/periods/{period.pk}/reopen/').status_code, 204)
+        self.assertIsNone(PeriodLock.objects.get().closed_through)
+        self.post_invoice('INV-REOPENED', self.lots[:1], self.end)
+
+    def test_impossible_dates_are_rejected(self):
+        response = self.client.get('/api/periods/profit_loss/?date_from=2024-02-30')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data), ['date_from'])
+
+
+class TokenAuthTests(APITestCase):
+    """Token requests reuse the cached user, refresh tokens rotate and revocation applies at once"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_token_auth_is_cached_and_revocable(self):
+        user = User.objects.create_user('token', password='token')
+        pair = self.client.post('/api/auth/login/', {'username': 'token', 'password': 'token'}).data
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {pair['access']}")
+        self.client.get('/api/users/me/')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        self.assertEqual(len(queries), 0)
+
+        rotated = self.client.post('/api/auth/refresh/', {'refresh': pair['refresh']})
+        self.assertEqual(rotated.status_code, 200)
+        self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh': pair['refresh']}).status_code, 401)
+        self.assertEqual(self.client.post('/api/auth/logout/', {'refresh': rotated.data['refresh']}).status_code, 200)
+        self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh': rotated.data['refresh']}).status_code, 401)
+
+        self.assertIsNotNone(cache.get(f'auth:user:{user.pk}'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(f'/api/users/{user.pk}/revoke_tokens/').status_code, 204)
+        # Dropped from the shared cache, so no worker keeps the old generation
+        self.assertIsNone(cache.get(f'auth:user:{user.pk}'))
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['code'], 'token_revoked')
+
+        RevokedToken.objects.update(expires_at=timezone.now())
+        call_command('prune_tokens', stdout=StringIO())
+        self.assertFalse(RevokedToken.objects.exists())
+
+    def test_deactivation_applies_to_cached_users(self):
+        user = User.objects.create_user('inactive', password='inactive')
+        access = self.client.post('/api/auth/login/', {'username': 'inactive', 'password': 'inactive'}).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.is_active = False
+            user.save()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+
+class ChangeEventTests(APITestCase):
+    """``record_changes`` reaches open streams through the broker once committed"""
+
+    @override_settings(CHANGE_EVENTS_BROKER='core.events.LocalBroker')
+    def test_record_changes_wakes_subscriber(self):
+        get_broker.cache_clear()
+        self.addCleanup(get_broker.cache_clear)
+        broker = get_broker()
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def subscribe():
+            return broker.subscribe()
+
+        queue = loop.run_until_complete(subscribe())
+        self.addCleanup(broker.unsubscribe, queue)
+
+        # Created outside the capture below, so only record_changes announces
+        vendors = [Vendor.objects.create(name=f'Vendor {n}', contact='v') for n in range(2)]
+        with self.captureOnCommitCallbacks(execute=True):
+            record_changes(Vendor, [vendor.pk for vendor in vendors])
+
+        # Let the loop run the callbacks the commit scheduled on it
+        loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(queue.get_nowait(), {'vendors': sorted(vendor.pk for vendor in vendors)})
+        self.assertTrue(queue.empty())
+
+
+class AnalyticsTests(BooksMixin, APITestCase):
+    """Grouped figures validate their parameters and report when groups were cut off"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for n, day in enumerate(('2026-01-10', '2026-02-10', '2026-03-10')):
+            self.post_invoice(f'INV-{n}', self.lots[n:n + 1], date.fromisoformat(day))
+
+    def test_impossible_dates_are_rejected(self):
+        response = self.client.get('/api/analytics/?date_from=2024-02-30&date_to=someday')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.data), ['date_from', 'date_to'])
+
+    def test_truncated_only_when_groups_are_cut_off(self):
+        for cap, count, truncated in ((3, 3, False), (2, 2, True)):
+            with self.subTest(cap=cap), mock.patch('core.views.ANALYTICS_MAX_GROUPS', cap):
+                cache.clear()
+                data = self.client.get('/api/analytics/?dimensions=month').data
+                self.assertEqual((data['count'], data['truncated']), (count, truncated))
+                self.assertEqual(len(data['groups']), count)
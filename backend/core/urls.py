@@ -1,10 +1,21 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet
+from .views import (
+    UserViewSet, ChangeFeedViewSet, BootstrapViewSet, AutocompleteViewSet, AnalyticsViewSet, RollupViewSet,
+    ClosedPeriodViewSet, change_events
+)
+
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
+router.register(r'changes', ChangeFeedViewSet, basename='changes')
+router.register(r'bootstrap', BootstrapViewSet, basename='bootstrap')
+router.register(r'autocomplete', AutocompleteViewSet, basename='autocomplete')
+router.register(r'analytics', AnalyticsViewSet, basename='analytics')
+router.register(r'rollups', RollupViewSet, basename='rollups')
+router.register(r'periods', ClosedPeriodViewSet)
 
 urlpatterns = [
+    path('events/', change_events, name='change-events'),
     path('', include(router.urls)),
 ]
@@ -1,9 +1,29 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import viewsets, status
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from .models import User
-from .serializers import UserSerializer, UserCreateSerializer
+from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.views import TokenViewBase
+from . import bootstrap
+from .authentication import CachedJWTAuthentication, TokenRevokeSerializer
+from .analytics import ANALYTICS_MAX_GROUPS, SOURCES as ANALYTICS_SOURCES, dimension_names, format_group, pivot
+from .autocomplete import AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT, SOURCES, autocomplete
+from .changes import CursorExpired, changed_rows, current_cursor, read_changes
+from .conditional import conditional_response, data_etag
+from .events import event_stream, get_broker
+from .models import ClosedPeriod, OpenDocumentSnapshot, PartyBalanceSnapshot, User
+from .params import query_dates
+from .rollups import BREAKDOWNS, KINDS, PERIODS, ROLLUP_MAX_ROWS, rollup_series, rollup_summary
+from .response_cache import cached_response
+from .serializers import (
+    UserSerializer, UserCreateSerializer, ClosedPeriodSerializer, ClosePeriodSerializer,
+    OpenDocumentSnapshotSerializer, PartyBalanceSnapshotSerializer
+)
+from .snapshots import close_period, format_profit_and_loss, profit_and_loss, reopen_period
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -34,3 +54,340 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['post'])
+    def revoke_tokens(self, request, pk=None):
+        """Log the user out everywhere: revoke every token issued to them so far"""
+        user = self.get_object()
+        user.revoke_tokens()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TokenRevokeView(TokenViewBase):
+    """Log out: revoke the refresh token in the body (the access token lapses on its own)"""
+    serializer_class = TokenRevokeSerializer
+
+
+class ChangeFeedViewSet(viewsets.ViewSet):
+    """Rows changed since a cursor, for clients that keep a local copy"""
+    permission_classes = [IsAuthenticated]
+    default_limit = 500
+    max_limit = 5000
+
+    def list(self, request):
+        """Apply ``changes`` (current rows) and ``deleted`` (ids) in order.
+
+        Without ``since`` only the current ``cursor`` is returned; load the
+        full lists after taking it. Repeat with ``since=cursor`` while
+        ``has_more`` is true. ``resync`` means the changes after ``since``
+        have been pruned: reload from ``/api/bootstrap/`` instead.
+        """
+        since = request.query_params.get('since')
+        if since in (None, ''):
+            return Response({
+                'cursor': current_cursor(),
+                'has_more': False,
+                'resync': False,
+                'changes': {},
+                'deleted': {},
+            })
+
+        try:
+            since = int(since)
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response(
+                {'detail': 'since and limit must be integers.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, self.max_limit))
+
+        try:
+            cursor, has_more, changed = read_changes(since, limit)
+        except CursorExpired:
+            return Response({
+                'cursor': since,
+                'has_more': False,
+                'resync': True,
+                'changes': {},
+                'deleted': {},
+            })
+        changes, deleted = changed_rows(request, changed)
+        return Response({
+            'cursor': cursor,
+            'has_more': has_more,
+            'resync': False,
+            'changes': changes,
+            'deleted': deleted,
+        })
+
+
+class BootstrapViewSet(viewsets.ViewSet):
+    """Compact startup snapshots, revalidated with ``ETag``/``If-None-Match``"""
+    permission_classes = [IsAuthenticated]
+
+    def _snapshot(self, request, models, build):
+        etag = data_etag(*models)
+        return conditional_response(request, etag, lambda: {'version': etag.strip('"'), **build()})
+
+    def list(self, request):
+        """Parties, open lots and unpaid invoices/bills with a changes-feed cursor"""
+        return self._snapshot(request, bootstrap.BOOTSTRAP_MODELS, bootstrap.working_set)
+
+    @action(detail=False, methods=['get'])
+    def history(self, request):
+        """Paid invoices/bills and the transaction log"""
+        return self._snapshot(request, bootstrap.HISTORY_MODELS, bootstrap.history)
+
+
+class AutocompleteViewSet(viewsets.ViewSet):
+    """Prefix lookups for pickers, e.g. ``?q=lot-1&kinds=lots,vendors``"""
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        """Top matches per kind for ``q``; ``kinds`` defaults to all of them"""
+        params = request.query_params
+        kinds = [kind for kind in params.get('kinds', '').split(',') if kind] or list(SOURCES)
+        unknown = sorted(set(kinds) - set(SOURCES))
+        if unknown:
+            raise ValidationError({'kinds': f"Unknown kind(s): {', '.join(unknown)}."})
+        try:
+            limit = max(1, min(int(params.get('limit', AUTOCOMPLETE_LIMIT)), AUTOCOMPLETE_MAX_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': 'Expected an integer.'})
+
+        models = {model for kind in kinds for model in SOURCES[kind][1]}
+        etag = data_etag(*sorted(models, key=lambda model: model._meta.label), extra=(request.get_full_path(),))
+        return conditional_response(
+            request, etag, lambda: autocomplete(params.get('q', '').strip(), kinds, params, limit)
+        )
+
+
+class AnalyticsViewSet(viewsets.GenericViewSet):
+    """Grouped figures for reports, e.g. ``?source=sales&dimensions=customer,month&measures=amount,paid``"""
+    permission_classes = [IsAuthenticated]
+
+    @cached_response(
+        'transactions.Invoice', 'transactions.Bill', 'inventory.InventoryItem',
+        'inventory.ItemMaster', 'accounts.Vendor', 'accounts.Customer', 'accounts.Broker'
+    )
+    def list(self, request):
+        """One page of groups with their measures, plus totals over the whole selection.
+
+        ``source`` is ``sales`` (default), ``purchases`` or ``inventory``;
+        ``dimensions`` and ``measures`` are comma separated, defaulting to
+        ``month`` and every measure of the source. ``date_from``/``date_to``
+        bound the invoice, bill or received date, ``?customer=3`` style
+        parameters filter on a dimension, and ``ordering`` takes dimension
+        or measure names (``-amount``).
+        """
+        params = request.query_params
+        source = params.get('source', 'sales')
+        if source not in ANALYTICS_SOURCES:
+            raise ValidationError({'source': f"Expected one of: {', '.join(ANALYTICS_SOURCES)}."})
+        spec = ANALYTICS_SOURCES[source]
+        allowed = dimension_names(source)
+
+        errors = {}
+        dimensions = [name for name in params.get('dimensions', 'month').split(',') if name]
+        measures = [name for name in params.get('measures', '').split(',') if name] or list(spec['measures'])
+        unknown = [name for name in dimensions if name not in allowed]
+        if unknown or not dimensions or len(set(dimensions)) != len(dimensions):
+            errors['dimensions'] = f"Expected distinct names from: {', '.join(allowed)}."
+        if any(name not in spec['measures'] for name in measures):
+            errors['measures'] = f"Expected names from: {', '.join(spec['measures'])}."
+        dates = query_dates(params, ('date_from', 'date_to'), errors)
+        filters = {name: params[name] for name in spec['dimensions'] if params.get(name)}
+        for name, value in filters.items():
+            if spec['dimensions'][name][1] and not value.isdigit():
+                errors[name] = 'Expected an id.'
+        ordering = [field for field in params.get('ordering', '').split(',') if field]
+        if any(field.lstrip('-') not in (*dimensions, *measures) for field in ordering):
+            errors['ordering'] = 'Expected requested dimension or measure names.'
+        if errors:
+            raise ValidationError(errors)
+
+        totals, groups = pivot(source, dimensions, measures, filters=filters, ordering=ordering, **dates)
+        page = self.paginate_queryset(groups[:ANALYTICS_MAX_GROUPS])
+        count = self.paginator.page.paginator.count
+        # Only a selection that fills the cap can have had groups cut off
+        truncated = (
+            count == ANALYTICS_MAX_GROUPS
+            and groups[ANALYTICS_MAX_GROUPS:ANALYTICS_MAX_GROUPS + 1].exists()
+        )
+        return Response({
+            'source': source,
+            'dimensions': dimensions,
+            'measures': measures,
+            'totals': totals,
+            'count': count,
+            'truncated': truncated,
+            'next': self.paginator.get_next_link(),
+            'previous': self.paginator.get_previous_link(),
+            'groups': [format_group(row) for row in page],
+        })
+
+
+class RollupViewSet(viewsets.ViewSet):
+    """Daily totals of sales, purchases, payments, expenses and commissions"""
+    permission_classes = [IsAuthenticated]
+
+    @cached_response('core.DailyRollup')
+    def list(self, request):
+        """Count and amount per period and kind, e.g. ``?period=month&kinds=sale,receipt``.
+
+        ``period`` is ``day``, ``week``, ``month`` (default) or ``year``;
+        ``kinds`` defaults to all of them. ``by`` adds a ``party``,
+        ``category`` or ``method`` column, and each of those three also
+        filters as a parameter.
+        """
+        params = request.query_params
+        errors = {}
+        period = params.get('period', 'month')
+        kinds = [kind for kind in params.get('kinds', '').split(',') if kind] or KINDS
+        by = params.get('by') or None
+        if period not in PERIODS:
+            errors['period'] = f"Expected one of: {', '.join(PERIODS)}."
+        if any(kind not in KINDS for kind in kinds):
+            errors['kinds'] = f"Expected names from: {', '.join(KINDS)}."
+        if by is not None and by not in BREAKDOWNS:
+            errors['by'] = f"Expected one of: {', '.join(BREAKDOWNS)}."
+        if params.get('party') and not params['party'].isdigit():
+            errors['party'] = 'Expected an id.'
+        dates = query_dates(params, ('date_from', 'date_to'), errors)
+        if errors:
+            raise ValidationError(errors)
+
+        filters = {name: params[name] for name in BREAKDOWNS if params.get(name)}
+        # One row past the cap tells whether any were left out
+        rows = list(rollup_series(period, kinds, by=by, filters=filters, **dates)[:ROLLUP_MAX_ROWS + 1])
+        truncated = len(rows) > ROLLUP_MAX_ROWS
+        rows = rows[:ROLLUP_MAX_ROWS]
+        return Response({
+            'period': period,
+            'kinds': kinds,
+            'by': by,
+            'truncated': truncated,
+            'series': [
+                {
+                    'period': row['period'],
+                    'kind': row['kind'],
+                    **({by: row[by]} if by else {}),
+                    'count': row['total_count'],
+                    'amount': round(float(row['total_amount'] or 0), 2),
+                }
+                for row in rows
+            ],
+        })
+
+    @action(detail=False, methods=['get'])
+    @cached_response('core.DailyRollup')
+    def summary(self, request):
+        """Totals per kind, cash in and out over ``date_from``..``date_to``, and balances open at its end"""
+        errors = {}
+        dates = query_dates(request.query_params, ('date_from', 'date_to'), errors)
+        if errors:
+            raise ValidationError(errors)
+        return Response({**dates, **rollup_summary(**dates)})
+
+
+class ClosedPeriodViewSet(viewsets.ReadOnlyModelViewSet):
+    """Closed months, their frozen snapshots, and profit and loss over any range"""
+    queryset = ClosedPeriod.objects.select_related('closed_by')
+    serializer_class = ClosedPeriodSerializer
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=False, methods=['post'])
+    def close(self, request):
+        """Close a month, e.g. ``{"month": "2026-01"}``, and write its snapshots"""
+        serializer = ClosePeriodSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        period = close_period(serializer.validated_data['month'], request.user)
+        return Response(self.get_serializer(period).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def reopen(self, request, pk=None):
+        """Reopen the latest closed month, deleting its snapshots"""
+        reopen_period(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def _snapshot_page(self, rows, serializer_class, filter_field, choices):
+        value = self.request.query_params.get(filter_field)
+        if value:
+            if value not in choices:
+                raise ValidationError({filter_field: f"Expected one of: {', '.join(choices)}."})
+            rows = rows.filter(**{filter_field: value})
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(serializer_class(page, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def balances(self, request, pk=None):
+        """Non-zero party balances at the end of the period, optionally ``?party_type=customer``"""
+        return self._snapshot_page(
+            self.get_object().party_balances.all(), PartyBalanceSnapshotSerializer,
+            'party_type', [value for value, _ in PartyBalanceSnapshot.PARTY_TYPES]
+        )
+
+    @action(detail=True, methods=['get'])
+    def open_documents(self, request, pk=None):
+        """Invoices and bills unpaid at the end of the period, optionally ``?document_type=bill``"""
+        return self._snapshot_page(
+            self.get_object().open_documents.all(), OpenDocumentSnapshotSerializer,
+            'document_type', [value for value, _ in OpenDocumentSnapshot.DOCUMENT_TYPES]
+        )
+
+    @action(detail=False, methods=['get'])
+    @cached_response(
+        'core.ClosedPeriod', 'core.DailyRollup', 'transactions.Invoice', 'transactions.Bill',
+        'inventory.InventoryItem', 'inventory.ItemMaster'
+    )
+    def profit_loss(self, request):
+        """Profit and loss over ``date_from``..``date_to`` (default: the year to date).
+
+        Closed months are read from their snapshots and only the rest of
+        the range is computed live; ``closed`` and ``live`` report which
+        days came from where.
+        """
+        params = request.query_params
+        errors = {}
+        dates = query_dates(params, ('date_from', 'date_to'), errors)
+        if errors:
+            raise ValidationError(errors)
+        date_to = dates.get('date_to') or timezone.localdate()
+        date_from = dates.get('date_from') or date_to.replace(month=1, day=1)
+        if date_from > date_to:
+            raise ValidationError({'date_from': 'Must not be after date_to.'})
+
+        lines, closed, live = profit_and_loss(date_from, date_to)
+        return Response({
+            'date_from': date_from,
+            'date_to': date_to,
+            'closed': closed and {'date_from': closed[0], 'date_to': closed[1]},
+            'live': [{'date_from': start, 'date_to': end} for start, end in live],
+            **format_profit_and_loss(lines),
+        })
+
+
+async def change_events(request):
+    """Server-sent ``changes`` events, e.g. ``{"invoices": [42], "customers": [7]}``.
+
+    Clients respond by reading the changes feed from their cursor. A plain
+    Django async view, since the stream must not hold a worker thread;
+    under WSGI (``runserver``) it answers ``501`` so clients keep polling.
+    """
+    if not hasattr(request, 'scope'):
+        return JsonResponse({'detail': 'Change events need the ASGI server.'}, status=501)
+    try:
+        authenticated = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        authenticated = None
+    if authenticated is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    broker = get_broker()
+    response = StreamingHttpResponse(
+        event_stream(broker, broker.subscribe()), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
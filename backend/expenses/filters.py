@@ -0,0 +1,14 @@
+import django_filters
+from .models import Expense
+
+
+class ExpenseFilter(django_filters.FilterSet):
+    """Filters for expenses, including date and amount ranges"""
+    date_from = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    min_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='gte')
+    max_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='lte')
+
+    class Meta:
+        model = Expense
+        fields = ['category', 'payment_method', 'date']
@@ -0,0 +1,15 @@
+from django.db import migrations
+from core.search import SearchIndexes
+
+
+class Migration(migrations.Migration):
+    # Indexes are built CONCURRENTLY, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('expenses', '0002_range_filter_indexes'),
+    ]
+
+    operations = [
+        SearchIndexes('expenses', trigram=['category'], text=['description', 'notes']),
+    ]
@@ -41,6 +41,10 @@ class Expense(models.Model):
     class Meta:
         db_table = 'expenses'
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['date', 'created_at'], name='expense_date_created_idx'),
+            models.Index(fields=['category', 'date'], name='expense_category_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.category} - {self.description} - {self.amount}"
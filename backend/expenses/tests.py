@@ -1,3 +1,34 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from rest_framework.test import APITestCase
+from core.models import User
+from .models import Expense
 
-# Create your tests here.
+
+class ExpenseFilterTests(APITestCase):
+    """Date and amount bounds are inclusive and combine with the category filter"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('expenses', password='expenses'))
+        for day, category, amount in (
+            (date(2024, 3, 1), 'Packing', '10'),
+            (date(2024, 3, 15), 'Packing', '25'),
+            (date(2024, 4, 1), 'Office Rent', '500'),
+        ):
+            Expense.objects.create(
+                date=day, category=category, description=category, amount=Decimal(amount), payment_method='Cash'
+            )
+
+    def test_filters(self):
+        for query, expected in (
+            ('date_from=2024-03-15', ['25.00', '500.00']),
+            ('date_to=2024-03-15', ['10.00', '25.00']),
+            ('min_amount=25&max_amount=500', ['25.00', '500.00']),
+            ('max_amount=24.99', ['10.00']),
+            ('category=Packing&date_from=2024-03-02', ['25.00']),
+        ):
+            with self.subTest(query):
+                response = self.client.get(f'/api/expenses/?{query}')
+                self.assertEqual(response.status_code, 200, response.data)
+                self.assertEqual(sorted(row['amount'] for row in response.data['results']), expected)
+        self.assertEqual(self.client.get('/api/expenses/?date_to=2024-04-31').status_code, 400)
@@ -2,54 +2,79 @@ from rest_framework import viewsets, filters
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Sum
+from django.db import transaction as db_transaction
+from django.db.models import Count, Sum
 from django_filters.rest_framework import DjangoFilterBackend
+from core.summaries import SummaryMixin, summarize
+from core.response_cache import cached_response
+from core.conditional import ConditionalGetMixin
+from core.search import RankedSearchFilter
+from core.closing import ensure_open
+from core.rollups import entry_dates, expense_entries, expense_totals, post_rollups, reversed_entries
 from .models import Expense
+from .filters import ExpenseFilter
 from .serializers import ExpenseSerializer
 
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class ExpenseViewSet(SummaryMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing expenses
     """
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category', 'payment_method', 'date']
-    search_fields = ['category', 'description', 'notes']
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, RankedSearchFilter]
+    filterset_class = ExpenseFilter
+    search_fields = ['category']
+    search_text_fields = ['description', 'notes']
     ordering_fields = ['date', 'amount', 'category']
     ordering = ['-date']
-    
-    def get_queryset(self):
-        """Override to support date range filtering"""
-        queryset = super().get_queryset()
-        date_from = self.request.query_params.get('date_from', None)
-        date_to = self.request.query_params.get('date_to', None)
-        
-        if date_from:
-            queryset = queryset.filter(date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(date__lte=date_to)
-        
-        return queryset
+    # Summary parameters the daily rollup answers; any other is computed live
+    rollup_params = {'date_from', 'date_to', 'category', 'payment_method'}
+
+    @db_transaction.atomic
+    def perform_create(self, serializer):
+        ensure_open(serializer.validated_data['date'])
+        post_rollups(expense_entries(serializer.save()))
+
+    @db_transaction.atomic
+    def perform_update(self, serializer):
+        before = expense_entries(serializer.instance)
+        after = expense_entries(serializer.save())
+        ensure_open(*entry_dates(before + after))
+        post_rollups(reversed_entries(before) + after)
+
+    @db_transaction.atomic
+    def perform_destroy(self, instance):
+        ensure_open(instance.date)
+        post_rollups(reversed_entries(expense_entries(instance)))
+        instance.delete()
     
     @action(detail=False, methods=['get'])
+    @cached_response('expenses.Expense')
     def summary(self, request):
-        """Get expense summary statistics"""
-        expenses = self.get_queryset()
-        
-        total = expenses.aggregate(total=Sum('amount'))['total'] or 0
-        
-        by_category = {}
-        for expense in expenses:
-            category = expense.category
-            if category not in by_category:
-                by_category[category] = 0
-            by_category[category] += float(expense.amount)
+        """Get expense summary statistics, from the daily rollup when its filters allow"""
+        filterset = ExpenseFilter(request.query_params, queryset=Expense.objects.none())
+        if set(request.query_params) <= self.rollup_params and filterset.is_valid():
+            filters = filterset.form.cleaned_data
+            totals, by_category = expense_totals(
+                filters.get('date_from'), filters.get('date_to'),
+                filters.get('category'), filters.get('payment_method')
+            )
+        else:
+            totals, by_category = summarize(
+                self.get_summary_queryset(),
+                {'count': (Count, 'id'), 'amount': (Sum, 'amount')},
+                group_field='category',
+                group_values=[value for value, _ in Expense.CATEGORY_CHOICES]
+            )
         
         return Response({
-            'total': float(total),
-            'count': expenses.count(),
-            'by_category': by_category
+            'total': float(totals['amount']),
+            'count': totals['count'],
+            'by_category': {
+                category: float(group['amount'])
+                for category, group in by_category.items()
+                if group['count']
+            }
         })
@@ -0,0 +1,18 @@
+import django_filters
+from .models import InventoryItem
+
+
+class InventoryItemFilter(django_filters.FilterSet):
+    """Filters for inventory lots, including a received date range"""
+    date_from = django_filters.DateFilter(field_name='received_date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='received_date', lookup_expr='lte')
+    in_stock = django_filters.BooleanFilter(method='filter_in_stock')
+
+    class Meta:
+        model = InventoryItem
+        fields = ['vendor', 'is_billed', 'fabric_type']
+
+    def filter_in_stock(self, queryset, name, value):
+        if value:
+            return queryset.filter(available_meters__gt=0)
+        return queryset.filter(available_meters__lte=0)
@@ -0,0 +1,78 @@
+from accounts.models import Vendor
+from core.changes import record_changes
+from core.csv_import import (
+    CsvImporter, NameResolver, RowError,
+    parse_date_value, parse_decimal, parse_id,
+)
+from .models import InventoryItem
+from .stock import receive_stock
+
+
+class InventoryImporter(CsvImporter):
+    """Create one inventory lot per row.
+
+    The vendor is given by name (``vendor``) or id (``vendor_id``). Lots
+    clashing with an existing ``(lot_number, fabric_type)`` pair, or with an
+    earlier row of the same file, are rejected.
+    """
+    models = (InventoryItem,)
+    columns = {
+        'lot_number': ['lot_number', 'lot'],
+        'fabric_type': ['fabric_type', 'type', 'fabrictype'],
+        'meters': ['meters', 'quantity'],
+        'unit_price': ['unit_price', 'price'],
+        'vendor': ['vendor', 'supplier'],
+        'vendor_id': ['vendor_id'],
+        'received_date': ['received_date', 'date'],
+    }
+
+    def __init__(self, upload):
+        super().__init__(upload)
+        self.vendors = NameResolver(Vendor, 'Vendor')
+        self.existing = set()
+        self.seen = set()
+
+    def parse_row(self, values):
+        return {
+            'lot_number': values['lot_number'],
+            'fabric_type': values['fabric_type'],
+            'meters': parse_decimal(values['meters'], 'meters'),
+            'unit_price': parse_decimal(values['unit_price'], 'unit_price'),
+            'vendor': values['vendor'],
+            'vendor_id': parse_id(values['vendor_id'], 'vendor_id'),
+            'received_date': parse_date_value(values['received_date'], 'received_date'),
+        }
+
+    def prepare_batch(self, rows):
+        self.vendors.prefetch(
+            names=[row['vendor'] for row in rows if row['vendor_id'] is None],
+            ids=[row['vendor_id'] for row in rows if row['vendor_id'] is not None]
+        )
+        self.existing = set(
+            InventoryItem.objects.filter(lot_number__in={row['lot_number'] for row in rows})
+            .values_list('lot_number', 'fabric_type')
+        )
+
+    def build(self, row):
+        key = (row['lot_number'], row['fabric_type'])
+        if key in self.existing or key in self.seen:
+            raise RowError({'lot_number': f'Lot {key[0]} ({key[1]}) already exists.'})
+
+        item = InventoryItem(
+            lot_number=row['lot_number'],
+            fabric_type=row['fabric_type'],
+            meters=row['meters'],
+            unit_price=row['unit_price'],
+            vendor_id=self.vendors.resolve(row['vendor'], row['vendor_id'], 'vendor'),
+            received_date=row['received_date'],
+            available_meters=row['meters'],
+        )
+        # The vendor was resolved above; skip the per-row foreign key query
+        item.full_clean(exclude=['vendor'], validate_unique=False, validate_constraints=False)
+        self.seen.add(key)
+        return item
+
+    def write_batch(self, items):
+        InventoryItem.objects.bulk_create(items)
+        receive_stock(items)
+        record_changes(InventoryItem, [item.pk for item in items])
@@ -0,0 +1,108 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:26
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_stock(apps, schema_editor):
+    """Open the ledger with each lot's receipt and its past invoice lines.
+
+    Lots sold beyond their received meters get an adjustment so that the
+    ledger still sums to ``available_meters``, which cannot go negative.
+    """
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    InvoiceItem = apps.get_model('transactions', 'InvoiceItem')
+    decimal = models.DecimalField(max_digits=10, decimal_places=2)
+
+    sold = Subquery(
+        InvoiceItem.objects.filter(inventory_item=OuterRef('pk')).order_by()
+        .values('inventory_item').annotate(total=Sum('meters')).values('total'),
+        output_field=decimal
+    )
+    sold = Coalesce(sold, Value(Decimal('0')), output_field=decimal)
+    InventoryItem.objects.update(
+        available_meters=Greatest(F('meters') - sold, Value(Decimal('0')), output_field=decimal)
+    )
+
+    def movements():
+        for lot in InventoryItem.objects.annotate(sold=sold).iterator(chunk_size=1000):
+            yield StockMovement(
+                inventory_item_id=lot.pk, movement_type='Receipt', meters=lot.meters,
+                date=lot.received_date, reference_id=lot.lot_number
+            )
+            shortfall = lot.available_meters - (lot.meters - lot.sold)
+            if shortfall:
+                yield StockMovement(
+                    inventory_item_id=lot.pk, movement_type='Adjustment', meters=shortfall,
+                    date=lot.received_date, notes='Opening balance: sold beyond received meters'
+                )
+        for item in InvoiceItem.objects.values(
+            'inventory_item_id', 'meters', 'invoice__invoice_number', 'invoice__date'
+        ).iterator(chunk_size=1000):
+            yield StockMovement(
+                inventory_item_id=item['inventory_item_id'], movement_type='Sale', meters=-item['meters'],
+                date=item['invoice__date'], reference_id=item['invoice__invoice_number']
+            )
+
+    batch = []
+    for movement in movements():
+        batch.append(movement)
+        if len(batch) >= 1000:
+            StockMovement.objects.bulk_create(batch)
+            batch = []
+    StockMovement.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('inventory', '0002_range_filter_indexes'),
+        ('transactions', '0003_range_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movement_type', models.CharField(choices=[('Receipt', 'Receipt'), ('Sale', 'Sale'), ('Return', 'Return'), ('Adjustment', 'Adjustment')], max_length=20)),
+                ('meters', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date', models.DateField()),
+                ('reference_id', models.CharField(blank=True, max_length=100)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'stock_movements',
+                'ordering': ['-date', '-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='available_meters',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(condition=models.Q(('available_meters__gt', 0)), fields=['fabric_type', 'lot_number'], name='inventory_available_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='inventoryitem',
+            constraint=models.CheckConstraint(check=models.Q(('available_meters__gte', 0)), name='inventory_available_not_negative'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='inventory_item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='inventory.inventoryitem'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['inventory_item', 'date'], name='stock_movement_item_date_idx'),
+        ),
+        migrations.RunPython(backfill_stock, migrations.RunPython.noop),
+    ]
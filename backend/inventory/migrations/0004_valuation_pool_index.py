@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('inventory', '0003_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['fabric_type', 'received_date'], name='inventory_type_received_idx'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations
+from core.search import SearchIndexes
+
+
+class Migration(migrations.Migration):
+    # Indexes are built CONCURRENTLY, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0004_valuation_pool_index'),
+    ]
+
+    operations = [
+        SearchIndexes('inventory_items', trigram=['lot_number', 'fabric_type']),
+        SearchIndexes('item_master', trigram=['code', 'name', 'category'], text=['description']),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations
+from core.search import SearchIndexes
+
+
+class Migration(migrations.Migration):
+    # Indexes are built CONCURRENTLY, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0005_search_indexes'),
+    ]
+
+    operations = [
+        SearchIndexes('inventory_items', prefix=['lot_number', 'fabric_type']),
+        SearchIndexes('item_master', prefix=['code', 'name']),
+    ]
@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, transaction as db_transaction
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
 from accounts.models import Vendor
+from core.changes import record_changes
+from core.response_cache import bump_version_on_commit
 
 
 class InventoryItem(models.Model):
@@ -25,6 +28,12 @@ class InventoryItem(models.Model):
     )
     received_date = models.DateField()
     is_billed = models.BooleanField(default=False)
+    # Meters not yet sold; maintained only through inventory.stock
+    available_meters = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.00')
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -32,9 +41,51 @@ class InventoryItem(models.Model):
         db_table = 'inventory_items'
         ordering = ['-received_date', 'lot_number']
         unique_together = [['lot_number', 'fabric_type']]
+        indexes = [
+            models.Index(fields=['received_date'], name='inventory_received_idx'),
+            models.Index(fields=['vendor', 'received_date'], name='inventory_vendor_received_idx'),
+            # Valuation: FIFO and average cost pools per fabric type
+            models.Index(fields=['fabric_type', 'received_date'], name='inventory_type_received_idx'),
+            # Lot picker: only lots that still have stock
+            models.Index(
+                fields=['fabric_type', 'lot_number'],
+                condition=models.Q(available_meters__gt=0),
+                name='inventory_available_idx'
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(available_meters__gte=0),
+                name='inventory_available_not_negative'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.lot_number} - {self.fabric_type} ({self.meters}m)"
+
+    def save(self, *args, **kwargs):
+        # available_meters is only moved by inventory.stock under a row lock;
+        # saving a stale instance must not write its copy back
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'available_meters'
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def mark_billed(cls, pks):
+        """Flag lots as billed with one ``UPDATE``; returns how many were not already"""
+        pks = list(pks)
+        with db_transaction.atomic(savepoint=False):
+            flagged = cls.objects.filter(pk__in=pks, is_billed=False).update(
+                is_billed=True,
+                updated_at=timezone.now()
+            )
+            if flagged:
+                record_changes(cls, pks)
+                bump_version_on_commit(cls)
+        return flagged
     
     @property
     def total_value(self):
@@ -42,6 +93,39 @@ class InventoryItem(models.Model):
         return self.meters * self.unit_price
 
 
+class StockMovement(models.Model):
+    """Ledger row for a change in a lot's available meters (signed)"""
+
+    MOVEMENT_TYPES = [
+        ('Receipt', 'Receipt'),
+        ('Sale', 'Sale'),
+        ('Return', 'Return'),
+        ('Adjustment', 'Adjustment'),
+    ]
+
+    inventory_item = models.ForeignKey(
+        InventoryItem,
+        on_delete=models.CASCADE,
+        related_name='stock_movements'
+    )
+    movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPES)
+    meters = models.DecimalField(max_digits=10, decimal_places=2)
+    date = models.DateField()
+    reference_id = models.CharField(max_length=100, blank=True)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'stock_movements'
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['inventory_item', 'date'], name='stock_movement_item_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.movement_type} {self.meters}m - {self.inventory_item_id}"
+
+
 class ItemMaster(models.Model):
     """Master catalog of fabric types and their attributes"""
     code = models.CharField(max_length=50, unique=True)
@@ -1,9 +1,25 @@
 from rest_framework import serializers
-from .models import InventoryItem, ItemMaster
+from .models import InventoryItem, ItemMaster, StockMovement
 from accounts.serializers import VendorSerializer
+from core.fieldsets import SparseFieldsetSerializer
 
 
-class InventoryItemSerializer(serializers.ModelSerializer):
+class LotField(serializers.PrimaryKeyRelatedField):
+    """Lot by id, taken from ``context['lots']`` when the caller loaded them in bulk"""
+
+    def to_internal_value(self, data):
+        lots = self.context.get('lots')
+        if lots is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool) or not str(data).isdigit():
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        lot = lots.get(int(data))
+        if lot is None:
+            self.fail('does_not_exist', pk_value=data)
+        return lot
+
+
+class InventoryItemSerializer(SparseFieldsetSerializer, serializers.ModelSerializer):
     """Serializer for InventoryItem model"""
     vendor_name = serializers.CharField(source='vendor.name', read_only=True)
     total_value = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
@@ -13,12 +29,13 @@ class InventoryItemSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'lot_number', 'fabric_type', 'meters', 'unit_price',
             'vendor', 'vendor_name', 'received_date', 'is_billed',
-            'total_value', 'created_at', 'updated_at'
+            'available_meters', 'total_value', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'available_meters', 'created_at', 'updated_at']
+        expandable_fields = {'vendor': VendorSerializer}
 
 
-class InventoryItemDetailSerializer(serializers.ModelSerializer):
+class InventoryItemDetailSerializer(SparseFieldsetSerializer, serializers.ModelSerializer):
     """Detailed serializer with vendor information"""
     vendor = VendorSerializer(read_only=True)
     total_value = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
@@ -28,12 +45,56 @@ class InventoryItemDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'lot_number', 'fabric_type', 'meters', 'unit_price',
             'vendor', 'received_date', 'is_billed',
-            'total_value', 'created_at', 'updated_at'
+            'available_meters', 'total_value', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'available_meters', 'created_at', 'updated_at']
+
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    """Serializer for StockMovement model"""
+
+    class Meta:
+        model = StockMovement
+        fields = [
+            'id', 'inventory_item', 'movement_type', 'meters', 'date',
+            'reference_id', 'notes', 'created_at'
+        ]
+        read_only_fields = ['id', 'inventory_item', 'created_at']
+
+
+class StockAdjustmentSerializer(serializers.Serializer):
+    """Input for a manual return or adjustment; ``meters`` is signed"""
+    movement_type = serializers.ChoiceField(choices=['Return', 'Adjustment'])
+    meters = serializers.DecimalField(max_digits=10, decimal_places=2)
+    date = serializers.DateField(required=False)
+    reference_id = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate(self, attrs):
+        if not attrs['meters']:
+            raise serializers.ValidationError({'meters': 'Meters cannot be zero.'})
+        if attrs['movement_type'] == 'Return' and attrs['meters'] < 0:
+            raise serializers.ValidationError({'meters': 'A return adds stock; use a positive amount.'})
+        return attrs
+
+
+class MarkBilledSerializer(serializers.Serializer):
+    """Input for flagging many lots as billed at once"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=5000
+    )
+
+    def validate_ids(self, ids):
+        ids = set(ids)
+        missing = ids - set(InventoryItem.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        if missing:
+            raise serializers.ValidationError(
+                f"Unknown inventory item(s): {', '.join(map(str, sorted(missing)))}."
+            )
+        return ids
 
 
-class ItemMasterSerializer(serializers.ModelSerializer):
+class ItemMasterSerializer(SparseFieldsetSerializer, serializers.ModelSerializer):
     """Serializer for ItemMaster model"""
     
     class Meta:
@@ -0,0 +1,110 @@
+from decimal import Decimal
+from django.db import models, transaction as db_transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from core.changes import record_changes
+from core.response_cache import bump_version_on_commit
+from .models import InventoryItem, StockMovement
+
+
+class StockError(APIException):
+    """A movement that would take a lot's available meters below zero"""
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Insufficient stock.'
+    default_code = 'insufficient_stock'
+
+
+def _totals(lines):
+    """Sum ``(lot id, meters)`` pairs per lot"""
+    totals = {}
+    for lot_id, meters in lines:
+        totals[lot_id] = totals.get(lot_id, Decimal('0')) + Decimal(meters)
+    return totals
+
+
+@db_transaction.atomic
+def apply_movements(movements):
+    """Check and apply unsaved ``StockMovement`` rows, then insert them.
+
+    The lots are locked in primary key order (so concurrent sales cannot
+    deadlock), checked, and shifted with a single UPDATE. A lot that would
+    go negative rejects every movement with ``StockError``; the database
+    check constraint backs this up.
+    """
+    totals = {
+        lot_id: meters for lot_id, meters in
+        _totals((movement.inventory_item_id, movement.meters) for movement in movements).items()
+        if meters
+    }
+    if not totals:
+        return []
+
+    lots = {
+        lot['pk']: lot for lot in
+        InventoryItem.objects.select_for_update().filter(pk__in=list(totals)).order_by('pk')
+        .values('pk', 'lot_number', 'available_meters')
+    }
+    missing = set(totals) - set(lots)
+    if missing:
+        raise StockError(f"Inventory item(s) {', '.join(map(str, sorted(missing)))} do not exist.")
+    short = [
+        f"{lots[lot_id]['lot_number']}: {lots[lot_id]['available_meters']}m available"
+        for lot_id, meters in totals.items()
+        if lots[lot_id]['available_meters'] + meters < 0
+    ]
+    if short:
+        raise StockError(f"Insufficient stock ({'; '.join(short)}).")
+
+    if len(totals) == 1:
+        delta = Value(next(iter(totals.values())))
+    else:
+        delta = Case(
+            *[When(pk=lot_id, then=Value(meters)) for lot_id, meters in totals.items()],
+            default=Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2)
+        )
+    InventoryItem.objects.filter(pk__in=list(totals)).update(
+        available_meters=F('available_meters') + delta,
+        updated_at=timezone.now()
+    )
+    record_changes(InventoryItem, totals)
+    bump_version_on_commit(InventoryItem)
+    return StockMovement.objects.bulk_create(movements)
+
+
+def move_stock(lines, movement_type, date, reference_id='', notes=''):
+    """Apply signed ``(lot id, meters)`` lines as one movement per lot"""
+    return apply_movements([
+        StockMovement(
+            inventory_item_id=lot_id, movement_type=movement_type, meters=meters,
+            date=date, reference_id=reference_id, notes=notes
+        )
+        for lot_id, meters in _totals(lines).items() if meters
+    ])
+
+
+def sell_stock(lines, date, reference_id):
+    """Take ``(lot id, meters)`` invoice lines out of stock, or raise ``StockError``"""
+    return move_stock([(lot_id, -meters) for lot_id, meters in lines], 'Sale', date, reference_id)
+
+
+def return_stock(lines, date, reference_id, notes=''):
+    """Put ``(lot id, meters)`` back into stock"""
+    return move_stock(lines, 'Return', date, reference_id, notes)
+
+
+def receive_stock(lots):
+    """Open new lots: available equals received, with a receipt in the ledger.
+
+    For lots just inserted (one at a time or with ``bulk_create``) whose
+    ``available_meters`` was set to ``meters`` on insert.
+    """
+    return StockMovement.objects.bulk_create([
+        StockMovement(
+            inventory_item_id=lot.pk, movement_type='Receipt', meters=lot.meters,
+            date=lot.received_date, reference_id=lot.lot_number
+        )
+        for lot in lots
+    ])
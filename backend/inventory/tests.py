@@ -0,0 +1,241 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+from accounts.models import Customer, Vendor
+from core.models import User
+from transactions.models import Invoice
+from .models import InventoryItem, StockMovement
+from .stock import move_stock, receive_stock
+
+
+class StockMovementTests(APITestCase):
+    """Sales, returns and corrections move ``available_meters`` through the movement ledger"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('stock', password='stock'))
+        self.customer = Customer.objects.create(name='Customer', contact='c')
+        vendor = Vendor.objects.create(name='Vendor', contact='v')
+        response = self.client.post('/api/inventory/', {
+            'lot_number': 'LOT-1', 'fabric_type': 'Cotton', 'meters': '100', 'unit_price': '5',
+            'vendor': vendor.pk, 'received_date': date.today().isoformat(),
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        self.lot = InventoryItem.objects.get(pk=response.data['id'])
+
+    def sell(self, number, meters):
+        return self.client.post('/api/invoices/', {
+            'invoice_number': number, 'customer': self.customer.pk,
+            'date': date.today().isoformat(), 'due_date': date.today().isoformat(),
+            'items': [{'inventory_item': self.lot.pk, 'meters': meters, 'price': '7'}],
+        }, format='json')
+
+    def available(self):
+        self.lot.refresh_from_db()
+        return self.lot.available_meters
+
+    def movements(self):
+        return list(
+            StockMovement.objects.filter(inventory_item=self.lot).order_by('id')
+            .values_list('movement_type', 'meters')
+        )
+
+    def test_overselling_is_rejected(self):
+        self.assertEqual(self.sell('INV-1', '60').status_code, 201)
+        response = self.sell('INV-2', '41')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'].code, 'insufficient_stock')
+        self.assertIn('LOT-1: 40.00m available', str(response.data['detail']))
+        self.assertFalse(Invoice.objects.filter(invoice_number='INV-2').exists())
+        self.assertEqual(self.available(), Decimal('40'))
+
+    def test_deleting_an_invoice_returns_its_meters(self):
+        invoice = self.sell('INV-1', '25').data['id']
+        self.assertEqual(self.available(), Decimal('75'))
+        self.assertEqual(self.client.delete(f'/api/invoices/{invoice}/').status_code, 204)
+        self.assertEqual(self.available(), Decimal('100'))
+        self.assertEqual(
+            self.movements(),
+            [('Receipt', Decimal('100')), ('Sale', Decimal('-25')), ('Return', Decimal('25'))]
+        )
+
+    def test_editing_received_meters_records_an_adjustment(self):
+        self.sell('INV-1', '30')
+        response = self.client.patch(f'/api/inventory/{self.lot.pk}/', {'meters': '90'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(Decimal(response.data['available_meters']), Decimal('60'))
+        self.assertEqual(self.movements()[-1], ('Adjustment', Decimal('-10')))
+
+        # Below what has already been sold
+        response = self.client.patch(f'/api/inventory/{self.lot.pk}/', {'meters': '20'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'].code, 'insufficient_stock')
+        self.lot.refresh_from_db()
+        self.assertEqual((self.lot.meters, self.lot.available_meters), (Decimal('90'), Decimal('60')))
+
+
+class InventoryFilterTests(APITestCase):
+    """Received-date bounds and the ``in_stock`` filter derived from available meters"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('lots', password='lots'))
+        vendor = Vendor.objects.create(name='Vendor', contact='v')
+        lots = [
+            InventoryItem.objects.create(
+                lot_number=f'LOT-{day.day}', fabric_type='Cotton', meters=Decimal('10'), unit_price=Decimal('1'),
+                vendor=vendor, received_date=day, available_meters=Decimal(available)
+            )
+            for day, available in ((date(2024, 3, 1), '10'), (date(2024, 3, 10), '0'), (date(2024, 3, 20), '4'))
+        ]
+        receive_stock(lots)
+
+    def test_filters(self):
+        for query, expected in (
+            ('date_from=2024-03-10', ['LOT-10', 'LOT-20']),
+            ('date_to=2024-03-10', ['LOT-1', 'LOT-10']),
+            ('in_stock=true', ['LOT-1', 'LOT-20']),
+            ('in_stock=false', ['LOT-10']),
+            ('in_stock=true&date_from=2024-03-02', ['LOT-20']),
+        ):
+            with self.subTest(query):
+                response = self.client.get(f'/api/inventory/?{query}')
+                self.assertEqual(response.status_code, 200, response.data)
+                self.assertEqual(sorted(row['lot_number'] for row in response.data['results']), expected)
+
+
+class AvailableLotsTests(APITestCase):
+    """``available/`` clamps its limit and keys the ETag on the limit it applied"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('picker', password='picker'))
+        vendor = Vendor.objects.create(name='Vendor', contact='v')
+        receive_stock([
+            InventoryItem.objects.create(
+                lot_number=f'LOT-{n}', fabric_type='Cotton', meters=Decimal('10'), unit_price=Decimal('1'),
+                vendor=vendor, received_date=date.today(), available_meters=Decimal('10')
+            )
+            for n in range(3)
+        ])
+
+    def test_limit_is_clamped(self):
+        for query, expected in (('', 3), ('?limit=2', 2), ('?limit=0', 1), ('?limit=-5', 1), ('?limit=lots', 3)):
+            with self.subTest(query):
+                response = self.client.get(f'/api/inventory/available/{query}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data), expected)
+
+    def test_limit_is_part_of_the_etag(self):
+        etag = self.client.get('/api/inventory/available/')['ETag']
+        self.assertEqual(self.client.get('/api/inventory/available/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Same URL and rows, but a lower cap serves a different body
+        with mock.patch('inventory.views.AVAILABLE_LIMIT', 2):
+            response = self.client.get('/api/inventory/available/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+
+class MarkBilledTests(APITestCase):
+    """``POST mark_billed/`` flags many lots with one UPDATE and rejects unknown ids"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('billing', password='billing'))
+        vendor = Vendor.objects.create(name='Vendor', contact='v')
+        self.lots = [
+            InventoryItem.objects.create(
+                lot_number=f'LOT-{n}', fabric_type='Cotton', meters=Decimal('1'), unit_price=Decimal('1'),
+                vendor=vendor, received_date=date.today(), available_meters=Decimal('1'), is_billed=n == 0
+            ).pk
+            for n in range(3)
+        ]
+
+    def billed(self):
+        return list(InventoryItem.objects.order_by('pk').values_list('is_billed', flat=True))
+
+    def test_lots_are_marked(self):
+        response = self.client.post('/api/inventory/mark_billed/', {'ids': self.lots[:2]}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data, {'requested': 2, 'marked': 1})
+        self.assertEqual(self.billed(), [True, True, False])
+
+    def test_unknown_ids_are_rejected(self):
+        unknown = max(self.lots) + 1
+        response = self.client.post('/api/inventory/mark_billed/', {'ids': [self.lots[2], unknown]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(str(response.data['ids'][0]), f'Unknown inventory item(s): {unknown}.')
+        for ids in ([], [0]):
+            with self.subTest(ids=ids):
+                response = self.client.post('/api/inventory/mark_billed/', {'ids': ids}, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('ids', response.data)
+        self.assertEqual(self.billed(), [True, False, False])
+
+
+class ValuationTests(APITestCase):
+    """FIFO takes sales from the oldest lot of a fabric type, whichever lots are reported"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user('valuer', password='valuer'))
+        self.old_vendor = Vendor.objects.create(name='Old', contact='o')
+        self.new_vendor = Vendor.objects.create(name='New', contact='n')
+        self.lots = [
+            InventoryItem.objects.create(
+                lot_number=lot_number, fabric_type='Cotton', meters=Decimal('100'), unit_price=Decimal(price),
+                vendor=vendor, received_date=received, available_meters=Decimal('100')
+            )
+            for lot_number, vendor, price, received in (
+                ('OLD', self.old_vendor, '5', date(2024, 3, 1)),
+                ('NEW', self.new_vendor, '7', date(2024, 3, 5)),
+            )
+        ]
+        receive_stock(self.lots)
+        # Sold out of the newer lot
+        move_stock([(self.lots[1].pk, Decimal('-30'))], 'Sale', date(2024, 3, 10))
+
+    def valuation(self, query=''):
+        response = self.client.get(f'/api/inventory/valuation/?as_of=2024-03-31&period_from=2024-03-01{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def figures(self, row):
+        return row['on_hand_meters'], row['value'], row['cogs']
+
+    def test_fifo(self):
+        data = self.valuation('&group_by=lot')
+        self.assertEqual(self.figures(data['totals']), (170.0, 1050.0, 150.0))
+        self.assertEqual(
+            [(row['lot_number'], *self.figures(row)) for row in data['groups']],
+            [('OLD', 70.0, 350.0, 150.0), ('NEW', 100.0, 700.0, 0.0)]
+        )
+        self.assertEqual(data['count'], 2)
+
+        # Narrowing the report keeps the whole fabric type as the pool
+        data = self.valuation(f'&vendor={self.new_vendor.pk}&group_by=vendor')
+        self.assertEqual(self.figures(data['totals']), (100.0, 700.0, 0.0))
+        self.assertEqual([row['vendor__name'] for row in data['groups']], ['New'])
+
+    def test_average(self):
+        data = self.valuation('&method=average')
+        self.assertEqual(self.figures(data['totals']), (170.0, 1020.0, 180.0))
+        self.assertEqual(data['groups'][0]['aging']['181+'], {'meters': 0.0, 'value': 0.0})
+        self.assertEqual(data['groups'][0]['aging']['0-30'], {'meters': 170.0, 'value': 1020.0})
+
+
+class ValuationParamTests(APITestCase):
+    """Bad valuation dates are a ``400`` naming the parameter"""
+
+    def test_invalid_dates_are_rejected(self):
+        self.client.force_authenticate(User.objects.create_user('valuation', password='valuation'))
+        for query, field in (
+            ('as_of=2024-02-30', 'as_of'),
+            ('as_of=yesterday', 'as_of'),
+            ('as_of=2024-03-31&period_from=2024-13-01', 'period_from'),
+            ('as_of=2024-03-31&period_from=2024-04-01', 'period_from'),
+        ):
+            with self.subTest(query):
+                response = self.client.get(f'/api/inventory/valuation/?{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(list(response.data), [field])
+        response = self.client.get('/api/inventory/valuation/?as_of=2024-02-29&period_from=2024-02-01')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,242 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connections, models
+from django.db.models import Case, F, Sum, Value, When, Window
+from django.db.models.functions import Greatest, Least
+from django.db.models.lookups import GreaterThan
+from core.summaries import sum_subquery
+from transactions.models import BillItem, InvoiceItem
+from .models import InventoryItem, StockMovement
+
+METHODS = ('fifo', 'average')
+
+# Output columns identifying each group
+GROUPINGS = {
+    'fabric_type': ('fabric_type',),
+    'vendor': ('vendor', 'vendor__name'),
+    'lot': ('id', 'lot_number', 'fabric_type', 'vendor', 'received_date'),
+}
+GROUP_ORDERING = {
+    'fabric_type': ('fabric_type',),
+    'vendor': ('vendor__name', 'vendor'),
+    'lot': ('received_date', 'lot_number', 'id'),
+}
+
+# Days in stock by received date, as (label, from, to); the last is open ended
+AGING_BUCKETS = (
+    ('0-30', 0, 30),
+    ('31-60', 31, 60),
+    ('61-90', 61, 90),
+    ('91-180', 91, 180),
+    ('181+', 181, None),
+)
+
+MEASURES = ('received_meters', 'on_hand_meters', 'value', 'cogs', 'revenue')
+
+_meters = models.DecimalField(max_digits=14, decimal_places=2)
+_cost = models.DecimalField(max_digits=14, decimal_places=4)
+_ZERO = Value(Decimal('0'), output_field=_meters)
+
+# Lot columns the grouped rows can show, aliased apart from the model's fields
+_COLUMNS = {name: f"group_{name.replace('__', '_')}" for names in GROUPINGS.values() for name in names}
+
+
+def unit_cost():
+    """Cost per meter of a lot: its billed price, or ``unit_price`` until billed"""
+    billed_meters = sum_subquery(BillItem.objects.all(), 'inventory_item', F('meters'))
+    billed_value = sum_subquery(BillItem.objects.all(), 'inventory_item', F('meters') * F('price'))
+    return Case(
+        When(GreaterThan(billed_meters, 0), then=billed_value / billed_meters),
+        default=F('unit_price'),
+        output_field=_cost
+    )
+
+
+def _on_hand(as_of):
+    """Meters physically left in the lot at the end of ``as_of``, from the ledger"""
+    return sum_subquery(StockMovement.objects.filter(date__lte=as_of), 'inventory_item', F('meters'))
+
+
+def _pool(expression, output_field=_meters, **window):
+    """``SUM(expression)`` over the lot's fabric type, as a window"""
+    return Window(Sum(expression), partition_by=F('fabric_type'), output_field=output_field, **window)
+
+
+def _fifo_on_hand(received, held):
+    """The lot's share of its fabric type's stock when the oldest lots go first.
+
+    ``received`` and ``held`` are what the lot received and physically
+    holds. Everything that left the fabric type is taken from its lots in
+    ``(received_date, id)`` order, whichever lot it physically came from.
+    """
+    pool_out = _pool(received) - _pool(held)
+    running = _pool(received, order_by=(F('received_date'), F('id')))
+    return Greatest(Least(running - pool_out, received), _ZERO, output_field=_meters)
+
+
+def _average_cost():
+    """Weighted average cost per meter of the lot's fabric type"""
+    meters = _pool(F('meters'))
+    return Case(
+        When(GreaterThan(meters, 0), then=_pool(F('meters') * unit_cost(), _cost) / meters),
+        default=unit_cost(),
+        output_field=_cost
+    )
+
+
+def lot_figures(method, as_of, period_from):
+    """Every lot received by ``as_of``, annotated with its valuation figures.
+
+    ``closing`` and ``opening`` are the meters on hand at the end of
+    ``as_of`` and of the day before ``period_from``. ``consumed`` is what
+    left stock in between: sales net of returns, plus negative adjustments.
+    With ``average`` every meter is costed at the period-end weighted
+    average (a periodic average).
+
+    FIFO pools and average costs are windows over every lot of a fabric
+    type, so this queryset must not be filtered further.
+    """
+    day_before = period_from - timedelta(days=1)
+    lots = InventoryItem.objects.filter(received_date__lte=as_of).order_by().annotate(
+        received=F('meters'),
+        received_before=Case(
+            When(received_date__lte=day_before, then=F('meters')), default=_ZERO, output_field=_meters
+        ),
+        held=_on_hand(as_of),
+        held_before=_on_hand(day_before),
+    )
+    if method == 'fifo':
+        lots = lots.annotate(
+            closing=_fifo_on_hand(F('received'), F('held')),
+            opening=_fifo_on_hand(F('received_before'), F('held_before')),
+            cost=unit_cost(),
+        )
+    else:
+        lots = lots.annotate(closing=F('held'), opening=F('held_before'), cost=_average_cost())
+    aging = [
+        When(received_date__gte=as_of - timedelta(days=high), then=Value(index))
+        for index, (_, _, high) in enumerate(AGING_BUCKETS) if high is not None
+    ]
+    return lots.annotate(
+        consumed=(F('received') - F('closing')) - (F('received_before') - F('opening')),
+        revenue=sum_subquery(
+            InvoiceItem.objects.filter(invoice__date__gte=period_from, invoice__date__lte=as_of),
+            'inventory_item', F('meters') * F('price')
+        ),
+        aging=Case(*aging, default=Value(len(AGING_BUCKETS) - 1)),
+    )
+
+
+def _decimal(value):
+    """SQLite returns sums of decimals as floats"""
+    return Decimal(str(value)) if isinstance(value, float) else value
+
+
+class ValuationRows:
+    """Valuation of ``queryset``'s lots, a row per group of ``group_by`` (one row without).
+
+    The per-lot figures are window results, which cannot be aggregated in
+    the query computing them, so they are selected in a subquery, each
+    once, and summed by an outer query. ``queryset`` only narrows which
+    lots are summed, never the pools. Rows are fetched when iterated or
+    sliced, so they page like a queryset.
+    """
+
+    def __init__(self, queryset, method, as_of, period_from, group_by=None):
+        self.lots = lot_figures(method, as_of, period_from)
+        self.reported = queryset.filter(received_date__lte=as_of).order_by()
+        self.group_by = group_by
+
+    def count(self):
+        if self.group_by is None:
+            return 1
+        return self.reported.values(*GROUPINGS[self.group_by]).distinct().count()
+
+    def __iter__(self):
+        return iter(self.fetch())
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError('Valuation rows can only be sliced.')
+        offset = key.start or 0
+        return self.fetch(offset, None if key.stop is None else max(key.stop - offset, 0))
+
+    def fetch(self, offset=0, limit=None):
+        connection = connections[self.lots.db]
+        quote = connection.ops.quote_name
+        inner, params = self.lots.values(
+            'received', 'closing', 'cost', 'consumed', 'revenue', 'aging',
+            **{alias: F(name) for name, alias in _COLUMNS.items()}
+        ).query.sql_with_params()
+        reported, reported_params = self.reported.values('pk').query.sql_with_params()
+
+        def column(name):
+            return f'lots.{quote(_COLUMNS.get(name, name))}'
+
+        closing, value = column('closing'), f"{column('closing')} * {column('cost')}"
+        measures = {
+            'lots': 'COUNT(*)',
+            'received_meters': f"SUM({column('received')})",
+            'on_hand_meters': f'SUM({closing})',
+            'value': f'SUM({value})',
+            'cogs': f"SUM({column('consumed')} * {column('cost')})",
+            'revenue': f"SUM({column('revenue')})",
+        }
+        for index in range(len(AGING_BUCKETS)):
+            bucket = f"{column('aging')} = {index}"
+            measures[f'aging{index}_meters'] = f'SUM(CASE WHEN {bucket} THEN {closing} END)'
+            measures[f'aging{index}_value'] = f'SUM(CASE WHEN {bucket} THEN {value} END)'
+
+        names = GROUPINGS[self.group_by] if self.group_by else ()
+        sql = (
+            f"SELECT {', '.join([*map(column, names), *measures.values()])} "
+            f"FROM ({inner}) lots WHERE {column('id')} IN ({reported})"
+        )
+        params = (*params, *reported_params)
+        if names:
+            sql += (
+                f" GROUP BY {', '.join(map(column, names))}"
+                f" ORDER BY {', '.join(map(column, GROUP_ORDERING[self.group_by]))}"
+            )
+        if limit is not None or offset:
+            # OFFSET needs a LIMIT on SQLite and MySQL
+            sql += ' LIMIT %s OFFSET %s'
+            params += (limit if limit is not None else 2 ** 62, offset)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return [
+            {
+                **dict(zip(names, row)),
+                **{name: _decimal(figure) for name, figure in zip(measures, row[len(names):])},
+            }
+            for row in rows
+        ]
+
+
+def format_row(row):
+    """Nest the aging columns and turn the figures into rounded floats"""
+    row = dict(row)
+    aging = {
+        label: {
+            'meters': round(float(row.pop(f'aging{index}_meters') or 0), 2),
+            'value': round(float(row.pop(f'aging{index}_value') or 0), 2),
+        }
+        for index, (label, _, _) in enumerate(AGING_BUCKETS)
+    }
+    for name in MEASURES:
+        row[name] = round(float(row[name] or 0), 2)
+    row['gross_margin'] = round(row['revenue'] - row['cogs'], 2)
+    row['aging'] = aging
+    return row
+
+
+def inventory_valuation(queryset, method, as_of, period_from, group_by):
+    """``(totals, rows)`` for ``queryset``'s lots: the totals, and the rows by ``group_by``.
+
+    FIFO pools and average costs always span every lot of a fabric type;
+    ``queryset`` only narrows which lots are reported.
+    """
+    totals = next(iter(ValuationRows(queryset, method, as_of, period_from)))
+    return format_row(totals), ValuationRows(queryset, method, as_of, period_from, group_by)
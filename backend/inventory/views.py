@@ -4,47 +4,92 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
-from django.db.models import Sum, Q
+from django.db import transaction as db_transaction
+from django.db.models import Count, Sum, Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from core.summaries import SummaryMixin, summarize
+from core.response_cache import cached_response
+from core.csv_import import CsvImportMixin
+from core.fieldsets import SparseFieldsetMixin
+from core.conditional import ConditionalGetMixin, conditional_response
+from core.search import RankedSearchFilter
+from core.params import query_date
+from .imports import InventoryImporter
 from .models import InventoryItem, ItemMaster
+from .filters import InventoryItemFilter
+from .stock import move_stock, receive_stock
 from .serializers import (
     InventoryItemSerializer, 
     InventoryItemDetailSerializer,
-    ItemMasterSerializer
+    ItemMasterSerializer,
+    MarkBilledSerializer,
+    StockMovementSerializer,
+    StockAdjustmentSerializer
 )
 
+# Most lots the invoice picker loads at once
+AVAILABLE_LIMIT = 500
 
-class InventoryItemViewSet(viewsets.ModelViewSet):
+
+class InventoryItemViewSet(CsvImportMixin, SummaryMixin, SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing inventory items"""
     queryset = InventoryItem.objects.all().select_related('vendor')
     serializer_class = InventoryItemSerializer
+    conditional_models = ('accounts.Vendor',)
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['vendor', 'is_billed', 'fabric_type']
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, RankedSearchFilter]
+    filterset_class = InventoryItemFilter
     search_fields = ['lot_number', 'fabric_type']
     ordering_fields = ['received_date', 'lot_number', 'meters', 'unit_price']
     ordering = ['-received_date']
+    csv_importer_class = InventoryImporter
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return InventoryItemDetailSerializer
         return InventoryItemSerializer
+
+    @db_transaction.atomic
+    def perform_create(self, serializer):
+        item = serializer.save(available_meters=serializer.validated_data['meters'])
+        receive_stock([item])
+
+    @db_transaction.atomic
+    def perform_update(self, serializer):
+        """Record a change to the received meters as an adjustment"""
+        received = (
+            InventoryItem.objects.select_for_update()
+            .values_list('meters', flat=True).get(pk=serializer.instance.pk)
+        )
+        item = serializer.save()
+        if item.meters != received:
+            move_stock(
+                [(item.pk, item.meters - received)], 'Adjustment', timezone.localdate(),
+                item.lot_number, 'Received meters corrected'
+            )
+            item.refresh_from_db(fields=['available_meters', 'updated_at'])
     
     @action(detail=False, methods=['get'])
+    @cached_response('inventory.InventoryItem')
     def summary(self, request):
         """Get inventory summary statistics"""
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        total_items = queryset.count()
-        total_meters = queryset.aggregate(total=Sum('meters'))['total'] or 0
-        unbilled_items = queryset.filter(is_billed=False).count()
+        totals, by_billed = summarize(
+            self.get_summary_queryset(),
+            {'count': (Count, 'id'), 'meters': (Sum, 'meters'), 'available': (Sum, 'available_meters')},
+            group_field='is_billed',
+            group_values=[False]
+        )
         
         return Response({
-            'total_items': total_items,
-            'total_meters': float(total_meters),
-            'unbilled_items': unbilled_items,
+            'total_items': totals['count'],
+            'total_meters': float(totals['meters']),
+            'available_meters': float(totals['available']),
+            'unbilled_items': by_billed[False]['count'],
         })
     
     @action(detail=False, methods=['get'])
+    @cached_response('inventory.InventoryItem', 'accounts.Vendor')
     def by_vendor(self, request):
         """Get inventory grouped by vendor"""
         from django.db.models import Count, Sum
@@ -66,29 +111,157 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
         
         return Response(data)
     
+    @action(detail=False, methods=['get'])
+    @cached_response('inventory.InventoryItem', 'transactions.Invoice', 'transactions.Bill', 'core.ClosedPeriod')
+    def valuation(self, request):
+        """Stock value, COGS and aging by fabric type, vendor or lot (FIFO or weighted average).
+
+        An unfiltered valuation of exactly a closed month, by fabric type,
+        is read from the month's snapshot.
+        """
+        from core.snapshots import inventory_snapshot, month_bounds
+        from .valuation import GROUPINGS, METHODS, format_row, inventory_valuation
+
+        params = request.query_params
+        method = params.get('method', 'fifo')
+        group_by = params.get('group_by', 'fabric_type')
+        errors = {}
+        as_of = query_date(params, 'as_of', errors)
+        period_from = query_date(params, 'period_from', errors)
+        if method not in METHODS:
+            errors['method'] = f"Expected one of: {', '.join(METHODS)}."
+        if group_by not in GROUPINGS:
+            errors['group_by'] = f"Expected one of: {', '.join(GROUPINGS)}."
+        if not errors:
+            as_of = as_of or timezone.localdate()
+            period_from = period_from or as_of.replace(day=1)
+            if period_from > as_of:
+                errors['period_from'] = 'Must not be after as_of.'
+        if errors:
+            raise ValidationError(errors)
+
+        snapshot = None
+        if (
+            group_by == 'fabric_type' and (period_from, as_of) == month_bounds(as_of)
+            and as_of < timezone.localdate()
+            and set(params) <= {'method', 'group_by', 'as_of', 'period_from'}
+        ):
+            snapshot = inventory_snapshot(method, as_of, period_from)
+        if snapshot is not None:
+            totals, groups = snapshot
+            return Response({
+                'method': method,
+                'group_by': group_by,
+                'as_of': as_of,
+                'period_from': period_from,
+                'totals': totals,
+                'groups': groups,
+            })
+
+        totals, rows = inventory_valuation(
+            self.get_summary_queryset(), method, as_of, period_from, group_by
+        )
+        data = {
+            'method': method,
+            'group_by': group_by,
+            'as_of': as_of,
+            'period_from': period_from,
+            'totals': totals,
+        }
+        if group_by == 'lot':
+            # One row per lot: served a page at a time
+            page = self.paginate_queryset(rows)
+            data.update(
+                count=self.paginator.page.paginator.count,
+                next=self.paginator.get_next_link(),
+                previous=self.paginator.get_previous_link(),
+            )
+            rows = page
+        data['groups'] = [format_row(row) for row in rows]
+        return Response(data)
+
     @action(detail=True, methods=['post'])
     def mark_billed(self, request, pk=None):
         """Mark an inventory item as billed"""
         item = self.get_object()
-        item.is_billed = True
-        item.save()
+        InventoryItem.mark_billed([item.pk])
+        item.refresh_from_db()
         serializer = self.get_serializer(item)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], url_path='mark_billed', url_name='bulk-mark-billed')
+    def bulk_mark_billed(self, request):
+        """Mark many inventory items as billed with one UPDATE, e.g. ``{"ids": [1, 2, 3]}``"""
+        selection = MarkBilledSerializer(data=request.data)
+        selection.is_valid(raise_exception=True)
+        ids = selection.validated_data['ids']
+        marked = InventoryItem.mark_billed(ids)
+        return Response({'requested': len(ids), 'marked': marked})
+
+    @action(detail=False, methods=['get'])
+    def available(self, request):
+        """Lots with meters left to sell, in a compact form for the invoice picker.
+
+        ``?limit=`` is clamped to ``1..AVAILABLE_LIMIT``; a non-numeric one is ignored.
+        """
+        queryset = self.filter_queryset(
+            InventoryItem.objects.filter(available_meters__gt=0)
+        ).order_by('fabric_type', 'lot_number')
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', AVAILABLE_LIMIT)), AVAILABLE_LIMIT))
+        except ValueError:
+            limit = AVAILABLE_LIMIT
+        last_modified, etag = self.queryset_validators(queryset, limit)
+        return conditional_response(
+            request, etag,
+            lambda: [
+                {**lot, 'available_meters': float(lot['available_meters']), 'unit_price': float(lot['unit_price'])}
+                for lot in queryset.values(
+                    'id', 'lot_number', 'fabric_type', 'vendor_id', 'unit_price', 'available_meters'
+                )[:limit]
+            ],
+            last_modified
+        )
+
+    @action(detail=True, methods=['get'])
+    def movements(self, request, pk=None):
+        """Stock ledger of a lot, newest first"""
+        item = self.get_object()
+        serializer = StockMovementSerializer(item.stock_movements.all(), many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['post'])
+    def adjust(self, request, pk=None):
+        """Return meters to a lot or correct its stock with a signed adjustment"""
+        item = self.get_object()
+        adjustment = StockAdjustmentSerializer(data=request.data)
+        adjustment.is_valid(raise_exception=True)
+        data = adjustment.validated_data
+        movements = move_stock(
+            [(item.pk, data['meters'])], data['movement_type'],
+            data.get('date') or timezone.localdate(), data['reference_id'], data['notes']
+        )
+        return Response(StockMovementSerializer(movements[0]).data, status=status.HTTP_201_CREATED)
+
 
-class ItemMasterViewSet(viewsets.ModelViewSet):
+class ItemMasterViewSet(SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing item master catalog"""
     queryset = ItemMaster.objects.all()
     serializer_class = ItemMasterSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, RankedSearchFilter]
     filterset_fields = ['category', 'is_active']
-    search_fields = ['code', 'name', 'category', 'description']
+    search_fields = ['code', 'name', 'category']
+    search_text_fields = ['description']
     ordering_fields = ['code', 'name', 'category', 'standard_price']
     ordering = ['code']
     
     @action(detail=False, methods=['get'])
     def categories(self, request):
         """Get list of unique categories"""
-        categories = ItemMaster.objects.values_list('category', flat=True).distinct()
-        return Response(list(categories))
+        last_modified, etag = self.queryset_validators(ItemMaster.objects.all())
+        return conditional_response(
+            request, etag,
+            lambda: list(ItemMaster.objects.values_list('category', flat=True).distinct()),
+            last_modified
+        )
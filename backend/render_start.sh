@@ -46,6 +46,11 @@ set -euo pipefail
 # Run migrations
 python manage.py migrate --noinput
 
+# Create the database cache table (no-op for other cache backends) and refuse
+# to start with a per-process cache, which goes stale across workers
+python manage.py createcachetable
+python manage.py check --deploy --fail-level ERROR
+
 # collect static to default STATIC_ROOT (we do not serve static from Django in prod)
 python manage.py collectstatic --noinput
 
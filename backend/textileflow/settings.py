@@ -130,6 +130,43 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Cache
+# Used for versioned summary responses. LocMemCache is per worker process,
+# so with several workers a write only invalidates the worker that made it:
+# production must point CACHE_BACKEND/CACHE_LOCATION at a shared cache
+# (`manage.py check --deploy` fails otherwise, see core.checks).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'textileflow'),
+    }
+}
+
+# Seconds a cached summary may live (it is invalidated on any relevant write)
+SUMMARY_CACHE_TIMEOUT = int(os.getenv('SUMMARY_CACHE_TIMEOUT', '300'))
+
+# How long the changes feed waits for a gap in the change sequence (a write
+# still being committed) before treating it as rolled back
+CHANGES_SETTLE_SECONDS = int(os.getenv('CHANGES_SETTLE_SECONDS', '30'))
+
+# Days of change log kept by prune_changes; clients whose cursor is older
+# get "resync" from the changes feed and reload from /api/bootstrap/
+CHANGES_RETENTION_DAYS = int(os.getenv('CHANGES_RETENTION_DAYS', '30'))
+
+# Fan-out behind the /api/events/ stream. PostgresBroker relays events
+# between worker processes with LISTEN/NOTIFY; LocalBroker only reaches
+# streams served by the same process (one worker, SQLite, tests).
+CHANGE_EVENTS_BROKER = os.getenv(
+    'CHANGE_EVENTS_BROKER',
+    'core.events.PostgresBroker'
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+    else 'core.events.LocalBroker'
+)
+
+# Seconds between keep-alive comments on an idle event stream
+CHANGE_EVENTS_HEARTBEAT_SECONDS = int(os.getenv('CHANGE_EVENTS_HEARTBEAT_SECONDS', '25'))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -172,7 +209,9 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
 ]
+CORS_EXPOSE_HEADERS = ['ETag']
 CORS_ALLOW_METHODS = [
     'DELETE',
     'GET',
@@ -185,7 +224,7 @@ CORS_ALLOW_METHODS = [
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
@@ -195,8 +234,8 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 100,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
-        'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
+        'core.search.RankedSearchFilter',
     ],
 }
 
@@ -205,8 +244,22 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=12),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
-    'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # Spent refresh tokens are recorded in core.RevokedToken and whole users
+    # revoked by generation (core.authentication) instead of simplejwt's
+    # outstanding/blacklist tables
+    'BLACKLIST_AFTER_ROTATION': False,
+    # TokenObtainPairSerializer writes last_login at most every
+    # LAST_LOGIN_RESOLUTION_SECONDS
+    'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_OBTAIN_SERIALIZER': 'core.authentication.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'core.authentication.TokenRefreshSerializer',
 }
+
+# Seconds the user row behind a token is kept in the cache; saving or
+# deleting the user drops it at once
+AUTH_USER_CACHE_SECONDS = int(os.getenv('AUTH_USER_CACHE_SECONDS', '30'))
+
+# Logins record last_login only when the stored one is older than this
+LAST_LOGIN_RESOLUTION_SECONDS = int(os.getenv('LAST_LOGIN_RESOLUTION_SECONDS', '3600'))
@@ -0,0 +1,54 @@
+import django_filters
+from .models import Transaction, PaymentRecord, Invoice, Bill
+
+
+class TransactionFilter(django_filters.FilterSet):
+    """Filters for transactions, including date and amount ranges"""
+    date_from = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    min_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='gte')
+    max_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='lte')
+
+    class Meta:
+        model = Transaction
+        fields = ['transaction_type', 'vendor', 'customer']
+
+
+class PaymentRecordFilter(django_filters.FilterSet):
+    """Filters for payment records, including date and amount ranges"""
+    date_from = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    min_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='gte')
+    max_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='lte')
+
+    class Meta:
+        model = PaymentRecord
+        fields = ['method', 'invoice', 'bill']
+
+
+class InvoiceFilter(django_filters.FilterSet):
+    """Filters for invoices, including date, due date and total ranges"""
+    date_from = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    due_date_from = django_filters.DateFilter(field_name='due_date', lookup_expr='gte')
+    due_date_to = django_filters.DateFilter(field_name='due_date', lookup_expr='lte')
+    min_amount = django_filters.NumberFilter(field_name='total', lookup_expr='gte')
+    max_amount = django_filters.NumberFilter(field_name='total', lookup_expr='lte')
+
+    class Meta:
+        model = Invoice
+        fields = ['status', 'customer', 'broker', 'commission_type']
+
+
+class BillFilter(django_filters.FilterSet):
+    """Filters for bills, including date, due date and total ranges"""
+    date_from = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    due_date_from = django_filters.DateFilter(field_name='due_date', lookup_expr='gte')
+    due_date_to = django_filters.DateFilter(field_name='due_date', lookup_expr='lte')
+    min_amount = django_filters.NumberFilter(field_name='total', lookup_expr='gte')
+    max_amount = django_filters.NumberFilter(field_name='total', lookup_expr='lte')
+
+    class Meta:
+        model = Bill
+        fields = ['status', 'vendor']
@@ -0,0 +1,260 @@
+from decimal import Decimal
+from django.db import models as db_models
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from accounts.models import Vendor, Customer
+from core.changes import record_changes
+from core.closing import closed_through, ensure_open
+from core.csv_import import (
+    CsvImporter, NameResolver, RowError,
+    parse_date_value, parse_id, parse_items_cell,
+)
+from core.money import money
+from core.response_cache import bump_version_on_commit
+from core.rollups import bill_entries, invoice_entries, post_rollups
+from inventory.models import InventoryItem, StockMovement
+from inventory.stock import apply_movements
+from .models import Transaction, Invoice, InvoiceItem, Bill, BillItem
+
+
+class DocumentImporter(CsvImporter):
+    """Create invoices or bills with their items and ledger transactions.
+
+    Per batch: one lookup each for parties, existing document numbers and
+    referenced lots, then one ``bulk_create`` each for documents, items and
+    transactions. Totals are computed from the items while parsing. Party
+    balances are shifted in the batch's own transaction, with one UPDATE.
+    """
+    model = item_model = party_model = None
+    # Document -> its core.rollups entries
+    rollup_entries = None
+    number_field = party_field = transaction_type = ''
+
+    def __init__(self, upload):
+        super().__init__(upload)
+        self.parties = NameResolver(self.party_model, self.party_model._meta.verbose_name.title())
+        self.existing = set()
+        self.seen = set()
+        self.lots_by_id = {}
+        self.lots_by_number = {}
+        self.closed_through = None
+
+    def parse_row(self, values):
+        number = values['number']
+        if not number:
+            raise RowError({self.number_field: 'This field is required.'})
+        return {
+            'number': number,
+            'party': values['party'],
+            'party_id': parse_id(values['party_id'], f'{self.party_field}_id'),
+            'date': parse_date_value(values['date'], 'date'),
+            'due_date': parse_date_value(values['due_date'], 'due_date'),
+            'notes': values['notes'],
+            'items': parse_items_cell(values['items']),
+        }
+
+    def prepare_batch(self, rows):
+        self.parties.prefetch(
+            names=[row['party'] for row in rows if row['party_id'] is None],
+            ids=[row['party_id'] for row in rows if row['party_id'] is not None]
+        )
+        self.existing = set(
+            self.model.objects.filter(**{f'{self.number_field}__in': [row['number'] for row in rows]})
+            .values_list(self.number_field, flat=True)
+        )
+        self.closed_through = closed_through()
+
+        references = {reference for row in rows for reference, _, _ in row['items']}
+        ids = [int(reference) for reference in references if reference.isdigit()]
+        self.lots_by_id, self.lots_by_number = {}, {}
+        for pk, lot_number in InventoryItem.objects.filter(
+            Q(pk__in=ids) | Q(lot_number__in=references)
+        ).values_list('pk', 'lot_number'):
+            self.lots_by_id[pk] = pk
+            self.lots_by_number.setdefault(lot_number, []).append(pk)
+
+    def resolve_lot(self, reference):
+        """An inventory id, falling back to a unique lot number"""
+        if reference.isdigit() and int(reference) in self.lots_by_id:
+            return int(reference)
+        matches = self.lots_by_number.get(reference, [])
+        if not matches:
+            raise RowError({'items': f'Inventory item {reference} does not exist.'})
+        if len(matches) > 1:
+            raise RowError({'items': f'Lot number {reference} is ambiguous; use the inventory id.'})
+        return matches[0]
+
+    def build(self, row):
+        number = row['number']
+        if number in self.existing or number in self.seen:
+            raise RowError({self.number_field: f'{number} already exists.'})
+        if self.closed_through is not None and row['date'] <= self.closed_through:
+            raise RowError({'date': f'Dates on or before {self.closed_through.isoformat()} are in a closed period.'})
+
+        party_id = self.parties.resolve(row['party'], row['party_id'], self.party_field)
+        items = [
+            (self.resolve_lot(reference), meters, price)
+            for reference, meters, price in row['items']
+        ]
+        document = self.model(**{
+            self.number_field: number,
+            f'{self.party_field}_id': party_id,
+            'date': row['date'],
+            'due_date': row['due_date'],
+            'notes': row['notes'],
+            'total': money(sum(meters * price for _, meters, price in items)),
+        })
+        document.full_clean(exclude=[self.party_field], validate_unique=False, validate_constraints=False)
+        self.check_items(items)
+        self.seen.add(number)
+        return document, items
+
+    def check_items(self, items):
+        """Hook to reject a document's ``(lot id, meters, price)`` items with ``RowError``"""
+
+    def write_batch(self, objects):
+        # prepare_batch checked the dates outside this transaction; a period
+        # closed since then fails the batch here
+        ensure_open(*(document.date for document, _ in objects))
+        documents = self.model.objects.bulk_create([document for document, _ in objects])
+        document_field = self.model._meta.model_name
+        self.item_model.objects.bulk_create([
+            self.item_model(**{
+                document_field: document,
+                'inventory_item_id': inventory_id,
+                'meters': meters,
+                'price': price,
+            })
+            for document, (_, items) in zip(documents, objects)
+            for inventory_id, meters, price in items
+        ])
+        record_changes(self.model, [document.pk for document in documents])
+        post_rollups([entry for document in documents for entry in self.rollup_entries(document)])
+        transactions = Transaction.objects.bulk_create([
+            Transaction(**{
+                'transaction_type': self.transaction_type,
+                'date': document.date,
+                'amount': document.total,
+                'description': f'{self.transaction_type} {getattr(document, self.number_field)}',
+                'reference_id': getattr(document, self.number_field),
+                f'{self.party_field}_id': getattr(document, f'{self.party_field}_id'),
+            })
+            for document in documents
+        ])
+        record_changes(Transaction, [transaction.pk for transaction in transactions])
+        bump_version_on_commit(Transaction)
+        self.apply_balances(documents)
+
+    def apply_balances(self, documents):
+        """Shift each party's balance by its documents' signed totals.
+
+        ``bulk_create`` skips ``Transaction.save()``, so the deltas are applied
+        here with a single UPDATE, after locking the parties in primary key
+        order so concurrent imports cannot deadlock.
+        """
+        deltas = {}
+        for document in documents:
+            party_id = getattr(document, f'{self.party_field}_id')
+            deltas[party_id] = deltas.get(party_id, Decimal('0')) + Transaction.signed_amount(
+                self.transaction_type, document.total
+            )
+        deltas = {party_id: delta for party_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        list(
+            self.party_model.objects.select_for_update().filter(pk__in=list(deltas)).order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        self.party_model.objects.filter(pk__in=list(deltas)).update(
+            balance=F('balance') + Case(
+                *[When(pk=party_id, then=Value(delta)) for party_id, delta in deltas.items()],
+                default=Value(Decimal('0')),
+                output_field=db_models.DecimalField(max_digits=12, decimal_places=2)
+            ),
+            updated_at=timezone.now()
+        )
+        record_changes(self.party_model, deltas)
+        bump_version_on_commit(self.party_model)
+
+
+class InvoiceImporter(DocumentImporter):
+    """Invoices also take their meters out of stock, checked row by row"""
+    model = Invoice
+    item_model = InvoiceItem
+    party_model = Customer
+    models = (Invoice, InvoiceItem, InventoryItem)
+    number_field = 'invoice_number'
+    party_field = 'customer'
+    transaction_type = 'Invoice'
+    rollup_entries = staticmethod(invoice_entries)
+    columns = {
+        'number': ['invoice_number', 'invoicenumber', 'number'],
+        'party': ['customer', 'customer_name', 'customername'],
+        'party_id': ['customer_id'],
+        'date': ['date'],
+        'due_date': ['due_date', 'duedate'],
+        'notes': ['notes'],
+        'items': ['items', 'line_items'],
+    }
+
+    def __init__(self, upload):
+        super().__init__(upload)
+        self.available = {}
+
+    def prepare_batch(self, rows):
+        super().prepare_batch(rows)
+        self.available = dict(
+            InventoryItem.objects.filter(pk__in=list(self.lots_by_id))
+            .values_list('pk', 'available_meters')
+        )
+
+    def check_items(self, items):
+        needed = {}
+        for inventory_id, meters, _ in items:
+            needed[inventory_id] = needed.get(inventory_id, 0) + meters
+        short = [
+            f'{inventory_id} ({self.available[inventory_id]}m available)'
+            for inventory_id, meters in needed.items()
+            if meters > self.available[inventory_id]
+        ]
+        if short:
+            raise RowError({'items': f"Insufficient stock for inventory item(s) {', '.join(short)}."})
+        # Later rows of the batch see what this one takes
+        for inventory_id, meters in needed.items():
+            self.available[inventory_id] -= meters
+
+    def write_batch(self, objects):
+        super().write_batch(objects)
+        apply_movements([
+            StockMovement(
+                inventory_item_id=inventory_id, movement_type='Sale', meters=-meters,
+                date=document.date, reference_id=document.invoice_number
+            )
+            for document, items in objects
+            for inventory_id, meters, _ in items
+        ])
+
+
+class BillImporter(DocumentImporter):
+    """Bills also flag their lots as billed, with one UPDATE per batch"""
+    model = Bill
+    item_model = BillItem
+    party_model = Vendor
+    models = (Bill, BillItem, InventoryItem)
+    number_field = 'bill_number'
+    party_field = 'vendor'
+    transaction_type = 'Bill'
+    rollup_entries = staticmethod(bill_entries)
+    columns = {
+        'number': ['bill_number', 'billnumber', 'number'],
+        'party': ['vendor', 'vendor_name', 'supplier'],
+        'party_id': ['vendor_id'],
+        'date': ['date'],
+        'due_date': ['due_date', 'duedate'],
+        'notes': ['notes'],
+        'items': ['items', 'line_items'],
+    }
+
+    def write_batch(self, objects):
+        super().write_batch(objects)
+        InventoryItem.mark_billed({inventory_id for _, items in objects for inventory_id, _, _ in items})
@@ -0,0 +1,136 @@
+from decimal import Decimal
+from django.conf import settings
+from django.core import signing
+from django.db.models import F, Sum, Window
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from core.pagination import keyset_filter
+from core.params import query_date
+from core.snapshots import balance_snapshot
+from .models import Transaction
+from .serializers import LedgerEntrySerializer
+
+LEDGER_ORDERING = ('date', 'created_at', 'id')
+LEDGER_MAX_PAGE_SIZE = 1000
+LEDGER_CURSOR_SALT = 'transactions.ledger'
+
+_money = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+def _parse_date_param(request, name):
+    errors = {}
+    parsed = query_date(request.query_params, name, errors)
+    if errors:
+        raise ValidationError(errors)
+    return parsed
+
+
+def _page_size(request):
+    try:
+        size = int(request.query_params.get('page_size', settings.REST_FRAMEWORK['PAGE_SIZE']))
+    except (TypeError, ValueError):
+        raise ValidationError({'page_size': 'Expected an integer.'})
+    return max(1, min(size, LEDGER_MAX_PAGE_SIZE))
+
+
+def _decode_cursor(request):
+    """Return ``(date, created_at, id, running balance)`` of the last row served"""
+    token = request.query_params.get('cursor')
+    if not token:
+        return None
+    try:
+        data = signing.loads(token, salt=LEDGER_CURSOR_SALT)
+        return (
+            parse_date(data['d']),
+            parse_datetime(data['c']),
+            int(data['i']),
+            Decimal(data['b']),
+        )
+    except (signing.BadSignature, KeyError, TypeError, ValueError, ArithmeticError):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+
+
+def _encode_cursor(entry):
+    return signing.dumps({
+        'd': entry.date.isoformat(),
+        'c': entry.created_at.isoformat(),
+        'i': entry.id,
+        'b': str(entry.running_balance),
+    }, salt=LEDGER_CURSOR_SALT)
+
+
+def party_ledger(request, **party_filter):
+    """Statement for a single vendor/customer in posting order.
+
+    Query parameters: ``date_from``, ``date_to``, ``page_size`` and the
+    opaque ``cursor`` returned as ``next``. The opening balance and the
+    per-row running balance come from the database (a ``SUM`` before the
+    range and a ``SUM() OVER (ORDER BY date, created_at, id)`` window);
+    the opening ``SUM`` starts from the party's balance at the latest
+    closed period before the range, so it only scans the open tail.
+    The cursor carries the running balance of the last row served, so
+    each page is a bounded keyset scan regardless of how deep it is.
+    """
+    date_from = _parse_date_param(request, 'date_from')
+    date_to = _parse_date_param(request, 'date_to')
+    page_size = _page_size(request)
+    cursor = _decode_cursor(request)
+
+    history = Transaction.objects.filter(**party_filter).order_by()
+    entries = history
+    if date_from:
+        entries = entries.filter(date__gte=date_from)
+    if date_to:
+        entries = entries.filter(date__lte=date_to)
+
+    if cursor:
+        *position, opening_balance = cursor
+        entries = entries.filter(keyset_filter(LEDGER_ORDERING, position))
+    elif date_from:
+        (party_type, party), = party_filter.items()
+        tail = history.filter(date__lt=date_from)
+        opening_balance = Decimal('0')
+        snapshot = balance_snapshot(party_type, party.pk, date_from)
+        if snapshot is not None:
+            closed_through, opening_balance = snapshot
+            tail = tail.filter(date__gt=closed_through)
+        opening_balance += tail.aggregate(
+            total=Sum(Transaction.signed_amount_expression())
+        )['total'] or Decimal('0')
+    else:
+        opening_balance = Decimal('0')
+
+    entries = list(
+        entries.select_related('vendor', 'customer')
+        .annotate(
+            signed_amount=Transaction.signed_amount_expression(),
+            running_total=Window(
+                Sum(Transaction.signed_amount_expression()),
+                order_by=[F(field).asc() for field in LEDGER_ORDERING],
+            ),
+        )
+        .order_by(*LEDGER_ORDERING)[:page_size + 1]
+    )
+
+    has_more = len(entries) > page_size
+    entries = entries[:page_size]
+    for entry in entries:
+        entry.running_balance = opening_balance + (entry.running_total or 0)
+
+    next_url = None
+    if has_more:
+        next_url = replace_query_param(
+            request.build_absolute_uri(), 'cursor', _encode_cursor(entries[-1])
+        )
+
+    return Response({
+        'opening_balance': _money.to_representation(opening_balance),
+        'closing_balance': _money.to_representation(
+            entries[-1].running_balance if entries else opening_balance
+        ),
+        'next': next_url,
+        'entries': LedgerEntrySerializer(entries, many=True).data,
+    })
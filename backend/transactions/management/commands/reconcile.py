@@ -0,0 +1,155 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction as db_transaction
+from decimal import Decimal
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Abs, Round
+from django.utils import timezone
+from accounts.models import Vendor, Customer
+from core.changes import record_changes
+from core.response_cache import bump_version, bump_version_on_commit
+from core.summaries import sum_subquery
+from inventory.models import InventoryItem, StockMovement
+from transactions.models import (
+    Transaction, PaymentRecord, CommissionPayment, Invoice, InvoiceItem,
+    Bill, BillItem
+)
+
+
+# Document totals are the sum of their 4-place line amounts rounded to
+# cents. Rather than trust every database to round half-cent ties the same
+# way, totals are compared against the unrounded sum: a correctly rounded
+# total is within 0.005 of it and any other at least 0.0051 away (the
+# tolerance in between also absorbs SQLite's floating-point sums).
+TOTAL_TOLERANCE = Decimal('0.00505')
+
+
+# Document model -> (posting transaction type, number field, party field, party model)
+DOCUMENT_POSTINGS = {
+    Invoice: ('Invoice', 'invoice_number', 'customer', Customer),
+    Bill: ('Bill', 'bill_number', 'vendor', Vendor),
+}
+
+
+def repair_postings(model, pks):
+    """Copy repaired document totals to their ledger postings and rebalance the parties.
+
+    The posting of a document is its ``Transaction`` whose ``reference_id``
+    is the document number. Runs inside the repair's transaction.
+    """
+    transaction_type, number_field, party_field, party_model = DOCUMENT_POSTINGS[model]
+    documents = model.objects.filter(pk__in=pks)
+    postings = Transaction.objects.filter(
+        transaction_type=transaction_type, reference_id__in=documents.values(number_field)
+    )
+    posting_pks = list(postings.values_list('pk', flat=True))
+    postings.update(
+        amount=Subquery(model.objects.filter(**{number_field: OuterRef('reference_id')}).values('total')[:1]),
+        updated_at=timezone.now()
+    )
+    parties = set(documents.values_list(f'{party_field}_id', flat=True))
+    party_model.objects.filter(pk__in=parties).update(
+        balance=sum_subquery(Transaction.objects.all(), party_field, Transaction.signed_amount_expression()),
+        updated_at=timezone.now()
+    )
+    record_changes(Transaction, posting_pks)
+    record_changes(party_model, parties)
+    bump_version_on_commit(Transaction, party_model)
+
+
+def reconciliation_checks():
+    """Return ``(label, model, field, expected expression, tolerance, repair)`` for every stored figure.
+
+    ``tolerance`` is ``None`` for figures that must match exactly.
+    ``repair``, if set, runs after each chunk of ``--fix`` updates with the
+    model and repaired primary keys. Totals come first, so balances are
+    checked against repaired postings, and statuses last, so ``--fix``
+    derives them from repaired amounts.
+    """
+    line_total = F('meters') * F('price')
+    return [
+        ('Invoice total', Invoice, 'total',
+         sum_subquery(InvoiceItem.objects.all(), 'invoice', line_total, places=None), TOTAL_TOLERANCE, repair_postings),
+        ('Invoice amount_paid', Invoice, 'amount_paid',
+         sum_subquery(PaymentRecord.objects.all(), 'invoice', F('amount')), None, None),
+        ('Invoice commission_paid', Invoice, 'commission_paid',
+         sum_subquery(CommissionPayment.objects.all(), 'invoice', F('amount')), None, None),
+        ('Bill total', Bill, 'total',
+         sum_subquery(BillItem.objects.all(), 'bill', line_total, places=None), TOTAL_TOLERANCE, repair_postings),
+        ('Bill amount_paid', Bill, 'amount_paid',
+         sum_subquery(PaymentRecord.objects.all(), 'bill', F('amount')), None, None),
+        ('Vendor balance', Vendor, 'balance',
+         sum_subquery(Transaction.objects.all(), 'vendor', Transaction.signed_amount_expression()), None, None),
+        ('Customer balance', Customer, 'balance',
+         sum_subquery(Transaction.objects.all(), 'customer', Transaction.signed_amount_expression()), None, None),
+        ('Inventory available_meters', InventoryItem, 'available_meters',
+         sum_subquery(StockMovement.objects.all(), 'inventory_item', F('meters')), None, None),
+        ('Invoice status', Invoice, 'status', Invoice.status_expression(), None, None),
+        ('Bill status', Bill, 'status', Bill.status_expression(), None, None),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Check stored balances, document totals, paid amounts, stock and statuses '
+        'against their source rows and optionally repair any drift.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rewrite drifted values with bulk UPDATEs',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of rows repaired per UPDATE/transaction (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        fix = options['fix']
+        chunk_size = max(1, options['chunk_size'])
+        verbosity = options['verbosity']
+        total_drift = 0
+
+        for label, model, field, expected, tolerance, repair in reconciliation_checks():
+            drifted = model.objects.order_by().annotate(expected_value=expected)
+            if tolerance is None:
+                drifted = drifted.exclude(**{field: F('expected_value')})
+            else:
+                drifted = drifted.alias(
+                    difference=Abs(F(field) - F('expected_value'))
+                ).filter(difference__gt=tolerance)
+                expected = Round(expected, 2)
+            drifted = drifted.values_list('pk', field, 'expected_value')
+
+            pks = []
+            for pk, stored, wanted in drifted.iterator(chunk_size=chunk_size):
+                pks.append(pk)
+                if verbosity >= 2:
+                    self.stdout.write(f"  {label} #{pk}: stored={stored} expected={wanted}")
+
+            total_drift += len(pks)
+            if not pks:
+                self.stdout.write(f"{label}: OK")
+                continue
+
+            self.stdout.write(self.style.WARNING(f"{label}: {len(pks)} drifted"))
+            if fix:
+                for start in range(0, len(pks), chunk_size):
+                    chunk = pks[start:start + chunk_size]
+                    with db_transaction.atomic():
+                        model.objects.filter(pk__in=chunk).update(
+                            **{field: expected, 'updated_at': timezone.now()}
+                        )
+                        record_changes(model, chunk)
+                        if repair is not None:
+                            repair(model, chunk)
+                bump_version(model)
+                self.stdout.write(self.style.SUCCESS(f"{label}: repaired {len(pks)}"))
+
+        if total_drift and not fix:
+            self.stdout.write('Run again with --fix to repair.')
+        elif not total_drift:
+            self.stdout.write(self.style.SUCCESS('All figures reconcile.'))
@@ -0,0 +1,17 @@
+from django.db import migrations
+from core.search import SearchIndexes
+
+
+class Migration(migrations.Migration):
+    # Indexes are built CONCURRENTLY, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('transactions', '0003_range_filter_indexes'),
+    ]
+
+    operations = [
+        SearchIndexes('transactions', trigram=['reference_id'], text=['description']),
+        SearchIndexes('invoices', trigram=['invoice_number']),
+        SearchIndexes('bills', trigram=['bill_number']),
+    ]
@@ -1,12 +1,44 @@
-from django.db import models
+from django.db import models, transaction as db_transaction
+from django.db.models import Case, When, F, Sum, Value
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from accounts.models import Vendor, Customer, Broker
 from inventory.models import InventoryItem
 
 
+# Transaction types that increase / decrease a party's outstanding balance
+DEBIT_TRANSACTION_TYPES = ('Bill', 'Invoice')
+CREDIT_TRANSACTION_TYPES = ('Payment', 'Settlement')
+
+
+class TransactionQuerySet(models.QuerySet):
+    """QuerySet that keeps party balances in step with bulk deletes"""
+
+    def delete(self):
+        with db_transaction.atomic(savepoint=False):
+            deltas = (
+                self.order_by()
+                .values('vendor_id', 'customer_id')
+                .annotate(total=Sum(Transaction.signed_amount_expression()))
+            )
+            for row in deltas:
+                Transaction.apply_party_delta(
+                    row['vendor_id'], row['customer_id'], -(row['total'] or 0)
+                )
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Transaction(models.Model):
-    """Base transaction model for tracking all financial transactions"""
+    """Base transaction model for tracking all financial transactions.
+
+    Saving or deleting a transaction applies its signed amount to the
+    vendor/customer balance as an atomic ``F()`` delta, so posting cost
+    does not depend on the size of the party's history.
+    """
     
     TRANSACTION_TYPES = [
         ('Bill', 'Bill'),
@@ -39,23 +71,78 @@ class Transaction(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TransactionQuerySet.as_manager()
     
     class Meta:
         db_table = 'transactions'
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['date', 'created_at', 'id'], name='txn_date_created_idx'),
+            models.Index(fields=['customer', 'date', 'created_at'], name='txn_customer_date_idx'),
+            models.Index(fields=['vendor', 'date', 'created_at'], name='txn_vendor_date_idx'),
+            models.Index(fields=['transaction_type', 'date'], name='txn_type_date_idx'),
+        ]
     
     def __str__(self):
         entity = self.vendor or self.customer
         return f"{self.transaction_type} - {entity} - {self.amount}"
     
-    def get_signed_amount(self):
+    @staticmethod
+    def signed_amount(transaction_type, amount):
         """Return amount with appropriate sign for balance calculation"""
-        if self.transaction_type in ['Bill', 'Invoice']:
-            return self.amount
-        elif self.transaction_type in ['Payment', 'Settlement']:
-            return -self.amount
+        if transaction_type in DEBIT_TRANSACTION_TYPES:
+            return amount
+        elif transaction_type in CREDIT_TRANSACTION_TYPES:
+            return -amount
         return 0
 
+    @staticmethod
+    def signed_amount_expression():
+        """SQL expression equivalent of ``signed_amount`` for aggregation"""
+        return Case(
+            When(transaction_type__in=DEBIT_TRANSACTION_TYPES, then=F('amount')),
+            When(transaction_type__in=CREDIT_TRANSACTION_TYPES, then=-F('amount')),
+            default=Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+
+    @staticmethod
+    def apply_party_delta(vendor_id, customer_id, delta):
+        """Apply a balance delta to whichever party the transaction belongs to"""
+        if vendor_id:
+            Vendor.apply_balance_delta(vendor_id, delta)
+        if customer_id:
+            Customer.apply_balance_delta(customer_id, delta)
+
+    def get_signed_amount(self):
+        """Return amount with appropriate sign for balance calculation"""
+        return self.signed_amount(self.transaction_type, self.amount)
+
+    def save(self, *args, **kwargs):
+        with db_transaction.atomic(savepoint=False):
+            previous = None
+            if self.pk is not None:
+                previous = (
+                    Transaction.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values('transaction_type', 'amount', 'vendor_id', 'customer_id')
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            if previous is not None:
+                self.apply_party_delta(
+                    previous['vendor_id'],
+                    previous['customer_id'],
+                    -self.signed_amount(previous['transaction_type'], previous['amount'])
+                )
+            self.apply_party_delta(self.vendor_id, self.customer_id, self.get_signed_amount())
+
+    def delete(self, *args, **kwargs):
+        with db_transaction.atomic(savepoint=False):
+            self.apply_party_delta(self.vendor_id, self.customer_id, -self.get_signed_amount())
+            return super().delete(*args, **kwargs)
+
 
 class PaymentRecord(models.Model):
     """Model for payment records"""
@@ -97,6 +184,10 @@ class PaymentRecord(models.Model):
     class Meta:
         db_table = 'payment_records'
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['date', 'created_at', 'id'], name='payment_date_created_idx'),
+            models.Index(fields=['method', 'date'], name='payment_method_date_idx'),
+        ]
     
     def __str__(self):
         return f"Payment - {self.amount} ({self.method})"
@@ -146,6 +237,17 @@ class Invoice(models.Model):
     class Meta:
         db_table = 'invoices'
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['date', 'created_at', 'id'], name='invoice_date_created_idx'),
+            models.Index(fields=['customer', 'date'], name='invoice_customer_date_idx'),
+            models.Index(fields=['broker', 'date'], name='invoice_broker_date_idx'),
+            models.Index(fields=['status', 'date'], name='invoice_status_date_idx'),
+            models.Index(
+                fields=['due_date'],
+                name='invoice_open_due_idx',
+                condition=models.Q(status__in=['Pending', 'Partially Paid'])
+            ),
+        ]
     
     def __str__(self):
         return f"Invoice {self.invoice_number} - {self.customer.name}"
@@ -164,6 +266,22 @@ class Invoice(models.Model):
             self.status = 'Pending'
         self.save()
 
+    @staticmethod
+    def status_expression(amount_paid=None):
+        """SQL expression equivalent of ``update_status`` for set-based updates.
+
+        ``amount_paid`` overrides the paid amount, e.g. ``F('amount_paid') + x``
+        when the status is derived in the same UPDATE that increments it.
+        """
+        if amount_paid is None:
+            amount_paid = F('amount_paid')
+        return Case(
+            When(GreaterThanOrEqual(amount_paid, F('total')), then=Value('Paid')),
+            When(GreaterThan(amount_paid, Value(Decimal('0'))), then=Value('Partially Paid')),
+            default=Value('Pending'),
+            output_field=models.CharField()
+        )
+
     def calculate_commission_amount(self):
         """Calculate commission amount from type and value"""
         if not self.broker or self.commission_value <= 0:
@@ -272,6 +390,16 @@ class Bill(models.Model):
     class Meta:
         db_table = 'bills'
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['date', 'created_at', 'id'], name='bill_date_created_idx'),
+            models.Index(fields=['vendor', 'date'], name='bill_vendor_date_idx'),
+            models.Index(fields=['status', 'date'], name='bill_status_date_idx'),
+            models.Index(
+                fields=['due_date'],
+                name='bill_open_due_idx',
+                condition=models.Q(status__in=['Unpaid', 'Partially Paid'])
+            ),
+        ]
     
     def __str__(self):
         return f"Bill {self.bill_number} - {self.vendor.name}"
@@ -290,6 +418,22 @@ class Bill(models.Model):
             self.status = 'Unpaid'
         self.save()
 
+    @staticmethod
+    def status_expression(amount_paid=None):
+        """SQL expression equivalent of ``update_status`` for set-based updates.
+
+        ``amount_paid`` overrides the paid amount, e.g. ``F('amount_paid') + x``
+        when the status is derived in the same UPDATE that increments it.
+        """
+        if amount_paid is None:
+            amount_paid = F('amount_paid')
+        return Case(
+            When(GreaterThanOrEqual(amount_paid, F('total')), then=Value('Paid')),
+            When(GreaterThan(amount_paid, Value(Decimal('0'))), then=Value('Partially Paid')),
+            default=Value('Unpaid'),
+            output_field=models.CharField()
+        )
+
 
 class BillItem(models.Model):
     """Line items for bills"""
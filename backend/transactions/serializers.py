@@ -1,13 +1,23 @@
+from collections.abc import Mapping
 from decimal import Decimal
+from django.db import transaction as db_transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 from .models import (
     Transaction, PaymentRecord, CommissionPayment, Invoice, InvoiceItem, 
     Bill, BillItem
 )
-from inventory.serializers import InventoryItemSerializer
+from accounts.serializers import VendorSerializer, CustomerSerializer, BrokerSerializer
+from core.closing import ensure_open
+from core.money import money
+from core.fieldsets import SparseFieldsetSerializer
+from core.rollups import bill_entries, invoice_entries, post_rollups
+from inventory.models import InventoryItem
+from inventory.serializers import InventoryItemSerializer, LotField
+from inventory.stock import sell_stock
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsetSerializer, serializers.ModelSerializer):
     """Serializer for Transaction model"""
     vendor_name = serializers.CharField(source='vendor.name', read_only=True)
     customer_name = serializers.CharField(source='customer.name', read_only=True)
@@ -20,9 +30,19 @@ class TransactionSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        expandable_fields = {'vendor': VendorSerializer, 'customer': CustomerSerializer}
 
 
-class PaymentRecordSerializer(serializers.ModelSerializer):
+class LedgerEntrySerializer(TransactionSerializer):
+    """Transaction row of a party statement with its running balance"""
+    signed_amount = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    running_balance = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+
+    class Meta(TransactionSerializer.Meta):
+        fields = TransactionSerializer.Meta.fields + ['signed_amount', 'running_balance']
+
+
+class PaymentRecordSerializer(SparseFieldsetSerializer, serializers.ModelSerializer):
     """Serializer for PaymentRecord model"""
     
     class Meta:
@@ -34,7 +54,22 @@ class PaymentRecordSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class CommissionPaymentSerializer(serializers.ModelSerializer):
+class PaymentAllocationItemSerializer(serializers.Serializer):
+    """One invoice/bill share of an allocated payment"""
+    document = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+
+
+class PaymentAllocationSerializer(serializers.ModelSerializer):
+    """Input for a single payment spread across several invoices or bills"""
+    allocations = PaymentAllocationItemSerializer(many=True, required=False)
+
+    class Meta:
+        model = PaymentRecord
+        fields = ['date', 'amount', 'method', 'bank_name', 'tid', 'allocations']
+
+
+class CommissionPaymentSerializer(SparseFieldsetSerializer, serializers.ModelSerializer):
     """Serializer for CommissionPayment model"""
 
     class Meta:
@@ -46,8 +81,9 @@ class CommissionPaymentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class InvoiceItemSerializer(serializers.ModelSerializer):
+class InvoiceItemSerializer(SparseFieldsetSerializer, serializers.ModelSerializer):
     """Serializer for InvoiceItem model"""
+    inventory_item = LotField(queryset=InventoryItem.objects.all())
     inventory_item_details = InventoryItemSerializer(source='inventory_item', read_only=True)
     subtotal = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
     
@@ -60,7 +96,7 @@ class InvoiceItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class InvoiceSerializer(SparseFieldsetSerializer, serializers.ModelSerializer):
     """Serializer for Invoice model"""
     items = InvoiceItemSerializer(many=True, read_only=True)
     payment_records = PaymentRecordSerializer(many=True, read_only=True)
@@ -79,9 +115,24 @@ class InvoiceSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'status', 'created_at', 'updated_at']
+        expandable_fields = {'customer': CustomerSerializer, 'broker': BrokerSerializer}
+
+
+class DocumentItemsMixin:
+    """Resolve every lot of a new document's ``items`` with one query"""
+
+    def to_internal_value(self, data):
+        items = data.get('items') if isinstance(data, Mapping) else None
+        if isinstance(items, list):
+            ids = {
+                int(item['inventory_item']) for item in items
+                if isinstance(item, Mapping) and str(item.get('inventory_item', '')).isdigit()
+            }
+            self.context['lots'] = InventoryItem.objects.in_bulk(ids)
+        return super().to_internal_value(data)
 
 
-class InvoiceCreateSerializer(serializers.ModelSerializer):
+class InvoiceCreateSerializer(DocumentItemsMixin, serializers.ModelSerializer):
     """Serializer for creating invoices with items"""
     items = InvoiceItemSerializer(many=True)
     
@@ -121,18 +172,23 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
 
         return attrs
     
+    @db_transaction.atomic
     def create(self, validated_data):
+        ensure_open(validated_data['date'])
         items_data = validated_data.pop('items')
-        invoice = Invoice.objects.create(**validated_data)
-        
-        total = 0
-        for item_data in items_data:
-            item = InvoiceItem.objects.create(invoice=invoice, **item_data)
-            total += item.subtotal
-        
-        invoice.total = total
+        items = [InvoiceItem(**item_data) for item_data in items_data]
+        invoice = Invoice(total=money(sum(item.subtotal for item in items)), **validated_data)
         invoice.commission_amount = invoice.calculate_commission_amount()
         invoice.save()
+        for item in items:
+            item.invoice = invoice
+        InvoiceItem.objects.bulk_create(items)
+
+        # Rolls the whole invoice back if any lot is short
+        sell_stock(
+            [(item.inventory_item_id, item.meters) for item in items],
+            invoice.date, invoice.invoice_number
+        )
         
         # Create transaction record
         Transaction.objects.create(
@@ -143,15 +199,15 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
             reference_id=invoice.invoice_number,
             customer=invoice.customer
         )
-        
-        # Update customer balance
-        invoice.customer.update_balance()
-        
+        post_rollups(invoice_entries(invoice))
+
+        prefetch_related_objects([invoice], 'items__inventory_item__vendor')
         return invoice
 
 
-class BillItemSerializer(serializers.ModelSerializer):
+class BillItemSerializer(SparseFieldsetSerializer, serializers.ModelSerializer):
     """Serializer for BillItem model"""
+    inventory_item = LotField(queryset=InventoryItem.objects.all())
     inventory_item_details = InventoryItemSerializer(source='inventory_item', read_only=True)
     subtotal = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
     
@@ -164,7 +220,7 @@ class BillItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class BillSerializer(serializers.ModelSerializer):
+class BillSerializer(SparseFieldsetSerializer, serializers.ModelSerializer):
     """Serializer for Bill model"""
     items = BillItemSerializer(many=True, read_only=True)
     payment_records = PaymentRecordSerializer(many=True, read_only=True)
@@ -180,9 +236,10 @@ class BillSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'status', 'created_at', 'updated_at']
+        expandable_fields = {'vendor': VendorSerializer}
 
 
-class BillCreateSerializer(serializers.ModelSerializer):
+class BillCreateSerializer(DocumentItemsMixin, serializers.ModelSerializer):
     """Serializer for creating bills with items"""
     items = BillItemSerializer(many=True)
     
@@ -194,20 +251,16 @@ class BillCreateSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id']
     
+    @db_transaction.atomic
     def create(self, validated_data):
+        ensure_open(validated_data['date'])
         items_data = validated_data.pop('items')
-        bill = Bill.objects.create(**validated_data)
-        
-        total = 0
-        for item_data in items_data:
-            item = BillItem.objects.create(bill=bill, **item_data)
-            total += item.subtotal
-            # Mark inventory item as billed
-            item.inventory_item.is_billed = True
-            item.inventory_item.save()
-        
-        bill.total = total
-        bill.save()
+        items = [BillItem(**item_data) for item_data in items_data]
+        bill = Bill.objects.create(total=money(sum(item.subtotal for item in items)), **validated_data)
+        for item in items:
+            item.bill = bill
+        BillItem.objects.bulk_create(items)
+        InventoryItem.mark_billed({item.inventory_item_id for item in items})
         
         # Create transaction record
         Transaction.objects.create(
@@ -218,8 +271,7 @@ class BillCreateSerializer(serializers.ModelSerializer):
             reference_id=bill.bill_number,
             vendor=bill.vendor
         )
-        
-        # Update vendor balance
-        bill.vendor.update_balance()
-        
+        post_rollups(bill_entries(bill))
+
+        prefetch_related_objects([bill], 'items__inventory_item__vendor')
         return bill
@@ -0,0 +1,249 @@
+from django.db import transaction as db_transaction
+from django.db import models
+from django.db.models import Case, F, Value, When
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from accounts.models import Broker
+from core.changes import record_changes
+from core.closing import ensure_open
+from core.response_cache import bump_version_on_commit
+from core.rollups import entry, post_rollups
+from .models import Transaction, PaymentRecord, CommissionPayment, Invoice, Bill
+
+
+class PostingError(APIException):
+    """A payment that cannot be posted against the document's current state"""
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Payment could not be posted.'
+    default_code = 'posting_error'
+
+
+def _lock(model, pk, *fields):
+    """Lock and load only the columns posting needs, or raise 404"""
+    queryset = model.objects.select_for_update(of=('self',)).only('pk', *fields)
+    return get_object_or_404(queryset, pk=pk)
+
+
+def _check_amount(amount, remaining, what):
+    """Reject a payment above ``remaining``, as read under the document's row lock"""
+    if amount > remaining:
+        raise ValidationError({'amount': f'Payment of {amount} exceeds the {what} of {remaining}.'})
+
+
+def _payment_fields(payment_data):
+    """Validated payment data without the document link, which posting sets"""
+    return {
+        field: value for field, value in payment_data.items()
+        if field not in ('invoice', 'bill')
+    }
+
+
+def _apply_payments(model, amounts):
+    """Increment ``amount_paid`` and derive ``status`` in a single UPDATE.
+
+    ``amounts`` maps document pk to the amount paid against it.
+    """
+    if len(amounts) == 1:
+        increment = Value(next(iter(amounts.values())))
+    else:
+        increment = Case(
+            *[When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()],
+            default=Value(0),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+    new_amount_paid = F('amount_paid') + increment
+    model.objects.filter(pk__in=list(amounts)).update(
+        amount_paid=new_amount_paid,
+        status=model.status_expression(new_amount_paid),
+        updated_at=timezone.now()
+    )
+    record_changes(model, amounts)
+    bump_version_on_commit(model)
+
+
+def post_invoice_payment(invoice_id, payment_data):
+    """Record a customer payment against an invoice.
+
+    Runs in one transaction holding the invoice row lock: inserts the
+    ``PaymentRecord``, increments ``amount_paid``/``status`` with one UPDATE,
+    posts the ``Payment`` transaction, which moves the customer balance, and
+    adds the payment to the day's receipts rollup. A payment above the
+    balance due is rejected.
+    """
+    with db_transaction.atomic():
+        invoice = _lock(Invoice, invoice_id, 'invoice_number', 'customer_id', 'total', 'amount_paid')
+        _check_amount(payment_data['amount'], invoice.balance_due, 'balance due')
+        ensure_open(payment_data['date'])
+        payment = PaymentRecord.objects.create(invoice_id=invoice.pk, **_payment_fields(payment_data))
+        _apply_payments(Invoice, {invoice.pk: payment.amount})
+        Transaction.objects.create(
+            transaction_type='Payment',
+            date=payment.date,
+            amount=payment.amount,
+            description=f"Payment for Invoice {invoice.invoice_number}",
+            reference_id=f"PAY-{payment.id}",
+            customer_id=invoice.customer_id
+        )
+        post_rollups([entry('receipt', payment.date, payment.amount, invoice.customer_id, method=payment.method)])
+    return payment
+
+
+def post_bill_payment(bill_id, payment_data):
+    """Record a payment to a vendor against a bill (see ``post_invoice_payment``)"""
+    with db_transaction.atomic():
+        bill = _lock(Bill, bill_id, 'bill_number', 'vendor_id', 'total', 'amount_paid')
+        _check_amount(payment_data['amount'], bill.balance_due, 'balance due')
+        ensure_open(payment_data['date'])
+        payment = PaymentRecord.objects.create(bill_id=bill.pk, **_payment_fields(payment_data))
+        _apply_payments(Bill, {bill.pk: payment.amount})
+        Transaction.objects.create(
+            transaction_type='Payment',
+            date=payment.date,
+            amount=payment.amount,
+            description=f"Payment for Bill {bill.bill_number}",
+            reference_id=f"PAY-{payment.id}",
+            vendor_id=bill.vendor_id
+        )
+        post_rollups([entry('payment', payment.date, payment.amount, bill.vendor_id, method=payment.method)])
+    return payment
+
+
+def post_commission_payment(invoice_id, payment_data):
+    """Record a (partial) broker commission payment on an invoice.
+
+    The broker and remaining commission are checked under the invoice row
+    lock so two concurrent settlements cannot both pass the check, or
+    together pay more than the commission.
+    """
+    with db_transaction.atomic():
+        invoice = _lock(
+            Invoice, invoice_id,
+            'invoice_number', 'customer_id', 'broker_id',
+            'commission_amount', 'commission_paid'
+        )
+        if not invoice.broker_id:
+            raise PostingError('This invoice has no broker assigned.')
+        if invoice.commission_amount - invoice.commission_paid <= 0:
+            raise PostingError('Commission already fully settled.')
+        _check_amount(
+            payment_data['amount'], invoice.commission_amount - invoice.commission_paid, 'remaining commission'
+        )
+        ensure_open(payment_data['date'])
+
+        payment = CommissionPayment.objects.create(invoice_id=invoice.pk, **_payment_fields(payment_data))
+        Invoice.objects.filter(pk=invoice.pk).update(
+            commission_paid=F('commission_paid') + payment.amount,
+            updated_at=timezone.now()
+        )
+        record_changes(Invoice, [invoice.pk])
+        bump_version_on_commit(Invoice)
+
+        broker_name = Broker.objects.values_list('name', flat=True).get(pk=invoice.broker_id)
+        Transaction.objects.create(
+            transaction_type='Settlement',
+            date=payment.date,
+            amount=payment.amount,
+            description=f"Commission payment for Invoice {invoice.invoice_number} to broker {broker_name}",
+            reference_id=f"COMM-{payment.id}",
+            customer_id=invoice.customer_id
+        )
+        post_rollups([
+            entry('commission_payment', payment.date, payment.amount, invoice.broker_id, method=payment.method)
+        ])
+    return payment
+
+
+def _allocate_payment(model, document_field, number_field, party_field, party_id,
+                      payment_data, allocations=None):
+    """Spread one payment over a party's open documents.
+
+    All open documents of the party are locked in primary-key order, so
+    concurrent allocations for the same party queue instead of deadlocking.
+    ``allocations`` is an optional explicit split of ``(pk, amount)`` pairs;
+    without it the payment is applied FIFO by due date. Writes are one
+    ``bulk_create`` of payment records, one UPDATE of the documents and one
+    ``Transaction`` (and so one balance delta) for the whole payment.
+    """
+    label = model._meta.verbose_name
+    amount = payment_data['amount']
+    fields = _payment_fields(payment_data)
+    fields.pop('amount')
+
+    with db_transaction.atomic():
+        ensure_open(payment_data['date'])
+        documents = {
+            document.pk: document
+            for document in model.objects.select_for_update()
+            .filter(**{party_field: party_id}, amount_paid__lt=F('total'))
+            .only('pk', number_field, 'date', 'due_date', 'total', 'amount_paid')
+            .order_by('pk')
+        }
+
+        split = []
+        if allocations:
+            seen = set()
+            for pk, share in allocations:
+                document = documents.get(pk)
+                if document is None:
+                    raise PostingError(f'{label.title()} {pk} is not an open {label} of this account.')
+                if pk in seen:
+                    raise PostingError(f'{label.title()} {pk} is allocated more than once.')
+                if share > document.balance_due:
+                    raise PostingError(
+                        f'Allocation of {share} exceeds the balance due of {getattr(document, number_field)}.'
+                    )
+                seen.add(pk)
+                split.append((document, share))
+            if sum(share for _, share in split) != amount:
+                raise PostingError('Allocations must add up to the payment amount.')
+        else:
+            remaining = amount
+            for document in sorted(documents.values(), key=lambda d: (d.due_date, d.date, d.pk)):
+                if remaining <= 0:
+                    break
+                share = min(remaining, document.balance_due)
+                split.append((document, share))
+                remaining -= share
+            if remaining > 0:
+                raise PostingError(f'Payment exceeds the outstanding balance by {remaining}.')
+
+        payments = PaymentRecord.objects.bulk_create([
+            PaymentRecord(**{f'{document_field}_id': document.pk}, amount=share, **fields)
+            for document, share in split
+        ])
+        bump_version_on_commit(PaymentRecord)
+        _apply_payments(model, {document.pk: share for document, share in split})
+
+        numbers = ', '.join(getattr(document, number_field) for document, _ in split)
+        Transaction.objects.create(
+            transaction_type='Payment',
+            date=fields['date'],
+            amount=amount,
+            description=f"Payment for {label.title()}s {numbers}",
+            reference_id=f"PAY-{payments[0].id}",
+            **{party_field: party_id}
+        )
+        kind = 'receipt' if model is Invoice else 'payment'
+        post_rollups([
+            entry(kind, payment.date, payment.amount, party_id, method=payment.method)
+            for payment in payments
+        ])
+    return payments
+
+
+def allocate_customer_payment(customer_id, payment_data, allocations=None):
+    """Apply one customer payment across their open invoices"""
+    return _allocate_payment(
+        Invoice, 'invoice', 'invoice_number', 'customer_id', customer_id,
+        payment_data, allocations
+    )
+
+
+def allocate_vendor_payment(vendor_id, payment_data, allocations=None):
+    """Apply one payment to a vendor across their open bills"""
+    return _allocate_payment(
+        Bill, 'bill', 'bill_number', 'vendor_id', vendor_id,
+        payment_data, allocations
+    )
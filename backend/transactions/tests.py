@@ -0,0 +1,680 @@
+import csv
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from accounts.models import Vendor, Customer, Broker
+from core.models import User
+from core.money import money
+from core.rollups import rebuild_rollups
+from core.snapshots import close_period, month_bounds
+from expenses.models import Expense
+from inventory.models import InventoryItem, ItemMaster
+from inventory.stock import apply_movements, receive_stock
+from .imports import InvoiceImporter
+from .models import (
+    Transaction, PaymentRecord, CommissionPayment, Invoice, InvoiceItem,
+    Bill, BillItem
+)
+
+ITEMS_PER_DOCUMENT = 3
+
+# Maximum SQL queries per endpoint, whatever the number of rows served
+LIST_BUDGETS = {
+    '/api/vendors/': 3,
+    '/api/customers/': 3,
+    '/api/brokers/': 3,
+    '/api/inventory/': 4,
+    '/api/inventory/available/': 3,
+    '/api/inventory/valuation/': 2,
+    '/api/inventory/valuation/?method=average&group_by=lot': 3,
+    '/api/item-master/': 3,
+    '/api/expenses/': 3,
+    '/api/expenses/summary/': 1,
+    '/api/transactions/': 4,
+    '/api/transactions/?pagination=cursor': 3,
+    '/api/payments/': 3,
+    '/api/invoices/': 7,
+    '/api/invoices/?pagination=cursor': 6,
+    '/api/invoices/?fields=id,invoice_number,customer_name,total,status': 4,
+    '/api/invoices/overdue/': 4,
+    '/api/bills/': 6,
+    '/api/bills/?pagination=cursor': 5,
+    '/api/bills/overdue/': 3,
+    '/api/bootstrap/': 13,
+    '/api/bootstrap/history/': 9,
+    '/api/autocomplete/?q=lot': 7,
+    '/api/analytics/?dimensions=customer,category,month': 3,
+    '/api/analytics/?source=purchases&dimensions=vendor,week': 3,
+    '/api/rollups/?period=month': 1,
+    '/api/rollups/summary/?date_to=2026-12-31': 1,
+    '/api/periods/': 1,
+    '/api/periods/profit_loss/': 7,
+    '/api/changes/?since=0&limit=5000': 17,
+}
+
+DETAIL_BUDGETS = {
+    '/api/vendors/{vendor}/': 2,
+    '/api/vendors/{vendor}/transactions/': 2,
+    '/api/vendors/{vendor}/ledger/': 2,
+    '/api/customers/{customer}/': 2,
+    '/api/customers/{customer}/transactions/': 2,
+    '/api/customers/{customer}/ledger/': 2,
+    '/api/brokers/{broker}/': 2,
+    '/api/inventory/{lot}/': 3,
+    '/api/inventory/{lot}/movements/': 2,
+    '/api/transactions/{transaction}/': 3,
+    '/api/payments/{payment}/': 2,
+    '/api/invoices/{invoice}/': 6,
+    '/api/bills/{bill}/': 5,
+}
+
+# Maximum SQL queries to create a document, whatever the number of items
+CREATE_BUDGETS = {
+    '/api/invoices/': 24,
+    '/api/bills/': 19,
+}
+
+
+class ReconcileCommandTests(APITestCase):
+    """``reconcile`` reports stored figures that drift from their source rows and repairs them"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('reconcile', password='reconcile'))
+        vendor = Vendor.objects.create(name='Vendor', contact='v')
+        self.customer = Customer.objects.create(name='Customer', contact='c')
+        lot = InventoryItem.objects.create(
+            lot_number='LOT-1', fabric_type='Cotton', meters=Decimal('100'),
+            unit_price=Decimal('1'), vendor=vendor, received_date=date.today(),
+            available_meters=Decimal('100')
+        )
+        receive_stock([lot])
+        # 2.50m at 1.81 is 4.525, a half-cent tie
+        response = self.client.post('/api/invoices/', {
+            'invoice_number': 'INV-1', 'customer': self.customer.pk,
+            'date': date.today().isoformat(), 'due_date': date.today().isoformat(),
+            'items': [{'inventory_item': lot.pk, 'meters': '2.50', 'price': '1.81'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.invoice = Invoice.objects.get(pk=response.data['id'])
+
+    def reconcile(self, *args):
+        output = StringIO()
+        call_command('reconcile', *args, stdout=output)
+        return output.getvalue()
+
+    def test_rounded_totals_reconcile(self):
+        self.assertEqual(self.invoice.total, Decimal('4.53'))
+        self.assertIn('All figures reconcile.', self.reconcile())
+
+    def test_drift_is_reported_and_fixed(self):
+        Invoice.objects.filter(pk=self.invoice.pk).update(total=Decimal('4.55'), amount_paid=Decimal('1'))
+        Customer.objects.filter(pk=self.customer.pk).update(balance=Decimal('99'))
+
+        output = self.reconcile()
+        for label in ('Invoice total: 1 drifted', 'Invoice amount_paid: 1 drifted', 'Customer balance: 1 drifted'):
+            self.assertIn(label, output)
+        self.assertIn('Run again with --fix to repair.', output)
+
+        self.assertIn('Invoice total: repaired 1', self.reconcile('--fix'))
+        self.invoice.refresh_from_db()
+        self.customer.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, 0)
+        self.assertEqual(self.invoice.status, 'Pending')
+        self.assertEqual(self.customer.balance, Transaction.objects.get().amount)
+        self.assertIn('All figures reconcile.', self.reconcile())
+
+    def test_fixed_total_repairs_posting_and_balance(self):
+        # A wrong total posted consistently: document, ledger and balance agree with each other
+        Invoice.objects.filter(pk=self.invoice.pk).update(total=Decimal('9.99'))
+        Transaction.objects.filter(reference_id='INV-1').update(amount=Decimal('9.99'))
+        Customer.objects.filter(pk=self.customer.pk).update(balance=Decimal('9.99'))
+
+        output = self.reconcile('--fix')
+        self.assertIn('Invoice total: repaired 1', output)
+        self.assertIn('Customer balance: OK', output)
+        self.customer.refresh_from_db()
+        self.assertEqual(Transaction.objects.get(reference_id='INV-1').amount, Decimal('4.53'))
+        self.assertEqual(self.customer.balance, Decimal('4.53'))
+        self.assertIn('All figures reconcile.', self.reconcile())
+
+
+class PaymentPostingTests(APITestCase):
+    """Payments post under the document's row lock and never exceed what is owed"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('payments', password='payments'))
+        self.customer = Customer.objects.create(name='Customer', contact='c')
+        self.vendor = Vendor.objects.create(name='Vendor', contact='v')
+        broker = Broker.objects.create(name='Broker')
+        today = date.today()
+        self.invoice = Invoice.objects.create(
+            invoice_number='INV-1', customer=self.customer, broker=broker, date=today, due_date=today,
+            total=Decimal('100'), commission_type='Fixed', commission_value=Decimal('10'),
+            commission_amount=Decimal('10')
+        )
+        self.bill = Bill.objects.create(
+            bill_number='BILL-1', vendor=self.vendor, date=today, due_date=today, total=Decimal('80')
+        )
+
+    def pay(self, url, amount):
+        return self.client.post(url, {'date': date.today().isoformat(), 'amount': amount, 'method': 'Cash'})
+
+    def test_invoice_payments_move_status_and_post_one_transaction_each(self):
+        url = f'/api/invoices/{self.invoice.pk}/add_payment/'
+        for amount, status, paid in (('40', 'Partially Paid', '40'), ('60', 'Paid', '100')):
+            response = self.pay(url, amount)
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertEqual(response.data['status'], status)
+            self.assertEqual(Decimal(response.data['amount_paid']), Decimal(paid))
+
+        payments = list(PaymentRecord.objects.filter(invoice=self.invoice).order_by('pk'))
+        transactions = Transaction.objects.filter(customer=self.customer, transaction_type='Payment')
+        self.assertEqual(
+            sorted(transactions.values_list('reference_id', 'amount')),
+            sorted((f'PAY-{payment.pk}', payment.amount) for payment in payments)
+        )
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.balance, Decimal('-100'))
+
+    def test_payment_above_balance_due_is_rejected(self):
+        self.assertEqual(self.pay(f'/api/invoices/{self.invoice.pk}/add_payment/', '70').status_code, 200)
+        for url, amount in (
+            (f'/api/invoices/{self.invoice.pk}/add_payment/', '30.01'),
+            (f'/api/bills/{self.bill.pk}/add_payment/', '80.01'),
+        ):
+            with self.subTest(url=url):
+                response = self.pay(url, amount)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('amount', response.data)
+        self.assertEqual(PaymentRecord.objects.count(), 1)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_bill_payment_settles_bill(self):
+        response = self.pay(f'/api/bills/{self.bill.pk}/add_payment/', '80')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['status'], 'Paid')
+        self.assertEqual(Transaction.objects.get(vendor=self.vendor).amount, Decimal('80'))
+
+    def test_commission_cannot_be_overpaid(self):
+        url = f'/api/invoices/{self.invoice.pk}/settle_commission/'
+        self.assertEqual(self.pay(url, '10.01').status_code, 400)
+        self.assertEqual(self.pay(url, '6').status_code, 200)
+        response = self.pay(url, '5')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('amount', response.data)
+        response = self.pay(url, '4')
+        self.assertEqual(Decimal(response.data['commission_paid']), Decimal('10'))
+        self.assertEqual(self.pay(url, '1').data['detail'].code, 'posting_error')
+        self.assertEqual(Transaction.objects.filter(transaction_type='Settlement').count(), 2)
+
+
+class BillCreationTests(APITestCase):
+    """A bill inserts its items, flags its lots and posts its rounded total in one go"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('bills', password='bills'))
+        self.vendor = Vendor.objects.create(name='Vendor', contact='v')
+        self.lots = [
+            InventoryItem.objects.create(
+                lot_number=f'LOT-{n}', fabric_type='Cotton', meters=Decimal('100'), unit_price=Decimal('1'),
+                vendor=self.vendor, received_date=date.today(), available_meters=Decimal('100')
+            )
+            for n in range(3)
+        ]
+        receive_stock(self.lots)
+
+    def test_bill_flags_its_lots_and_posts_total(self):
+        items = [('2.50', '1.81'), ('1.25', '3.33')]
+        response = self.client.post('/api/bills/', {
+            'bill_number': 'BILL-1', 'vendor': self.vendor.pk,
+            'date': date.today().isoformat(), 'due_date': date.today().isoformat(),
+            'items': [
+                {'inventory_item': lot.pk, 'meters': meters, 'price': price}
+                for lot, (meters, price) in zip(self.lots, items)
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        # 4.525 + 4.1625, rounded once
+        total = money(sum(Decimal(meters) * Decimal(price) for meters, price in items))
+        self.assertEqual(total, Decimal('8.69'))
+        bill = Bill.objects.get()
+        self.assertEqual(bill.total, total)
+        self.assertEqual(bill.items.count(), 2)
+        self.assertEqual(
+            list(InventoryItem.objects.order_by('lot_number').values_list('is_billed', flat=True)),
+            [True, True, False]
+        )
+        self.assertEqual(Transaction.objects.get(reference_id='BILL-1').amount, total)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.balance, total)
+
+
+class InvoiceImportTests(APITestCase):
+    """``import_csv`` writes valid rows, reports bad ones and shifts balances batch by batch"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('importer', password='importer'))
+        self.customer = Customer.objects.create(name='Shah Fabric', contact='c')
+        vendor = Vendor.objects.create(name='Vendor', contact='v')
+        self.lot = InventoryItem.objects.create(
+            lot_number='L1', fabric_type='Cotton', meters=Decimal('100'), unit_price=Decimal('4'),
+            vendor=vendor, received_date=date.today(), available_meters=Decimal('100')
+        )
+        receive_stock([self.lot])
+
+    def upload(self, content):
+        upload = SimpleUploadedFile('invoices.csv', content, content_type='text/csv')
+        return self.client.post('/api/invoices/import_csv/', {'file': upload}, format='multipart')
+
+    def test_rows_are_imported_and_balances_updated(self):
+        today = date.today().isoformat()
+        response = self.upload((
+            'invoice_number,customer,date,due_date,items\n'
+            f'INV-1,Shah Fabric,{today},{today},L1|10|5\n'
+            f'INV-2,Shah Fabric,{today},{today},"L1|2.5|8;L1|1|2"\n'
+        ).encode())
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data, {'created': 2, 'failed': 0, 'errors': []})
+
+        self.assertEqual(
+            sorted(Invoice.objects.values_list('invoice_number', 'total')),
+            [('INV-1', Decimal('50')), ('INV-2', Decimal('22'))]
+        )
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.balance, Decimal('72'))
+        self.lot.refresh_from_db()
+        self.assertEqual(self.lot.available_meters, Decimal('86.5'))
+
+    def test_rejected_rows_are_reported_and_the_rest_saved(self):
+        today = date.today().isoformat()
+        response = self.upload((
+            'invoice_number,customer,date,due_date,items\n'
+            f'INV-1,Nobody,{today},{today},L1|10|5\n'
+            f'INV-2,Shah Fabric,{today},{today},L1|101|5\n'
+            f'INV-3,Shah Fabric,not-a-date,{today},L1|1|5\n'
+            f'INV-4,Shah Fabric,{today},{today},L1|30|5\n'
+        ).encode())
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(
+            [(error['row'], list(error['errors'])) for error in response.data['errors']],
+            [(2, ['customer']), (3, ['items']), (4, ['date'])]
+        )
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.balance, Decimal('150'))
+
+    def test_failed_batch_leaves_balance_untouched(self):
+        Transaction.objects.create(
+            transaction_type='Invoice', date=date.today(), amount=Decimal('7'), customer=self.customer
+        )
+        calls = []
+
+        def fail_second_batch(movements):
+            # Balances are written with each batch, not after the last one
+            calls.append(Customer.objects.get(pk=self.customer.pk).balance)
+            if len(calls) == 2:
+                raise DatabaseError('deadlock detected')
+            return apply_movements(movements)
+
+        today = date.today().isoformat()
+        with mock.patch.object(InvoiceImporter, 'batch_size', 1), \
+                mock.patch('transactions.imports.apply_movements', fail_second_batch):
+            response = self.upload((
+                'invoice_number,customer,date,due_date,items\n'
+                f'INV-1,Shah Fabric,{today},{today},L1|10|5\n'
+                f'INV-2,Shah Fabric,{today},{today},L1|2|5\n'
+            ).encode())
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3])
+        self.assertEqual(calls, [Decimal('57'), Decimal('67')])
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.balance, Decimal('57'))
+        self.assertEqual(list(Invoice.objects.values_list('invoice_number', flat=True)), ['INV-1'])
+
+    def test_unreadable_file_is_rejected_before_writing(self):
+        today = date.today().isoformat()
+        header = 'invoice_number,customer,date,due_date,items\n'
+        valid = f'INV-1,Shah Fabric,{today},{today},L1|10|5\n'
+        for case, content in (
+            ('oversized field', (header + valid + 'INV-2,"' + 'x' * (csv.field_size_limit() + 1) + '"\n').encode()),
+            ('not utf-8', (header + valid).encode() + b'INV-2,\xff\xfe,x,x,x\n'),
+        ):
+            with self.subTest(case):
+                response = self.upload(content)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('Row 3', str(response.data['file']))
+        self.assertFalse(Invoice.objects.exists())
+
+
+class PartyLedgerTests(APITestCase):
+    """Party statements carry their running balance across pages and from closed periods"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('ledger', password='ledger'))
+        self.customer = Customer.objects.create(name='Customer', contact='c')
+        self.closed_start, self.closed_end = month_bounds(date.today() - timedelta(days=70))
+        self.open_from = self.closed_end + timedelta(days=1)
+        postings = [
+            (self.closed_start, 'Invoice', '100'), (self.closed_end, 'Payment', '30'),
+            (self.closed_end, 'Invoice', '5'),
+        ]
+        # Ties on date are ordered by created_at and id
+        postings += [(self.open_from, 'Invoice', str(10 + n)) for n in range(3)]
+        postings += [(self.open_from + timedelta(days=1), 'Payment', '7'), (date.today(), 'Settlement', '2')]
+        for day, transaction_type, amount in postings:
+            Transaction.objects.create(
+                transaction_type=transaction_type, date=day, amount=Decimal(amount), customer=self.customer
+            )
+
+    def pages(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append(response.data)
+            url = response.data['next']
+        return pages
+
+    def test_running_balance_across_pages(self):
+        pages = self.pages(f'/api/customers/{self.customer.pk}/ledger/?page_size=2')
+        self.assertEqual([len(page['entries']) for page in pages], [2, 2, 2, 2])
+
+        balance = Decimal('0')
+        for page in pages:
+            self.assertEqual(Decimal(page['opening_balance']), balance)
+            for entry in page['entries']:
+                balance += Transaction.signed_amount(entry['transaction_type'], Decimal(entry['amount']))
+                self.assertEqual(Decimal(entry['running_balance']), balance)
+            self.assertEqual(Decimal(page['closing_balance']), balance)
+        self.customer.refresh_from_db()
+        self.assertEqual(balance, self.customer.balance)
+
+    def test_opening_balance_starts_from_closed_period_snapshot(self):
+        close_period(self.closed_start)
+        # Rows before the snapshot no longer count, so the snapshot must be used
+        Transaction.objects.filter(date__lte=self.closed_end).update(amount=Decimal('0'))
+
+        pages = self.pages(f'/api/customers/{self.customer.pk}/ledger/?page_size=2&date_from={self.open_from}')
+        self.assertEqual(Decimal(pages[0]['opening_balance']), Decimal('75'))
+        self.assertEqual(Decimal(pages[-1]['closing_balance']), Decimal('75') + 33 - 7 - 2)
+
+    def test_tampered_cursor_is_rejected(self):
+        url = self.client.get(f'/api/customers/{self.customer.pk}/ledger/?page_size=2').data['next']
+        cursor = parse_qs(urlsplit(url).query)['cursor'][0]
+        for bad in ('garbage', 'x' + cursor, cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B')):
+            with self.subTest(bad):
+                response = self.client.get(f'/api/customers/{self.customer.pk}/ledger/?page_size=2&cursor={bad}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.data)
+
+
+class DocumentSummaryTests(APITestCase):
+    """Summaries report paid, partial and overdue documents for the filtered list"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user('summary', password='summary'))
+        self.customer = Customer.objects.create(name='Customer', contact='c')
+        self.other = Customer.objects.create(name='Other', contact='o')
+        self.vendor = Vendor.objects.create(name='Vendor', contact='v')
+        today = date.today()
+        self.last_month = today - timedelta(days=40)
+        for number, customer, day, total, paid in (
+            ('INV-PAID', self.customer, today, '100', '100'),
+            ('INV-PART', self.customer, today, '80', '30'),
+            ('INV-LATE', self.customer, self.last_month, '50', '0'),
+            ('INV-OTHER', self.other, today, '1000', '0'),
+        ):
+            invoice = Invoice(
+                invoice_number=number, customer=customer, date=day, due_date=day + timedelta(days=7),
+                total=Decimal(total), amount_paid=Decimal(paid)
+            )
+            invoice.update_status()
+            invoice.save()
+        for number, total, paid in (('BILL-PAID', '40', '40'), ('BILL-PART', '60', '15')):
+            bill = Bill(
+                bill_number=number, vendor=self.vendor, date=self.last_month,
+                due_date=self.last_month + timedelta(days=7), total=Decimal(total), amount_paid=Decimal(paid)
+            )
+            bill.update_status()
+            bill.save()
+
+    def test_invoice_summary(self):
+        response = self.client.get(f'/api/invoices/summary/?customer={self.customer.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_invoices'], 3)
+        self.assertEqual(response.data['total_amount'], 230.0)
+        self.assertEqual(response.data['total_paid'], 130.0)
+        self.assertEqual(response.data['outstanding'], 100.0)
+        self.assertEqual(response.data['by_status'], {
+            'Pending': {'count': 1, 'amount': 50.0},
+            'Partially Paid': {'count': 1, 'amount': 80.0},
+            'Paid': {'count': 1, 'amount': 100.0},
+        })
+
+        overdue = self.client.get('/api/invoices/overdue/')
+        self.assertEqual([row['invoice_number'] for row in overdue.data], ['INV-LATE'])
+
+    def test_filters_are_applied(self):
+        response = self.client.get(
+            f'/api/invoices/summary/?customer={self.customer.pk}&date_from={date.today()}&status=Partially Paid'
+        )
+        self.assertEqual((response.data['total_invoices'], response.data['total_amount']), (1, 80.0))
+        self.assertEqual(response.data['by_status']['Pending'], {'count': 0, 'amount': 0.0})
+
+        response = self.client.get(f'/api/invoices/summary/?date_to={self.last_month}')
+        self.assertEqual((response.data['total_invoices'], response.data['outstanding']), (1, 50.0))
+
+    def test_bill_summary(self):
+        response = self.client.get('/api/bills/summary/')
+        self.assertEqual((response.data['total_bills'], response.data['total_amount']), (2, 100.0))
+        self.assertEqual((response.data['total_paid'], response.data['outstanding']), (55.0, 45.0))
+        self.assertEqual(response.data['by_status'], {
+            'Unpaid': {'count': 0, 'amount': 0.0},
+            'Partially Paid': {'count': 1, 'amount': 60.0},
+            'Paid': {'count': 1, 'amount': 40.0},
+        })
+        overdue = self.client.get('/api/bills/overdue/')
+        self.assertEqual([row['bill_number'] for row in overdue.data], ['BILL-PART'])
+
+
+class DocumentFilterTests(APITestCase):
+    """Date, due-date and amount bounds are inclusive; status follows what was paid"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('filters', password='filters'))
+        customer = Customer.objects.create(name='Customer', contact='c')
+        self.start = date(2024, 3, 1)
+        for n, (total, paid) in enumerate((('100', '0'), ('200', '50'), ('300', '300'))):
+            day = self.start + timedelta(days=10 * n)
+            invoice = Invoice(
+                invoice_number=f'INV-{n}', customer=customer, date=day, due_date=day + timedelta(days=30),
+                total=Decimal(total), amount_paid=Decimal(paid)
+            )
+            invoice.update_status()
+            invoice.save()
+            Transaction.objects.create(
+                transaction_type='Invoice', date=day, amount=Decimal(total), customer=customer,
+                reference_id=f'INV-{n}'
+            )
+
+    def numbers(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return sorted(row.get('invoice_number') or row['reference_id'] for row in response.data['results'])
+
+    def test_invoice_filters(self):
+        for query, expected in (
+            ('date_from=2024-03-11', ['INV-1', 'INV-2']),
+            ('date_to=2024-03-11', ['INV-0', 'INV-1']),
+            ('date_from=2024-03-02&date_to=2024-03-10', []),
+            ('due_date_from=2024-04-10&due_date_to=2024-04-10', ['INV-1']),
+            ('min_amount=200', ['INV-1', 'INV-2']),
+            ('max_amount=200', ['INV-0', 'INV-1']),
+            ('status=Partially Paid', ['INV-1']),
+            ('status=Paid', ['INV-2']),
+            ('status=Pending&max_amount=150', ['INV-0']),
+        ):
+            with self.subTest(query):
+                self.assertEqual(self.numbers(f'/api/invoices/?{query}'), expected)
+
+    def test_transaction_filters(self):
+        for query, expected in (
+            ('date_from=2024-03-21', ['INV-2']),
+            ('date_to=2024-03-01', ['INV-0']),
+            ('min_amount=150&max_amount=250', ['INV-1']),
+            ('transaction_type=Payment', []),
+        ):
+            with self.subTest(query):
+                self.assertEqual(self.numbers(f'/api/transactions/?{query}'), expected)
+
+    def test_invalid_bounds_are_rejected(self):
+        for query in ('date_from=2024-02-30', 'min_amount=lots'):
+            with self.subTest(query):
+                self.assertEqual(self.client.get(f'/api/invoices/?{query}').status_code, 400)
+
+
+class QueryBudgetTests(APITestCase):
+    """List and detail endpoints run a fixed number of queries.
+
+    Every list is measured against a small and a larger data set; a
+    difference means a query per row (an N+1) has crept in.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('budget', password='budget'))
+        self.created = 0
+
+    def seed(self, count):
+        """``count`` parties, each with lots, an invoice, a bill and their children"""
+        today = date.today()
+        for _ in range(count):
+            self.created += 1
+            n = self.created
+            vendor = Vendor.objects.create(name=f'Vendor {n}', contact=f'v{n}')
+            customer = Customer.objects.create(name=f'Customer {n}', contact=f'c{n}')
+            broker = Broker.objects.create(name=f'Broker {n}')
+            lots = [
+                InventoryItem.objects.create(
+                    lot_number=f'LOT-{n}-{i}', fabric_type='Cotton', meters=Decimal('100'),
+                    unit_price=Decimal('5'), vendor=vendor, received_date=today,
+                    available_meters=Decimal('70')
+                )
+                for i in range(ITEMS_PER_DOCUMENT)
+            ]
+
+            invoice = Invoice.objects.create(
+                invoice_number=f'INV-{n}', customer=customer, broker=broker,
+                commission_type='Fixed', commission_value=Decimal('5'),
+                date=today - timedelta(days=40), due_date=today - timedelta(days=10),
+                total=Decimal('210'), amount_paid=Decimal('10'), status='Partially Paid'
+            )
+            InvoiceItem.objects.bulk_create([
+                InvoiceItem(invoice=invoice, inventory_item=lot, meters=Decimal('10'), price=Decimal('7'))
+                for lot in lots
+            ])
+            PaymentRecord.objects.create(invoice=invoice, date=today, amount=Decimal('10'))
+            CommissionPayment.objects.create(invoice=invoice, date=today, amount=Decimal('1'))
+
+            bill = Bill.objects.create(
+                bill_number=f'BILL-{n}', vendor=vendor,
+                date=today - timedelta(days=40), due_date=today - timedelta(days=10),
+                total=Decimal('150'), amount_paid=Decimal('10'), status='Partially Paid'
+            )
+            BillItem.objects.bulk_create([
+                BillItem(bill=bill, inventory_item=lot, meters=Decimal('10'), price=Decimal('5'))
+                for lot in lots
+            ])
+            PaymentRecord.objects.create(bill=bill, date=today, amount=Decimal('10'))
+
+            for transaction_type, party in (
+                ('Invoice', {'customer': customer}), ('Payment', {'customer': customer}),
+                ('Bill', {'vendor': vendor}), ('Payment', {'vendor': vendor}),
+            ):
+                Transaction.objects.create(
+                    transaction_type=transaction_type, date=today, amount=Decimal('10'), **party
+                )
+            Expense.objects.create(date=today, category='Other', description=f'Expense {n}', amount=Decimal('3'))
+            ItemMaster.objects.create(code=f'ITEM-{n}', name=f'Item {n}', category='Fabric')
+        rebuild_rollups()
+
+        return {
+            'vendor': vendor.pk, 'customer': customer.pk, 'broker': broker.pk,
+            'lot': lots[0].pk, 'invoice': invoice.pk, 'bill': bill.pk,
+            'transaction': Transaction.objects.filter(customer=customer).first().pk,
+            'payment': PaymentRecord.objects.filter(invoice=invoice).first().pk,
+        }
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def test_list_endpoints_within_budget(self):
+        self.seed(1)
+        small = {url: self.count_queries(url) for url in LIST_BUDGETS}
+        self.seed(5)
+        for url, budget in LIST_BUDGETS.items():
+            with self.subTest(url=url):
+                queries = self.count_queries(url)
+                self.assertEqual(queries, small[url], f'{url} query count grows with rows')
+                self.assertLessEqual(queries, budget)
+
+    def test_detail_endpoints_within_budget(self):
+        ids = self.seed(3)
+        for template, budget in DETAIL_BUDGETS.items():
+            url = template.format(**ids)
+            with self.subTest(url=url):
+                self.assertLessEqual(self.count_queries(url), budget)
+
+    def test_revalidation_skips_serialization(self):
+        ids = self.seed(3)
+        for url in ('/api/invoices/', '/api/bills/', '/api/invoices/{invoice}/'.format(**ids)):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertLessEqual(len(queries), 2)
+
+    def post_document(self, url, ids, lots):
+        """Create an invoice or bill over ``lots`` and return its query count"""
+        self.created += 1
+        n = self.created
+        if url == '/api/invoices/':
+            document = {
+                'invoice_number': f'NEW-INV-{n}', 'customer': ids['customer'], 'broker': ids['broker'],
+                'commission_type': 'Percentage', 'commission_value': '2',
+            }
+        else:
+            document = {'bill_number': f'NEW-BILL-{n}', 'vendor': ids['vendor']}
+        document.update(
+            date=date.today().isoformat(), due_date=date.today().isoformat(),
+            items=[{'inventory_item': lot, 'meters': '1', 'price': '7'} for lot in lots],
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, document, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return len(queries)
+
+    def test_document_creation_within_budget(self):
+        ids = self.seed(6)
+        lots = list(InventoryItem.objects.values_list('pk', flat=True))
+        for url, budget in CREATE_BUDGETS.items():
+            with self.subTest(url=url):
+                small = self.post_document(url, ids, lots[:2])
+                queries = self.post_document(url, ids, lots[2:])
+                self.assertEqual(queries, small, f'{url} query count grows with items')
+                self.assertLessEqual(queries, budget)
+        self.assertFalse(InventoryItem.objects.filter(is_billed=False).exists())
@@ -6,10 +6,21 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from django.db.models import Sum, Q, Count
 from datetime import datetime, timedelta
-from .models import (
-    Transaction, PaymentRecord, CommissionPayment, Invoice, InvoiceItem,
-    Bill, BillItem
-)
+from django.db import transaction as db_transaction
+from core.summaries import SummaryMixin, summarize
+from core.response_cache import cached_response
+from core.pagination import OptionalCursorPaginationMixin
+from core.csv_import import CsvImportMixin
+from core.fieldsets import SparseFieldsetMixin
+from core.conditional import ConditionalGetMixin
+from core.search import RankedSearchFilter
+from core.closing import ensure_open
+from core.rollups import bill_entries, entry_dates, invoice_entries, post_rollups, reversed_entries
+from .models import Transaction, PaymentRecord, CommissionPayment, Invoice, Bill
+from .imports import InvoiceImporter, BillImporter
+from .filters import TransactionFilter, PaymentRecordFilter, InvoiceFilter, BillFilter
+from .services import post_invoice_payment, post_bill_payment, post_commission_payment
+from inventory.stock import return_stock
 from .serializers import (
     TransactionSerializer, PaymentRecordSerializer, CommissionPaymentSerializer,
     InvoiceSerializer, InvoiceCreateSerializer,
@@ -17,100 +28,117 @@ from .serializers import (
 )
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(OptionalCursorPaginationMixin, SummaryMixin, SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing transactions"""
-    queryset = Transaction.objects.all()
+    queryset = Transaction.objects.all().select_related('vendor', 'customer')
     serializer_class = TransactionSerializer
+    conditional_models = ('accounts.Vendor', 'accounts.Customer')
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['transaction_type', 'vendor', 'customer']
-    search_fields = ['reference_id', 'description']
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, RankedSearchFilter]
+    filterset_class = TransactionFilter
+    search_fields = ['reference_id']
+    search_text_fields = ['description']
     ordering_fields = ['date', 'amount']
     ordering = ['-date']
+
+    @db_transaction.atomic
+    def perform_create(self, serializer):
+        ensure_open(serializer.validated_data['date'])
+        serializer.save()
+
+    @db_transaction.atomic
+    def perform_update(self, serializer):
+        ensure_open(serializer.instance.date, serializer.validated_data.get('date'))
+        serializer.save()
+
+    @db_transaction.atomic
+    def perform_destroy(self, instance):
+        ensure_open(instance.date)
+        instance.delete()
     
     @action(detail=False, methods=['get'])
+    @cached_response('transactions.Transaction')
     def summary(self, request):
         """Get transaction summary statistics"""
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        total_transactions = queryset.count()
-        total_amount = queryset.aggregate(total=Sum('amount'))['total'] or 0
-        
-        by_type = {}
-        for trans_type, _ in Transaction.TRANSACTION_TYPES:
-            count = queryset.filter(transaction_type=trans_type).count()
-            amount = queryset.filter(transaction_type=trans_type).aggregate(total=Sum('amount'))['total'] or 0
-            by_type[trans_type] = {
-                'count': count,
-                'amount': float(amount)
-            }
+        totals, by_type = summarize(
+            self.get_summary_queryset(),
+            {'count': (Count, 'id'), 'amount': (Sum, 'amount')},
+            group_field='transaction_type',
+            group_values=[value for value, _ in Transaction.TRANSACTION_TYPES]
+        )
         
         return Response({
-            'total_transactions': total_transactions,
-            'total_amount': float(total_amount),
-            'by_type': by_type
+            'total_transactions': totals['count'],
+            'total_amount': float(totals['amount']),
+            'by_type': {
+                trans_type: {'count': group['count'], 'amount': float(group['amount'])}
+                for trans_type, group in by_type.items()
+            }
         })
 
 
-class PaymentRecordViewSet(viewsets.ReadOnlyModelViewSet):
+class PaymentRecordViewSet(OptionalCursorPaginationMixin, SparseFieldsetMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing payment records"""
     queryset = PaymentRecord.objects.all()
     serializer_class = PaymentRecordSerializer
+    conditional_field = 'created_at'
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['method', 'invoice', 'bill']
+    filterset_class = PaymentRecordFilter
     ordering_fields = ['date', 'amount']
     ordering = ['-date']
 
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(CsvImportMixin, OptionalCursorPaginationMixin, SummaryMixin, SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing invoices"""
-    queryset = Invoice.objects.all().select_related('customer', 'broker').prefetch_related('items', 'payment_records', 'commission_payments')
+    queryset = Invoice.objects.all().select_related('customer', 'broker').prefetch_related(
+        'items__inventory_item__vendor', 'payment_records', 'commission_payments'
+    )
     serializer_class = InvoiceSerializer
+    conditional_models = (
+        'accounts.Customer', 'accounts.Broker', 'accounts.Vendor', 'inventory.InventoryItem'
+    )
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['status', 'customer', 'broker', 'commission_type']
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, RankedSearchFilter]
+    filterset_class = InvoiceFilter
     search_fields = ['invoice_number', 'customer__name', 'broker__name']
     ordering_fields = ['date', 'due_date', 'total', 'commission_amount']
     ordering = ['-date']
+    csv_importer_class = InvoiceImporter
     
     def get_serializer_class(self):
         if self.action == 'create':
             return InvoiceCreateSerializer
         return InvoiceSerializer
+
+    @db_transaction.atomic
+    def perform_update(self, serializer):
+        """Move the invoice's rollup figures, payments included, along with the edit"""
+        before = invoice_entries(serializer.instance, payments=True)
+        invoice = serializer.save()
+        after = invoice_entries(invoice, payments=True)
+        ensure_open(*entry_dates(before + after))
+        post_rollups(reversed_entries(before) + after)
+
+    @db_transaction.atomic
+    def perform_destroy(self, instance):
+        """Put the invoice's meters back into stock and take it out of the rollup"""
+        entries = invoice_entries(instance, payments=True)
+        ensure_open(*entry_dates(entries))
+        return_stock(
+            instance.items.values_list('inventory_item_id', 'meters'),
+            instance.date, instance.invoice_number, 'Invoice deleted'
+        )
+        post_rollups(reversed_entries(entries))
+        instance.delete()
     
     @action(detail=True, methods=['post'])
     def add_payment(self, request, pk=None):
         """Add a payment to an invoice"""
-        invoice = self.get_object()
-        
-        # Create payment record
-        payment_data = request.data.copy()
-        payment_data['invoice'] = invoice.id
-        
-        payment_serializer = PaymentRecordSerializer(data=payment_data)
+        payment_serializer = PaymentRecordSerializer(data=request.data)
         if payment_serializer.is_valid():
-            payment = payment_serializer.save()
-            
-            # Update invoice amount paid
-            invoice.amount_paid += payment.amount
-            invoice.save()
-            invoice.update_status()
-            
-            # Create transaction record
-            Transaction.objects.create(
-                transaction_type='Payment',
-                date=payment.date,
-                amount=payment.amount,
-                description=f"Payment for Invoice {invoice.invoice_number}",
-                reference_id=f"PAY-{payment.id}",
-                customer=invoice.customer
-            )
-            
-            # Update customer balance
-            invoice.customer.update_balance()
-            
-            serializer = self.get_serializer(invoice)
+            post_invoice_payment(pk, payment_serializer.validated_data)
+            serializer = self.get_serializer(self.get_object())
             return Response(serializer.data)
         
         return Response(payment_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -118,69 +146,44 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def settle_commission(self, request, pk=None):
         """Add a partial or full commission payment to an invoice's broker commission"""
-        invoice = self.get_object()
-
-        if not invoice.broker:
-            return Response({'detail': 'This invoice has no broker assigned.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        commission_remaining = invoice.commission_amount - invoice.commission_paid
-        if commission_remaining <= 0:
-            return Response({'detail': 'Commission already fully settled.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Build commission payment data
         payment_data = request.data.copy()
-        payment_data['invoice'] = invoice.id
+        payment_data['invoice'] = pk
 
         payment_serializer = CommissionPaymentSerializer(data=payment_data)
         if payment_serializer.is_valid():
-            payment = payment_serializer.save()
-
-            # Update commission_paid on invoice
-            invoice.commission_paid += payment.amount
-            invoice.save()
-
-            # Create a Settlement transaction record
-            Transaction.objects.create(
-                transaction_type='Settlement',
-                date=payment.date,
-                amount=payment.amount,
-                description=f"Commission payment for Invoice {invoice.invoice_number} to broker {invoice.broker.name}",
-                reference_id=f"COMM-{payment.id}",
-                customer=invoice.customer
-            )
-
-            serializer = self.get_serializer(invoice)
+            post_commission_payment(pk, payment_serializer.validated_data)
+            serializer = self.get_serializer(self.get_object())
             return Response(serializer.data)
 
         return Response(payment_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=False, methods=['get'])
+    @cached_response('transactions.Invoice')
     def summary(self, request):
         """Get invoice summary statistics"""
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        total_invoices = queryset.count()
-        total_amount = queryset.aggregate(total=Sum('total'))['total'] or 0
-        total_paid = queryset.aggregate(total=Sum('amount_paid'))['total'] or 0
-        
-        by_status = {}
-        for status_value, _ in Invoice.STATUS_CHOICES:
-            count = queryset.filter(status=status_value).count()
-            amount = queryset.filter(status=status_value).aggregate(total=Sum('total'))['total'] or 0
-            by_status[status_value] = {
-                'count': count,
-                'amount': float(amount)
-            }
+        totals, by_status = summarize(
+            self.get_summary_queryset(),
+            {'count': (Count, 'id'), 'amount': (Sum, 'total'), 'paid': (Sum, 'amount_paid')},
+            group_field='status',
+            group_values=[value for value, _ in Invoice.STATUS_CHOICES]
+        )
         
         return Response({
-            'total_invoices': total_invoices,
-            'total_amount': float(total_amount),
-            'total_paid': float(total_paid),
-            'outstanding': float(total_amount - total_paid),
-            'by_status': by_status
+            'total_invoices': totals['count'],
+            'total_amount': float(totals['amount']),
+            'total_paid': float(totals['paid']),
+            'outstanding': float(totals['amount'] - totals['paid']),
+            'by_status': {
+                status_value: {'count': group['count'], 'amount': float(group['amount'])}
+                for status_value, group in by_status.items()
+            }
         })
     
     @action(detail=False, methods=['get'])
+    @cached_response(
+        'transactions.Invoice', 'transactions.PaymentRecord', 'transactions.CommissionPayment',
+        'inventory.InventoryItem', 'accounts.Customer', 'accounts.Broker', 'accounts.Vendor'
+    )
     def overdue(self, request):
         """Get overdue invoices"""
         from django.utils import timezone
@@ -191,89 +194,84 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             status__in=['Pending', 'Partially Paid']
         )
         
-        serializer = self.get_serializer(overdue_invoices, many=True)
-        return Response(serializer.data)
+        return self.optionally_paginated_response(overdue_invoices)
 
 
-class BillViewSet(viewsets.ModelViewSet):
+class BillViewSet(CsvImportMixin, OptionalCursorPaginationMixin, SummaryMixin, SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing bills"""
-    queryset = Bill.objects.all().select_related('vendor').prefetch_related('items', 'payment_records')
+    queryset = Bill.objects.all().select_related('vendor').prefetch_related(
+        'items__inventory_item__vendor', 'payment_records'
+    )
     serializer_class = BillSerializer
+    conditional_models = ('accounts.Vendor', 'inventory.InventoryItem')
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['status', 'vendor']
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, RankedSearchFilter]
+    filterset_class = BillFilter
     search_fields = ['bill_number', 'vendor__name']
     ordering_fields = ['date', 'due_date', 'total']
     ordering = ['-date']
+    csv_importer_class = BillImporter
     
     def get_serializer_class(self):
         if self.action == 'create':
             return BillCreateSerializer
         return BillSerializer
+
+    @db_transaction.atomic
+    def perform_update(self, serializer):
+        """Move the bill's rollup figures, payments included, along with the edit"""
+        before = bill_entries(serializer.instance, payments=True)
+        bill = serializer.save()
+        after = bill_entries(bill, payments=True)
+        ensure_open(*entry_dates(before + after))
+        post_rollups(reversed_entries(before) + after)
+
+    @db_transaction.atomic
+    def perform_destroy(self, instance):
+        """Take the bill and its payments out of the rollup"""
+        entries = bill_entries(instance, payments=True)
+        ensure_open(*entry_dates(entries))
+        post_rollups(reversed_entries(entries))
+        instance.delete()
     
     @action(detail=True, methods=['post'])
     def add_payment(self, request, pk=None):
         """Add a payment to a bill"""
-        bill = self.get_object()
-        
-        # Create payment record
-        payment_data = request.data.copy()
-        payment_data['bill'] = bill.id
-        
-        payment_serializer = PaymentRecordSerializer(data=payment_data)
+        payment_serializer = PaymentRecordSerializer(data=request.data)
         if payment_serializer.is_valid():
-            payment = payment_serializer.save()
-            
-            # Update bill amount paid
-            bill.amount_paid += payment.amount
-            bill.save()
-            bill.update_status()
-            
-            # Create transaction record
-            Transaction.objects.create(
-                transaction_type='Payment',
-                date=payment.date,
-                amount=payment.amount,
-                description=f"Payment for Bill {bill.bill_number}",
-                reference_id=f"PAY-{payment.id}",
-                vendor=bill.vendor
-            )
-            
-            # Update vendor balance
-            bill.vendor.update_balance()
-            
-            serializer = self.get_serializer(bill)
+            post_bill_payment(pk, payment_serializer.validated_data)
+            serializer = self.get_serializer(self.get_object())
             return Response(serializer.data)
         
         return Response(payment_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=False, methods=['get'])
+    @cached_response('transactions.Bill')
     def summary(self, request):
         """Get bill summary statistics"""
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        total_bills = queryset.count()
-        total_amount = queryset.aggregate(total=Sum('total'))['total'] or 0
-        total_paid = queryset.aggregate(total=Sum('amount_paid'))['total'] or 0
-        
-        by_status = {}
-        for status_value, _ in Bill.STATUS_CHOICES:
-            count = queryset.filter(status=status_value).count()
-            amount = queryset.filter(status=status_value).aggregate(total=Sum('total'))['total'] or 0
-            by_status[status_value] = {
-                'count': count,
-                'amount': float(amount)
-            }
+        totals, by_status = summarize(
+            self.get_summary_queryset(),
+            {'count': (Count, 'id'), 'amount': (Sum, 'total'), 'paid': (Sum, 'amount_paid')},
+            group_field='status',
+            group_values=[value for value, _ in Bill.STATUS_CHOICES]
+        )
         
         return Response({
-            'total_bills': total_bills,
-            'total_amount': float(total_amount),
-            'total_paid': float(total_paid),
-            'outstanding': float(total_amount - total_paid),
-            'by_status': by_status
+            'total_bills': totals['count'],
+            'total_amount': float(totals['amount']),
+            'total_paid': float(totals['paid']),
+            'outstanding': float(totals['amount'] - totals['paid']),
+            'by_status': {
+                status_value: {'count': group['count'], 'amount': float(group['amount'])}
+                for status_value, group in by_status.items()
+            }
         })
     
     @action(detail=False, methods=['get'])
+    @cached_response(
+        'transactions.Bill', 'transactions.PaymentRecord',
+        'inventory.InventoryItem', 'accounts.Vendor'
+    )
     def overdue(self, request):
         """Get overdue bills"""
         from django.utils import timezone
@@ -284,5 +282,4 @@ class BillViewSet(viewsets.ModelViewSet):
             status__in=['Unpaid', 'Partially Paid']
         )
         
-        serializer = self.get_serializer(overdue_bills, many=True)
-        return Response(serializer.data)
+        return self.optionally_paginated_response(overdue_bills)
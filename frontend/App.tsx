@@ -1,7 +1,7 @@
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Page, Vendor, Customer, Broker, InventoryItem, Invoice, Bill, PaymentRecord, Transaction, User, Expense } from './types';
-import { vendorsAPI, customersAPI, brokersAPI, inventoryAPI, invoicesAPI, billsAPI, authAPI, TokenManager, emitToast } from './api';
+import { vendorsAPI, customersAPI, brokersAPI, inventoryAPI, invoicesAPI, billsAPI, changesAPI, bootstrapAPI, authAPI, TokenManager, emitToast } from './api';
 import Sidebar from './components/Sidebar';
 import FlowchartDashboard from './components/FlowchartDashboard';
 import VendorCenter from './components/VendorCenter';
@@ -40,6 +40,8 @@ const App: React.FC = () => {
   const [pendingBillLot, setPendingBillLot] = useState<InventoryItem[] | null>(null);
   const [selectedVendorId, setSelectedVendorId] = useState<string | null>(null);
   const [selectedCustomerId, setSelectedCustomerId] = useState<string | null>(null);
+  // Position in the server's changes feed; null until a full load has completed
+  const syncCursor = useRef<number | null>(null);
 
   // Load data from backend when user logs in
   useEffect(() => {
@@ -72,56 +74,50 @@ const App: React.FC = () => {
   const loadAllData = async () => {
     setIsLoading(true);
     try {
-      const [vendorsData, customersData, brokersData, inventoryData, invoicesData, billsData] = await Promise.all([
-        vendorsAPI.getAll(),
-        customersAPI.getAll(),
-        brokersAPI.getAll(),
-        inventoryAPI.getAll(),
-        invoicesAPI.getAll(),
-        billsAPI.getAll(),
-      ]);
-
-      console.log('Loaded data:', { vendorsData, customersData, brokersData, inventoryData, invoicesData, billsData });
-
-      // Map backend data to frontend format
-      const mappedVendors = Array.isArray(vendorsData) ? vendorsData.map(mapVendor) : [];
-      const mappedCustomers = Array.isArray(customersData) ? customersData.map(mapCustomer) : [];
-      
-      // Load transaction logs for each vendor and customer
-      const vendorsWithLogs = await Promise.all(
-        mappedVendors.map(async (vendor) => {
-          try {
-            const transactions = await vendorsAPI.getTransactions(vendor.id);
-            return { ...vendor, logs: Array.isArray(transactions) ? transactions.map(mapTransaction) : [] };
-          } catch {
-            return vendor;
-          }
-        })
-      );
-      
-      const customersWithLogs = await Promise.all(
-        mappedCustomers.map(async (customer) => {
-          try {
-            const transactions = await customersAPI.getTransactions(customer.id);
-            return { ...customer, logs: Array.isArray(transactions) ? transactions.map(mapTransaction) : [] };
-          } catch {
-            return customer;
-          }
-        })
-      );
-      
-      setVendors(vendorsWithLogs);
-      setCustomers(customersWithLogs);
-      setBrokers(Array.isArray(brokersData) ? brokersData.map(mapBroker) : []);
-      setInventory(Array.isArray(inventoryData) ? inventoryData.map(mapInventoryItem) : []);
-      setInvoices(Array.isArray(invoicesData) ? invoicesData.map(mapInvoice) : []);
-      setBills(Array.isArray(billsData) ? billsData.map(mapBill) : []);
+      // One compact snapshot of the working set; unchanged data revalidates as a 304
+      const snapshot = await bootstrapAPI.get();
+
+      setVendors((snapshot.vendors || []).map(mapVendor));
+      setCustomers((snapshot.customers || []).map(mapCustomer));
+      setBrokers((snapshot.brokers || []).map(mapBroker));
+      setInventory((snapshot.inventory || []).map(mapInventoryItem));
+      setInvoices((snapshot.invoices || []).map(mapInvoice));
+      setBills((snapshot.bills || []).map(mapBill));
+      syncCursor.current = snapshot.cursor ?? null;
     } catch (error) {
       console.error('Error loading data:', error);
       alert('Failed to load data from server. Please refresh the page.');
+      return;
     } finally {
       setIsLoading(false);
     }
+    loadHistory();
+  };
+
+  // Paid documents and party ledgers load after the first render
+  const loadHistory = async () => {
+    try {
+      const history = await bootstrapAPI.getHistory();
+      const logsFor = (field: 'vendor' | 'customer') => {
+        const logs = new Map<string, Transaction[]>();
+        (history.transactions || []).forEach((t: any) => {
+          if (!t[field]) return;
+          const key = String(t[field]);
+          logs.set(key, [...(logs.get(key) || []), mapTransaction(t)]);
+        });
+        logs.forEach(list => list.sort((a, b) => b.date.localeCompare(a.date)));
+        return logs;
+      };
+      const vendorLogs = logsFor('vendor');
+      const customerLogs = logsFor('customer');
+
+      setVendors(prev => prev.map(v => ({ ...v, logs: vendorLogs.get(v.id) || [] })));
+      setCustomers(prev => prev.map(c => ({ ...c, logs: customerLogs.get(c.id) || [] })));
+      setInvoices(prev => mergeById(prev, (history.invoices || []).map(mapInvoice)));
+      setBills(prev => mergeById(prev, (history.bills || []).map(mapBill)));
+    } catch (error) {
+      console.error('Error loading history:', error);
+    }
   };
 
   // Mapping functions to convert backend format to frontend format
@@ -160,7 +156,8 @@ const App: React.FC = () => {
     unitPrice: parseFloat(data.unit_price) || 0,
     vendorId: String(data.vendor),
     receivedDate: data.received_date || new Date().toISOString().slice(0, 10),
-    isBilled: data.is_billed || false
+    isBilled: data.is_billed || false,
+    availableMeters: parseFloat(data.available_meters) || 0
   });
 
   const mapInvoice = (data: any): Invoice => ({
@@ -232,6 +229,81 @@ const App: React.FC = () => {
     referenceId: data.reference_id || ''
   });
 
+  // Merge changed rows into a list by id and drop tombstoned ids; new rows go first
+  const mergeById = <T extends { id: string }>(rows: T[], changed: T[], deletedIds: any[] = []) => {
+    const removed = new Set(deletedIds.map(String));
+    const updates = new Map(changed.map(row => [row.id, row]));
+    const existing = new Set(rows.map(row => row.id));
+    const added = changed.filter(row => !existing.has(row.id));
+    return [...added, ...rows.filter(row => !removed.has(row.id)).map(row => updates.get(row.id) || row)];
+  };
+
+  // Update a party's transaction log with the transactions changed in this sync
+  const mergeLogs = (logs: Transaction[], partyId: string, field: 'vendor' | 'customer', changedTxns: any[], deletedTxns: Set<string>) => {
+    const changedIds = new Set(changedTxns.map((t: any) => String(t.id)));
+    const kept = logs.filter(log => !changedIds.has(log.id) && !deletedTxns.has(log.id));
+    const added = changedTxns.filter((t: any) => String(t[field]) === partyId).map(mapTransaction);
+    return [...added, ...kept].sort((a, b) => b.date.localeCompare(a.date));
+  };
+
+  const applyChanges = (changes: any, deleted: any) => {
+    const changedTxns: any[] = changes.transactions || [];
+    const deletedTxns = new Set<string>((deleted.transactions || []).map(String));
+    const touchesLogs = changedTxns.length > 0 || deletedTxns.size > 0;
+
+    setVendors(prev => {
+      const logs = new Map(prev.map(v => [v.id, v.logs]));
+      const changed = (changes.vendors || []).map((row: any) => ({ ...mapVendor(row), logs: logs.get(String(row.id)) || [] }));
+      const merged = mergeById(prev, changed, deleted.vendors);
+      return touchesLogs ? merged.map(v => ({ ...v, logs: mergeLogs(v.logs || [], v.id, 'vendor', changedTxns, deletedTxns) })) : merged;
+    });
+    setCustomers(prev => {
+      const logs = new Map(prev.map(c => [c.id, c.logs]));
+      const changed = (changes.customers || []).map((row: any) => ({ ...mapCustomer(row), logs: logs.get(String(row.id)) || [] }));
+      const merged = mergeById(prev, changed, deleted.customers);
+      return touchesLogs ? merged.map(c => ({ ...c, logs: mergeLogs(c.logs || [], c.id, 'customer', changedTxns, deletedTxns) })) : merged;
+    });
+    setBrokers(prev => mergeById(prev, (changes.brokers || []).map(mapBroker), deleted.brokers));
+    setInventory(prev => mergeById(prev, (changes.inventory || []).map(mapInventoryItem), deleted.inventory));
+    setInvoices(prev => mergeById(prev, (changes.invoices || []).map(mapInvoice), deleted.invoices));
+    setBills(prev => mergeById(prev, (changes.bills || []).map(mapBill), deleted.bills));
+  };
+
+  // Pull only the rows changed since the last sync (one request per 500 changes)
+  const syncChanges = async () => {
+    if (syncCursor.current === null) return loadAllData();
+    let feed: any;
+    do {
+      feed = await changesAPI.get(syncCursor.current);
+      // The log no longer reaches back to our cursor
+      if (feed.resync) return loadAllData();
+      applyChanges(feed.changes || {}, feed.deleted || {});
+      syncCursor.current = feed.cursor;
+    } while (feed.has_more);
+  };
+
+  // Apply writes from other terminals as soon as the server announces them.
+  // Servers without the event stream (501, e.g. runserver) are not retried.
+  useEffect(() => {
+    if (!currentUser) return;
+    const controller = new AbortController();
+    const listen = async () => {
+      while (!controller.signal.aborted) {
+        try {
+          await changesAPI.subscribe(() => {
+            syncChanges().catch(err => console.error('Sync after change event failed:', err));
+          }, controller.signal);
+        } catch (err: any) {
+          if (controller.signal.aborted || err?.status === 501) return;
+          console.warn('Change event stream dropped:', err);
+        }
+        await new Promise(resolve => setTimeout(resolve, 5000));
+      }
+    };
+    listen();
+    return () => controller.abort();
+  }, [currentUser]);
+
   // Redirection Logic for Cashier
   useEffect(() => {
     // Only redirect cashiers to invoices when they have no explicit page selected
@@ -308,6 +380,7 @@ const App: React.FC = () => {
       console.error('Logout error', e);
     }
     setCurrentUser(null);
+    syncCursor.current = null;
     setVendors([]);
     setCustomers([]);
     setBrokers([]);
@@ -334,9 +407,7 @@ const App: React.FC = () => {
         await inventoryAPI.create(backendData);
       }
       
-      // Reload inventory from backend
-      const inventoryData = await inventoryAPI.getAll();
-      setInventory(Array.isArray(inventoryData) ? inventoryData.map(mapInventoryItem) : []);
+      await syncChanges();
     } catch (error: any) {
       console.error('Error adding inventory:', error);
       alert(`Failed to add inventory items: ${error.message}`);
@@ -472,9 +543,7 @@ const App: React.FC = () => {
   const handleSettleCommission = async (invoiceId: string, paymentData: { date: string; amount: number; method: string; bank_name?: string; tid?: string }) => {
     try {
       const result = await invoicesAPI.settleCommission(invoiceId, paymentData);
-      // Reload invoices to get updated commission_paid and commission_payments
-      const [invoiceRes] = await Promise.all([invoicesAPI.getAll()]);
-      setInvoices(invoiceRes.map(mapInvoice));
+      await syncChanges();
       return true;
     } catch (error) {
       console.error('Error settling commission:', error);
@@ -514,28 +583,7 @@ const App: React.FC = () => {
         });
       }
       
-      // Reload bills, inventory, and vendors with transaction logs
-      const [billsData, inventoryData, vendorsData] = await Promise.all([
-        billsAPI.getAll(),
-        inventoryAPI.getAll(),
-        vendorsAPI.getAll()
-      ]);
-      
-      const mappedVendors = vendorsData.map(mapVendor);
-      const vendorsWithLogs = await Promise.all(
-        mappedVendors.map(async (vendor: Vendor) => {
-          try {
-            const transactions = await vendorsAPI.getTransactions(vendor.id);
-            return { ...vendor, logs: Array.isArray(transactions) ? transactions.map(mapTransaction) : [] };
-          } catch {
-            return vendor;
-          }
-        })
-      );
-      
-      setBills(billsData.map(mapBill));
-      setInventory(inventoryData.map(mapInventoryItem));
-      setVendors(vendorsWithLogs);
+      await syncChanges();
       
       setPendingBillLot(null);
     } catch (error) {
@@ -554,26 +602,7 @@ const App: React.FC = () => {
         tid: payment.tid
       });
       
-      // Reload bills and vendors with their transaction logs
-      const [billsData, vendorsData] = await Promise.all([
-        billsAPI.getAll(),
-        vendorsAPI.getAll()
-      ]);
-      
-      const mappedVendors = vendorsData.map(mapVendor);
-      const vendorsWithLogs = await Promise.all(
-        mappedVendors.map(async (vendor: Vendor) => {
-          try {
-            const transactions = await vendorsAPI.getTransactions(vendor.id);
-            return { ...vendor, logs: Array.isArray(transactions) ? transactions.map(mapTransaction) : [] };
-          } catch {
-            return vendor;
-          }
-        })
-      );
-      
-      setBills(billsData.map(mapBill));
-      setVendors(vendorsWithLogs);
+      await syncChanges();
     } catch (error) {
       console.error('Error adding payment to bill:', error);
       alert('Failed to process payment. Please try again.');
@@ -590,26 +619,7 @@ const App: React.FC = () => {
         tid: payment.tid
       });
       
-      // Reload invoices and customers with their transaction logs
-      const [invoicesData, customersData] = await Promise.all([
-        invoicesAPI.getAll(),
-        customersAPI.getAll()
-      ]);
-      
-      const mappedCustomers = customersData.map(mapCustomer);
-      const customersWithLogs = await Promise.all(
-        mappedCustomers.map(async (customer: Customer) => {
-          try {
-            const transactions = await customersAPI.getTransactions(customer.id);
-            return { ...customer, logs: Array.isArray(transactions) ? transactions.map(mapTransaction) : [] };
-          } catch {
-            return customer;
-          }
-        })
-      );
-      
-      setInvoices(invoicesData.map(mapInvoice));
-      setCustomers(customersWithLogs);
+      await syncChanges();
     } catch (error) {
       console.error('Error adding payment to invoice:', error);
       alert('Failed to process payment. Please try again.');
@@ -647,28 +657,7 @@ const App: React.FC = () => {
         });
       }
       
-      // Reload invoices, inventory, and customers with transaction logs
-      const [invoicesData, inventoryData, customersData] = await Promise.all([
-        invoicesAPI.getAll(),
-        inventoryAPI.getAll(),
-        customersAPI.getAll()
-      ]);
-      
-      const mappedCustomers = customersData.map(mapCustomer);
-      const customersWithLogs = await Promise.all(
-        mappedCustomers.map(async (customer: Customer) => {
-          try {
-            const transactions = await customersAPI.getTransactions(customer.id);
-            return { ...customer, logs: Array.isArray(transactions) ? transactions.map(mapTransaction) : [] };
-          } catch {
-            return customer;
-          }
-        })
-      );
-      
-      setInvoices(invoicesData.map(mapInvoice));
-      setInventory(inventoryData.map(mapInventoryItem));
-      setCustomers(customersWithLogs);
+      await syncChanges();
     } catch (error) {
       console.error('Error creating invoice:', error);
       alert('Failed to create invoice. Please try again.');
@@ -35,8 +35,10 @@ class ApiClient {
     const url = `${this.baseURL}${endpoint}`;
     const token = TokenManager.getAccessToken();
 
+    // Let the browser set the multipart boundary for file uploads
+    const isFormData = options.body instanceof FormData;
     const headers: HeadersInit = {
-      'Content-Type': 'application/json',
+      ...(isFormData ? {} : { 'Content-Type': 'application/json' }),
       ...options.headers,
     };
 
@@ -116,7 +118,19 @@ class ApiClient {
     }
   }
 
-  private async refreshToken(): Promise<boolean> {
+  // Refresh tokens are single-use, so concurrent 401s share one refresh
+  private refreshing: Promise<boolean> | null = null;
+
+  private refreshToken(): Promise<boolean> {
+    if (!this.refreshing) {
+      this.refreshing = this.rotateTokens().finally(() => {
+        this.refreshing = null;
+      });
+    }
+    return this.refreshing;
+  }
+
+  private async rotateTokens(): Promise<boolean> {
     const refreshToken = TokenManager.getRefreshToken();
     if (!refreshToken) return false;
 
@@ -129,7 +143,8 @@ class ApiClient {
 
       if (response.ok) {
         const data = await response.json();
-        TokenManager.setTokens(data.access, refreshToken);
+        // The server rotates the refresh token and rejects the old one
+        TokenManager.setTokens(data.access, data.refresh || refreshToken);
         return true;
       }
       return false;
@@ -138,6 +153,21 @@ class ApiClient {
     }
   }
 
+  // Revoke the refresh token server-side; best effort, the caller clears tokens
+  async revokeRefreshToken(): Promise<void> {
+    const refreshToken = TokenManager.getRefreshToken();
+    if (!refreshToken) return;
+    try {
+      await fetch(`${this.baseURL}/auth/logout/`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh: refreshToken }),
+      });
+    } catch {
+      // offline: the token still expires on its own
+    }
+  }
+
   async get<T>(endpoint: string): Promise<T> {
     return this.request<T>(endpoint, { method: 'GET' });
   }
@@ -149,6 +179,15 @@ class ApiClient {
     });
   }
 
+  async upload<T>(endpoint: string, file: Blob, filename: string = 'import.csv'): Promise<T> {
+    const body = new FormData();
+    body.append('file', file, filename);
+    return this.request<T>(endpoint, {
+      method: 'POST',
+      body,
+    });
+  }
+
   async put<T>(endpoint: string, data: any): Promise<T> {
     return this.request<T>(endpoint, {
       method: 'PUT',
@@ -166,6 +205,44 @@ class ApiClient {
   async delete<T>(endpoint: string): Promise<T> {
     return this.request<T>(endpoint, { method: 'DELETE' });
   }
+
+  // Read a server-sent event stream until it ends or `signal` aborts it.
+  // Uses fetch rather than EventSource so the bearer token can be sent.
+  async stream(endpoint: string, onEvent: (event: string, data: any) => void, signal: AbortSignal): Promise<void> {
+    const open = () => fetch(`${this.baseURL}${endpoint}`, {
+      headers: { Authorization: `Bearer ${TokenManager.getAccessToken()}` },
+      signal,
+    });
+
+    let response = await open();
+    if (response.status === 401 && await this.refreshToken()) {
+      response = await open();
+    }
+    if (!response.ok || !response.body) {
+      throw Object.assign(new Error(`Event stream unavailable (HTTP ${response.status})`), { status: response.status });
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) return;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary: number;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let event = 'message';
+        const data: string[] = [];
+        block.split('\n').forEach(line => {
+          if (line.startsWith('event:')) event = line.slice(6).trim();
+          else if (line.startsWith('data:')) data.push(line.slice(5).trim());
+        });
+        if (data.length) onEvent(event, JSON.parse(data.join('\n')));
+      }
+    }
+  }
 }
 
 // Small helper to show toasts via window events
@@ -191,19 +268,26 @@ export const authAPI = {
   },
 
   logout: () => {
+    api.revokeRefreshToken();
     TokenManager.clearTokens();
   },
 
   getCurrentUser: () => api.get<any>('/users/me/'),
+
+  // Sign the user out on every device
+  revokeTokens: (userId: number) => api.post<void>(`/users/${userId}/revoke_tokens/`, {}),
 };
 
 export const vendorsAPI = {
   getAll: () => api.get<any[]>('/vendors/'),
   getById: (id: string) => api.get<any>(`/vendors/${id}/`),
   create: (data: any) => api.post<any>('/vendors/', data),
+  importCsv: (file: Blob) => api.upload<any>('/vendors/import_csv/', file),
   update: (id: string, data: any) => api.put<any>(`/vendors/${id}/`, data),
   delete: (id: string) => api.delete(`/vendors/${id}/`),
   getTransactions: (id: string) => api.get<any[]>(`/vendors/${id}/transactions/`),
+  getLedger: (id: string, params: string = '') => api.get<any>(`/vendors/${id}/ledger/${params ? `?${params}` : ''}`),
+  allocatePayment: (id: string, payment: any) => api.post<any>(`/vendors/${id}/allocate_payment/`, payment),
   updateBalance: (id: string) => api.post<any>(`/vendors/${id}/update_balance/`, {}),
 };
 
@@ -211,9 +295,12 @@ export const customersAPI = {
   getAll: () => api.get<any[]>('/customers/'),
   getById: (id: string) => api.get<any>(`/customers/${id}/`),
   create: (data: any) => api.post<any>('/customers/', data),
+  importCsv: (file: Blob) => api.upload<any>('/customers/import_csv/', file),
   update: (id: string, data: any) => api.put<any>(`/customers/${id}/`, data),
   delete: (id: string) => api.delete(`/customers/${id}/`),
   getTransactions: (id: string) => api.get<any[]>(`/customers/${id}/transactions/`),
+  getLedger: (id: string, params: string = '') => api.get<any>(`/customers/${id}/ledger/${params ? `?${params}` : ''}`),
+  allocatePayment: (id: string, payment: any) => api.post<any>(`/customers/${id}/allocate_payment/`, payment),
   updateBalance: (id: string) => api.post<any>(`/customers/${id}/update_balance/`, {}),
 };
 
@@ -221,6 +308,7 @@ export const brokersAPI = {
   getAll: () => api.get<any[]>('/brokers/'),
   getById: (id: string) => api.get<any>(`/brokers/${id}/`),
   create: (data: any) => api.post<any>('/brokers/', data),
+  importCsv: (file: Blob) => api.upload<any>('/brokers/import_csv/', file),
   update: (id: string, data: any) => api.put<any>(`/brokers/${id}/`, data),
   delete: (id: string) => api.delete(`/brokers/${id}/`),
 };
@@ -229,11 +317,27 @@ export const inventoryAPI = {
   getAll: () => api.get<any[]>('/inventory/'),
   getById: (id: string) => api.get<any>(`/inventory/${id}/`),
   create: (data: any) => api.post<any>('/inventory/', data),
+  importCsv: (file: Blob) => api.upload<any>('/inventory/import_csv/', file),
   update: (id: string, data: any) => api.put<any>(`/inventory/${id}/`, data),
   delete: (id: string) => api.delete(`/inventory/${id}/`),
   getSummary: () => api.get<any>('/inventory/summary/'),
   getByVendor: () => api.get<any[]>('/inventory/by_vendor/'),
+  getValuation: (params: { method?: 'fifo' | 'average'; groupBy?: 'fabric_type' | 'vendor' | 'lot'; asOf?: string; periodFrom?: string } = {}) => {
+    const query = new URLSearchParams();
+    if (params.method) query.set('method', params.method);
+    if (params.groupBy) query.set('group_by', params.groupBy);
+    if (params.asOf) query.set('as_of', params.asOf);
+    if (params.periodFrom) query.set('period_from', params.periodFrom);
+    const qs = query.toString();
+    return api.get<any>(`/inventory/valuation/${qs ? `?${qs}` : ''}`);
+  },
   markBilled: (id: string) => api.post<any>(`/inventory/${id}/mark_billed/`, {}),
+  markManyBilled: (ids: string[]) =>
+    api.post<{ requested: number; marked: number }>('/inventory/mark_billed/', { ids: ids.map(Number) }),
+  getAvailable: (search?: string) =>
+    api.get<any[]>(`/inventory/available/${search ? `?search=${encodeURIComponent(search)}` : ''}`),
+  getMovements: (id: string) => api.get<any[]>(`/inventory/${id}/movements/`),
+  adjust: (id: string, data: any) => api.post<any>(`/inventory/${id}/adjust/`, data),
 };
 
 export const itemMasterAPI = {
@@ -249,6 +353,7 @@ export const invoicesAPI = {
   getAll: () => api.get<any[]>('/invoices/'),
   getById: (id: string) => api.get<any>(`/invoices/${id}/`),
   create: (data: any) => api.post<any>('/invoices/', data),
+  importCsv: (file: Blob) => api.upload<any>('/invoices/import_csv/', file),
   update: (id: string, data: any) => api.put<any>(`/invoices/${id}/`, data),
   delete: (id: string) => api.delete(`/invoices/${id}/`),
   addPayment: (id: string, payment: any) => api.post<any>(`/invoices/${id}/add_payment/`, payment),
@@ -261,6 +366,7 @@ export const billsAPI = {
   getAll: () => api.get<any[]>('/bills/'),
   getById: (id: string) => api.get<any>(`/bills/${id}/`),
   create: (data: any) => api.post<any>('/bills/', data),
+  importCsv: (file: Blob) => api.upload<any>('/bills/import_csv/', file),
   update: (id: string, data: any) => api.put<any>(`/bills/${id}/`, data),
   delete: (id: string) => api.delete(`/bills/${id}/`),
   addPayment: (id: string, payment: any) => api.post<any>(`/bills/${id}/add_payment/`, payment),
@@ -268,6 +374,64 @@ export const billsAPI = {
   getOverdue: () => api.get<any[]>('/bills/overdue/'),
 };
 
+export const bootstrapAPI = {
+  // Parties, open lots and unpaid documents in one ETag-validated response
+  get: () => api.get<any>('/bootstrap/'),
+  // Paid documents and the transaction log
+  getHistory: () => api.get<any>('/bootstrap/history/'),
+};
+
+export const autocompleteAPI = {
+  // kinds: lots, fabric_types, vendors, customers, brokers, item_codes
+  lookup: (q: string, kinds: string[] = [], filters: Record<string, string> = {}, limit?: number) => {
+    const query = new URLSearchParams({ q, ...filters });
+    if (kinds.length) query.set('kinds', kinds.join(','));
+    if (limit) query.set('limit', String(limit));
+    return api.get<any>(`/autocomplete/?${query.toString()}`);
+  },
+};
+
+export const analyticsAPI = {
+  // source: sales, purchases, inventory; dimensions e.g. ['customer', 'month']
+  pivot: (source: string, dimensions: string[], params: Record<string, string> = {}) => {
+    const query = new URLSearchParams({ source, dimensions: dimensions.join(','), ...params });
+    return api.get<any>(`/analytics/?${query.toString()}`);
+  },
+};
+
+export const rollupsAPI = {
+  // kinds: sale, purchase, receipt, payment, expense, commission, commission_payment
+  getSeries: (period: 'day' | 'week' | 'month' | 'year', kinds: string[] = [], params: Record<string, string> = {}) => {
+    const query = new URLSearchParams({ period, ...params });
+    if (kinds.length) query.set('kinds', kinds.join(','));
+    return api.get<any>(`/rollups/?${query.toString()}`);
+  },
+  getSummary: (params: Record<string, string> = {}) =>
+    api.get<any>(`/rollups/summary/?${new URLSearchParams(params).toString()}`),
+};
+
+export const periodsAPI = {
+  getAll: () => api.get<any[]>('/periods/'),
+  // month: 'YYYY-MM'; postings dated in or before it are frozen
+  close: (month: string) => api.post<any>('/periods/close/', { month }),
+  reopen: (id: number) => api.post<any>(`/periods/${id}/reopen/`, {}),
+  getBalances: (id: number, partyType?: string) =>
+    api.get<any[]>(`/periods/${id}/balances/${partyType ? `?party_type=${partyType}` : ''}`),
+  getOpenDocuments: (id: number, documentType?: string) =>
+    api.get<any[]>(`/periods/${id}/open_documents/${documentType ? `?document_type=${documentType}` : ''}`),
+  getProfitLoss: (params: Record<string, string> = {}) =>
+    api.get<any>(`/periods/profit_loss/?${new URLSearchParams(params).toString()}`),
+};
+
+export const changesAPI = {
+  // Without `since` only the current cursor is returned
+  get: (since?: number, limit: number = 500) =>
+    api.get<any>(since === undefined || since === null ? '/changes/' : `/changes/?since=${since}&limit=${limit}`),
+  // Calls onChange with {feed: ids | null} whenever other terminals commit writes
+  subscribe: (onChange: (event: Record<string, number[] | null>) => void, signal: AbortSignal) =>
+    api.stream('/events/', (event, data) => { if (event === 'changes') onChange(data); }, signal),
+};
+
 export const transactionsAPI = {
   getAll: () => api.get<any[]>('/transactions/'),
   getById: (id: string) => api.get<any>(`/transactions/${id}/`),
@@ -1,4 +1,4 @@
-import React, { useEffect, useState, useRef } from 'react';
+import React, { useState, useRef } from 'react';
 import { vendorsAPI, customersAPI, brokersAPI, invoicesAPI, billsAPI, inventoryAPI, emitToast } from '../api';
 
 const parseCsv = (text: string) => {
@@ -46,14 +46,23 @@ const parseCsv = (text: string) => {
   return { headers, rows };
 };
 
-// normalize numeric-like strings: remove thousands separators, currency symbols
-const normalizeNumber = (v: any) => {
-  if (v === null || v === undefined) return '';
-  const s = String(v).trim();
-  if (!s) return '';
-  // Remove common currency signs and spaces, keep digits, minus and dot
-  const cleaned = s.replace(/[,\s]+/g, '').replace(/[^0-9.\-]/g, '');
-  return cleaned;
+// serialize parsed rows back to CSV so the server can import them in one request
+const toCsv = (headers: string[], rows: any[]) => {
+  const escape = (v: any) => {
+    const s = v === null || v === undefined ? '' : String(v);
+    return /[",\r\n]/.test(s) ? `"${s.replace(/"/g, '""')}"` : s;
+  };
+  const lines = [headers.map(escape).join(',')];
+  rows.forEach(row => lines.push(headers.map(h => escape(row[h])).join(',')));
+  return lines.join('\n') + '\n';
+};
+
+// upload rows to an entity's import_csv endpoint; the server resolves vendor/customer
+// names and reports failures by row number, counting the header as row 1
+const uploadRows = async (importCsv: (file: Blob) => Promise<any>, headers: string[], rows: any[]) => {
+  const result = await importCsv(new Blob([toCsv(headers, rows)], { type: 'text/csv;charset=utf-8;' }));
+  const failedList = (result.errors || []).map((e: any) => rows[e.row - 2]).filter(Boolean);
+  return { success: result.created || 0, failed: result.failed || 0, failedList };
 };
 
 const FileDropArea: React.FC<{onFile: (f?: File) => void, accept?: string}> = ({ onFile, accept = '.csv' }) => {
@@ -97,29 +106,18 @@ const SuppliersImport: React.FC<{onImported?: () => void, downloadSample?: () =>
     reader.readAsText(file);
   };
 
-  const buildPayload = (row: any) => ({
-    name: row['name'] || row['Name'] || row['supplier'] || row['Supplier'] || '',
-    contact: row['contact'] || row['Contact'] || row['phone'] || row['Phone'] || '',
-    address: row['address'] || row['Address'] || row['addr'] || '',
-    bank_details: row['bank_details'] || row['bank'] || row['Bank'] || ''
-  });
-
   const doImport = async (rows?: any[]) => {
     const toProcess = rows || preview;
     if (!toProcess.length) return emitToast('No rows to import', 'error');
     setLoading(true);
     let success = 0;
     let failed = 0;
-    const failedList: any[] = [];
-    for (const row of toProcess) {
-      const payload = buildPayload(row);
-      try {
-        await vendorsAPI.create(payload);
-        success += 1;
-      } catch (e: any) {
-        failed += 1;
-        failedList.push(row);
-      }
+    let failedList: any[] = [];
+    try {
+      ({ success, failed, failedList } = await uploadRows(vendorsAPI.importCsv, headers, toProcess));
+    } catch (e: any) {
+      failed = toProcess.length;
+      failedList = toProcess;
     }
     setLoading(false);
     setLastResult({ success, failed });
@@ -194,28 +192,18 @@ const CustomersImport: React.FC<{onImported?: () => void, downloadSample?: () =>
     reader.readAsText(file);
   };
 
-  const buildPayload = (row: any) => ({
-    name: row['name'] || row['Name'] || row['customer'] || row['Customer'] || '',
-    contact: row['contact'] || row['Contact'] || row['phone'] || row['Phone'] || '',
-    address: row['address'] || row['Address'] || ''
-  });
-
   const doImport = async (rows?: any[]) => {
     const toProcess = rows || preview;
     if (!toProcess.length) return emitToast('No rows to import', 'error');
     setLoading(true);
     let success = 0;
     let failed = 0;
-    const failedList: any[] = [];
-    for (const row of toProcess) {
-      const payload = buildPayload(row);
-      try {
-        await customersAPI.create(payload);
-        success += 1;
-      } catch (e: any) {
-        failed += 1;
-        failedList.push(row);
-      }
+    let failedList: any[] = [];
+    try {
+      ({ success, failed, failedList } = await uploadRows(customersAPI.importCsv, headers, toProcess));
+    } catch (e: any) {
+      failed = toProcess.length;
+      failedList = toProcess;
     }
     setLoading(false);
     setLastResult({ success, failed });
@@ -290,28 +278,18 @@ const BrokersImport: React.FC<{onImported?: () => void, downloadSample?: () => v
     reader.readAsText(file);
   };
 
-  const buildPayload = (row: any) => ({
-    name: row['name'] || row['Name'] || row['broker'] || row['Broker'] || '',
-    contact: row['contact'] || row['Contact'] || row['phone'] || row['Phone'] || '',
-    address: row['address'] || row['Address'] || ''
-  });
-
   const doImport = async (rows?: any[]) => {
     const toProcess = rows || preview;
     if (!toProcess.length) return emitToast('No rows to import', 'error');
     setLoading(true);
     let success = 0;
     let failed = 0;
-    const failedList: any[] = [];
-    for (const row of toProcess) {
-      const payload = buildPayload(row);
-      try {
-        await brokersAPI.create(payload);
-        success += 1;
-      } catch (e: any) {
-        failed += 1;
-        failedList.push(row);
-      }
+    let failedList: any[] = [];
+    try {
+      ({ success, failed, failedList } = await uploadRows(brokersAPI.importCsv, headers, toProcess));
+    } catch (e: any) {
+      failed = toProcess.length;
+      failedList = toProcess;
     }
     setLoading(false);
     setLastResult({ success, failed });
@@ -367,28 +345,7 @@ const BrokersImport: React.FC<{onImported?: () => void, downloadSample?: () => v
   );
 };
 
-const parseItemsCell = (cell: string) => {
-  // Accept JSON array or pipe/semicolon format: "inventoryId|meters|price;inventoryId|meters|price"
-  if (!cell) return [];
-  try {
-    const parsed = JSON.parse(cell);
-    if (Array.isArray(parsed)) return parsed;
-  } catch (e) {
-    // fallthrough
-  }
-
-  // fallback parse
-  return cell.split(';').map(part => {
-    const [inventory_item, meters, price] = part.split('|').map(s => s && s.trim());
-    const inv = inventory_item || '';
-    const metersNum = parseFloat(normalizeNumber(meters || '0')) || 0;
-    const priceNum = parseFloat(normalizeNumber(price || '0')) || 0;
-    const invParsed = /^[0-9]+$/.test(inv) ? parseInt(normalizeNumber(inv)) : inv;
-    return { inventory_item: invParsed, meters: metersNum, price: priceNum };
-  }).filter(p => p && p.inventory_item);
-};
-
-const InvoicesImport: React.FC<{vendorsMap: Record<string,string>, customersMap: Record<string,string>, onImported?: () => void, downloadSample?: () => void}> = ({ vendorsMap, customersMap, onImported, downloadSample }) => {
+const InvoicesImport: React.FC<{onImported?: () => void, downloadSample?: () => void}> = ({ onImported, downloadSample }) => {
   const [preview, setPreview] = useState<any[]>([]);
   const [headers, setHeaders] = useState<string[]>([]);
   const [loading, setLoading] = useState(false);
@@ -407,37 +364,18 @@ const InvoicesImport: React.FC<{vendorsMap: Record<string,string>, customersMap:
     reader.readAsText(file);
   };
 
-  const buildPayload = (row: any) => {
-    const custKey = (row['customer'] || row['Customer'] || row['customer_name'] || row['CustomerName'] || '').trim();
-    const customerId = customersMap[custKey] || (row['customer_id'] ? String(row['customer_id']) : undefined);
-    const itemsCell = row['items'] || row['Items'] || row['line_items'] || '';
-    const items = parseItemsCell(itemsCell);
-    return {
-      invoice_number: row['invoice_number'] || row['InvoiceNumber'] || row['id'] || '',
-      customer: customerId ? parseInt(normalizeNumber(customerId)) : undefined,
-      date: row['date'] || '',
-      due_date: row['due_date'] || row['dueDate'] || '',
-      notes: row['notes'] || '',
-      items: items
-    };
-  };
-
   const doImport = async (rows?: any[]) => {
     const toProcess = rows || preview;
     if (!toProcess.length) return emitToast('No rows to import', 'error');
     setLoading(true);
     let success = 0;
     let failed = 0;
-    const failedList: any[] = [];
-    for (const row of toProcess) {
-      const payload = buildPayload(row);
-      try {
-        await invoicesAPI.create(payload);
-        success += 1;
-      } catch (e: any) {
-        failed += 1;
-        failedList.push(row);
-      }
+    let failedList: any[] = [];
+    try {
+      ({ success, failed, failedList } = await uploadRows(invoicesAPI.importCsv, headers, toProcess));
+    } catch (e: any) {
+      failed = toProcess.length;
+      failedList = toProcess;
     }
     setLoading(false);
     setLastResult({ success, failed });
@@ -459,7 +397,7 @@ const InvoicesImport: React.FC<{vendorsMap: Record<string,string>, customersMap:
           <button onClick={downloadSample} className="px-3 py-2 border rounded text-sm text-slate-700 hover:bg-slate-50">Download sample</button>
         </div>
       </div>
-      <div className="mb-3 text-sm text-slate-600">Upload invoices CSV. `items` may be JSON or `id|meters|price;...`</div>
+      <div className="mb-3 text-sm text-slate-600">Upload invoices CSV. `items` may be JSON or `id|meters|price;...` (id or lot number)</div>
       <FileDropArea onFile={onFile} />
       {preview.length > 0 && (
         <div className="mt-4">
@@ -493,7 +431,7 @@ const InvoicesImport: React.FC<{vendorsMap: Record<string,string>, customersMap:
   );
 };
 
-const BillsImport: React.FC<{vendorsMap: Record<string,string>, onImported?: () => void, downloadSample?: () => void}> = ({ vendorsMap, onImported, downloadSample }) => {
+const BillsImport: React.FC<{onImported?: () => void, downloadSample?: () => void}> = ({ onImported, downloadSample }) => {
   const [preview, setPreview] = useState<any[]>([]);
   const [headers, setHeaders] = useState<string[]>([]);
   const [loading, setLoading] = useState(false);
@@ -512,37 +450,18 @@ const BillsImport: React.FC<{vendorsMap: Record<string,string>, onImported?: ()
     reader.readAsText(file);
   };
 
-  const buildPayload = (row: any) => {
-    const vendorKey = (row['vendor'] || row['Vendor'] || row['vendor_name'] || '').trim();
-    const vendorId = vendorsMap[vendorKey] || (row['vendor_id'] ? String(row['vendor_id']) : undefined);
-    const itemsCell = row['items'] || row['Items'] || '';
-    const items = parseItemsCell(itemsCell);
-    return {
-      bill_number: row['bill_number'] || row['BillNumber'] || row['id'] || '',
-      vendor: vendorId ? parseInt(vendorId) : undefined,
-      date: row['date'] || '',
-      due_date: row['due_date'] || row['dueDate'] || '',
-      notes: row['notes'] || '',
-      items: items
-    };
-  };
-
   const doImport = async (rows?: any[]) => {
     const toProcess = rows || preview;
     if (!toProcess.length) return emitToast('No rows to import', 'error');
     setLoading(true);
     let success = 0;
     let failed = 0;
-    const failedList: any[] = [];
-    for (const row of toProcess) {
-      const payload = buildPayload(row);
-      try {
-        await billsAPI.create(payload);
-        success += 1;
-      } catch (e: any) {
-        failed += 1;
-        failedList.push(row);
-      }
+    let failedList: any[] = [];
+    try {
+      ({ success, failed, failedList } = await uploadRows(billsAPI.importCsv, headers, toProcess));
+    } catch (e: any) {
+      failed = toProcess.length;
+      failedList = toProcess;
     }
     setLoading(false);
     setLastResult({ success, failed });
@@ -564,7 +483,7 @@ const BillsImport: React.FC<{vendorsMap: Record<string,string>, onImported?: ()
           <button onClick={downloadSample} className="px-3 py-2 border rounded text-sm text-slate-700 hover:bg-slate-50">Download sample</button>
         </div>
       </div>
-      <div className="mb-3 text-sm text-slate-600">Upload bills CSV. `items` may be JSON or `id|meters|price;...`</div>
+      <div className="mb-3 text-sm text-slate-600">Upload bills CSV. `items` may be JSON or `id|meters|price;...` (id or lot number)</div>
       <FileDropArea onFile={onFile} />
       {preview.length > 0 && (
         <div className="mt-4">
@@ -598,7 +517,7 @@ const BillsImport: React.FC<{vendorsMap: Record<string,string>, onImported?: ()
   );
 };
 
-const InventoryImport: React.FC<{vendorsMap: Record<string,string>, onImported?: () => void, downloadSample?: () => void}> = ({ vendorsMap, onImported, downloadSample }) => {
+const InventoryImport: React.FC<{onImported?: () => void, downloadSample?: () => void}> = ({ onImported, downloadSample }) => {
   const [preview, setPreview] = useState<any[]>([]);
   const [headers, setHeaders] = useState<string[]>([]);
   const [loading, setLoading] = useState(false);
@@ -617,35 +536,18 @@ const InventoryImport: React.FC<{vendorsMap: Record<string,string>, onImported?:
     reader.readAsText(file);
   };
 
-  const buildPayload = (row: any) => {
-    const vendorKey = (row['vendor'] || row['Vendor'] || '').trim();
-    const vendorId = vendorsMap[vendorKey] || (row['vendor_id'] ? String(row['vendor_id']) : undefined);
-    return {
-      lot_number: row['lot_number'] || row['lot'] || row['Lot'] || '',
-      fabric_type: row['fabric_type'] || row['type'] || row['FabricType'] || '',
-      meters: parseFloat(normalizeNumber(row['meters'] || row['quantity'] || '0')) || 0,
-      unit_price: parseFloat(normalizeNumber(row['unit_price'] || row['price'] || '0')) || 0,
-      vendor: vendorId ? parseInt(normalizeNumber(vendorId)) : undefined,
-      received_date: row['received_date'] || row['date'] || ''
-    };
-  };
-
   const doImport = async (rows?: any[]) => {
     const toProcess = rows || preview;
     if (!toProcess.length) return emitToast('No rows to import', 'error');
     setLoading(true);
     let success = 0;
     let failed = 0;
-    const failedList: any[] = [];
-    for (const row of toProcess) {
-      const payload = buildPayload(row);
-      try {
-        await inventoryAPI.create(payload);
-        success += 1;
-      } catch (e: any) {
-        failed += 1;
-        failedList.push(row);
-      }
+    let failedList: any[] = [];
+    try {
+      ({ success, failed, failedList } = await uploadRows(inventoryAPI.importCsv, headers, toProcess));
+    } catch (e: any) {
+      failed = toProcess.length;
+      failedList = toProcess;
     }
     setLoading(false);
     setLastResult({ success, failed });
@@ -703,31 +605,6 @@ const InventoryImport: React.FC<{vendorsMap: Record<string,string>, onImported?:
 
 const Imports: React.FC = () => {
   const [key, setKey] = useState<'suppliers' | 'customers' | 'brokers' | 'invoices' | 'bills' | 'inventory'>('suppliers');
-  const [vendorsMap, setVendorsMap] = useState<Record<string,string>>({});
-  const [customersMap, setCustomersMap] = useState<Record<string,string>>({});
-
-  useEffect(() => {
-    // load vendor and customer lists to map names -> ids
-    let mounted = true;
-    const load = async () => {
-      try {
-        const v = await vendorsAPI.getAll();
-        const c = await customersAPI.getAll();
-        if (!mounted) return;
-        const vmap: Record<string,string> = {};
-        (v || []).forEach((item: any) => { vmap[String(item.name).trim()] = String(item.id); });
-        const cmap: Record<string,string> = {};
-        (c || []).forEach((item: any) => { cmap[String(item.name).trim()] = String(item.id); });
-        setVendorsMap(vmap);
-        setCustomersMap(cmap);
-      } catch (e) {
-        // ignore
-      }
-    };
-    load();
-    return () => { mounted = false; };
-  }, []);
-
   const generateSampleCsv = (k: string) => {
     switch (k) {
       case 'suppliers':
@@ -781,10 +658,10 @@ const Imports: React.FC = () => {
 
       {key === 'suppliers' && <SuppliersImport downloadSample={() => downloadSample('suppliers')} onImported={() => emitToast('Suppliers import complete', 'success')} />}
       {key === 'customers' && <CustomersImport downloadSample={() => downloadSample('customers')} onImported={() => emitToast('Customers import complete', 'success')} />}
-      {key === 'invoices' && <InvoicesImport downloadSample={() => downloadSample('invoices')} vendorsMap={vendorsMap} customersMap={customersMap} onImported={() => emitToast('Invoices import complete', 'success')} />}
+      {key === 'invoices' && <InvoicesImport downloadSample={() => downloadSample('invoices')} onImported={() => emitToast('Invoices import complete', 'success')} />}
       {key === 'brokers' && <BrokersImport downloadSample={() => downloadSample('brokers')} onImported={() => emitToast('Brokers import complete', 'success')} />}
-      {key === 'bills' && <BillsImport downloadSample={() => downloadSample('bills')} vendorsMap={vendorsMap} onImported={() => emitToast('Bills import complete', 'success')} />}
-      {key === 'inventory' && <InventoryImport downloadSample={() => downloadSample('inventory')} vendorsMap={vendorsMap} onImported={() => emitToast('Inventory import complete', 'success')} />}
+      {key === 'bills' && <BillsImport downloadSample={() => downloadSample('bills')} onImported={() => emitToast('Bills import complete', 'success')} />}
+      {key === 'inventory' && <InventoryImport downloadSample={() => downloadSample('inventory')} onImported={() => emitToast('Inventory import complete', 'success')} />}
     </div>
   );
 };
@@ -101,7 +101,8 @@ const InventoryCenter: React.FC<InventoryCenterProps> = ({ inventory, setInvento
       meters: f.meters,
       unitPrice: f.unitPrice,
       receivedDate: new Date().toISOString().slice(0, 10),
-      isBilled: false
+      isBilled: false,
+      availableMeters: f.meters
     }));
 
     onReceive(newItems);
@@ -2,6 +2,7 @@
 import React, { useState, useEffect, useMemo } from 'react';
 import { Invoice, Bill, Vendor, Customer, Broker, InventoryItem, PaymentMethod, PaymentRecord } from '../types';
 import PrintPreview from './PrintPreview';
+import { autocompleteAPI, emitToast } from '../api';
 
 interface InvoiceBillCenterProps {
   type: 'Invoice' | 'Bill';
@@ -55,6 +56,11 @@ const InvoiceBillCenter: React.FC<InvoiceBillCenterProps> = ({
   const [dateFrom, setDateFrom] = useState<string>('');
   const [dateTo, setDateTo] = useState<string>('');
 
+  // Lot picker: prefix matches looked up on the server as the user types
+  const [lotQuery, setLotQuery] = useState('');
+  const [lotMatches, setLotMatches] = useState<InventoryItem[]>([]);
+  const [selectedLot, setSelectedLot] = useState<InventoryItem | null>(null);
+
   // Settlement Modal States
   const [settleAmount, setSettleAmount] = useState<number>(0);
   const [settleMethod, setSettleMethod] = useState<PaymentMethod>('Cash');
@@ -76,6 +82,38 @@ const InvoiceBillCenter: React.FC<InvoiceBillCenterProps> = ({
     }
   }, [preFilledLot, type]);
 
+  // Invoices pick lots with stock left, bills the vendor's unbilled lots;
+  // refetched when the change feed updates inventory
+  useEffect(() => {
+    if (!isCreating) return;
+    const filters: Record<string, string> = type === 'Invoice'
+      ? { in_stock: 'true' }
+      : { is_billed: 'false', ...(selectedEntityId ? { vendor: selectedEntityId } : {}) };
+    let cancelled = false;
+    const timer = setTimeout(() => {
+      autocompleteAPI.lookup(lotQuery.trim(), ['lots'], filters, 25)
+        .then(data => {
+          if (cancelled) return;
+          setLotMatches((data?.lots || []).map((lot: any) => ({
+            id: String(lot.id),
+            lotNumber: lot.lot_number,
+            type: lot.fabric_type,
+            meters: parseFloat(lot.meters) || 0,
+            unitPrice: parseFloat(lot.unit_price) || 0,
+            vendorId: String(lot.vendor),
+            receivedDate: '',
+            isBilled: lot.is_billed,
+            availableMeters: parseFloat(lot.available_meters) || 0
+          })));
+        })
+        .catch(e => {
+          console.error('Failed to look up lots:', e);
+          emitToast('Failed to look up lots.');
+        });
+    }, 200);
+    return () => { cancelled = true; clearTimeout(timer); };
+  }, [type, isCreating, selectedEntityId, lotQuery, inventory]);
+
   // Reset amount to 0 when Credit is selected
   useEffect(() => {
     if (creationMethod === 'Credit') {
@@ -88,10 +126,15 @@ const InvoiceBillCenter: React.FC<InvoiceBillCenterProps> = ({
       alert("Select fabric and valid quantity");
       return;
     }
-    const invRef = inventory.find(i => i.id === currentLineItem.itemId);
-    if (type === 'Invoice' && invRef && currentLineItem.meters > invRef.meters) {
-      alert(`Insufficient stock. Available: ${invRef.meters}m`);
-      return;
+    const invRef = selectedLot?.id === currentLineItem.itemId ? selectedLot : inventory.find(i => i.id === currentLineItem.itemId);
+    if (type === 'Invoice' && invRef) {
+      // Meters already on this invoice are not available twice
+      const onInvoice = lineItems.filter(li => li.itemId === invRef.id).reduce((acc, li) => acc + li.meters, 0);
+      const available = invRef.availableMeters - onInvoice;
+      if (currentLineItem.meters > available) {
+        alert(`Insufficient stock. Available: ${available}m`);
+        return;
+      }
     }
     setLineItems([...lineItems, {
       id: `li-${Date.now()}`,
@@ -100,6 +143,7 @@ const InvoiceBillCenter: React.FC<InvoiceBillCenterProps> = ({
       type: invRef?.type
     }]);
     setCurrentLineItem({ itemId: '', meters: 0, price: 0 });
+    setSelectedLot(null);
   };
 
   const totalAmount = useMemo(() => lineItems.reduce((acc, curr) => acc + (curr.meters * curr.price), 0), [lineItems]);
@@ -217,9 +261,6 @@ const InvoiceBillCenter: React.FC<InvoiceBillCenterProps> = ({
     setPrintingDoc(doc);
   };
 
-  const availableInventory = type === 'Bill' 
-    ? inventory.filter(i => !i.isBilled && (selectedEntityId ? i.vendorId === selectedEntityId : true))
-    : inventory.filter(i => i.meters > 0);
 
   // Sort items: overdue first, then by date
   const sortedItems = useMemo(() => {
@@ -585,14 +626,20 @@ const InvoiceBillCenter: React.FC<InvoiceBillCenterProps> = ({
                     ))}
                     <tr className="bg-slate-50/50">
                       <td className="p-6">
+                        <input type="text" placeholder="Search lot or fabric..." value={lotQuery} onChange={e => setLotQuery(e.target.value)}
+                          className="w-full border border-slate-200 rounded-xl p-3 mb-2 bg-white text-[11px] font-bold shadow-sm" />
                         <select value={currentLineItem.itemId} onChange={e => {
-                            const inv = inventory.find(i => i.id === e.target.value);
+                            const inv = lotMatches.find(i => i.id === e.target.value) || null;
+                            setSelectedLot(inv);
                             setCurrentLineItem({...currentLineItem, itemId: e.target.value, price: inv?.unitPrice || 0});
                           }}
                           className="w-full border border-slate-200 rounded-xl p-3 bg-white text-[11px] font-bold shadow-sm"
                         >
                           <option value="">-- Add Fabric --</option>
-                          {availableInventory.map(i => <option key={i.id} value={i.id}>{i.lotNumber} | {i.type} ({i.meters}m avail)</option>)}
+                          {selectedLot && !lotMatches.some(i => i.id === selectedLot.id) && (
+                            <option value={selectedLot.id}>{selectedLot.lotNumber} | {selectedLot.type}</option>
+                          )}
+                          {lotMatches.map(i => <option key={i.id} value={i.id}>{i.lotNumber} | {i.type} ({type === 'Invoice' ? i.availableMeters : i.meters}m avail)</option>)}
                         </select>
                       </td>
                       <td className="p-6">
@@ -1,6 +1,7 @@
 
-import React, { useMemo, useState } from 'react';
+import React, { useEffect, useMemo, useState } from 'react';
 import { Invoice, Bill, Expense, Vendor, Customer, Broker } from '../types';
+import { analyticsAPI, emitToast, rollupsAPI } from '../api';
 import { 
   BarChart, 
   Bar, 
@@ -54,6 +55,50 @@ const ReportsCenter: React.FC<ReportsCenterProps> = ({ invoices, bills, expenses
   };
 
   const range = useMemo(() => getRange(period), [period]);
+  const isoDate = (d: Date) => `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}-${String(d.getDate()).padStart(2, '0')}`;
+  const rangeParams = useMemo(() => {
+    const params: Record<string, string> = {};
+    if (period !== 'all') {
+      params.date_from = isoDate(range.start);
+      params.date_to = isoDate(range.end);
+    }
+    return params;
+  }, [range, period]);
+
+  // Period totals from the server's daily rollup; the cards fall back to the loaded lists without it
+  const [rollup, setRollup] = useState<any>(null);
+  useEffect(() => {
+    let cancelled = false;
+    rollupsAPI.getSummary(rangeParams)
+      .then(data => { if (!cancelled) setRollup(data); })
+      .catch(() => { if (!cancelled) setRollup(null); });
+    return () => { cancelled = true; };
+  }, [rangeParams, invoices, bills, expenses]);
+
+  // Server-side breakdown: grouped by the analytics endpoint instead of in the browser
+  const [breakdownSource, setBreakdownSource] = useState<'sales' | 'purchases' | 'inventory'>('sales');
+  const [breakdownDimension, setBreakdownDimension] = useState('customer');
+  const [breakdown, setBreakdown] = useState<any>(null);
+  const breakdownDimensions: Record<string, string[]> = {
+    sales: ['customer', 'broker', 'vendor', 'fabric_type', 'category', 'day', 'week', 'month'],
+    purchases: ['vendor', 'fabric_type', 'category', 'day', 'week', 'month'],
+    inventory: ['vendor', 'fabric_type', 'category', 'day', 'week', 'month'],
+  };
+
+  useEffect(() => {
+    const params: Record<string, string> = { ...rangeParams };
+    if (!['day', 'week', 'month'].includes(breakdownDimension)) params.ordering = '-amount';
+    let cancelled = false;
+    analyticsAPI.pivot(breakdownSource, [breakdownDimension], params)
+      .then(data => { if (!cancelled) setBreakdown(data); })
+      .catch(() => { if (!cancelled) emitToast('Failed to load breakdown', 'error'); });
+    return () => { cancelled = true; };
+  }, [breakdownSource, breakdownDimension, rangeParams]);
+
+  const breakdownLabel = (group: any) => {
+    const value = group[`${breakdownDimension}_name`] ?? group[breakdownDimension];
+    return value === null || value === undefined || value === '' ? '—' : String(value);
+  };
 
   // Pre-filter datasets according to selected period so summaries and lists match
   const filteredInvoices = useMemo(() => invoices.filter((inv: any) => inv.date && new Date(inv.date) >= range.start && new Date(inv.date) <= range.end), [invoices, range]);
@@ -61,9 +106,9 @@ const ReportsCenter: React.FC<ReportsCenterProps> = ({ invoices, bills, expenses
   const filteredExpenses = useMemo(() => expenses.filter((exp: any) => exp.date && new Date(exp.date) >= range.start && new Date(exp.date) <= range.end), [expenses, range]);
 
   // Compute totals based on filtered datasets so the summary cards reflect the selected period
-  const totalSales = filteredInvoices.reduce((acc, curr) => acc + curr.total, 0);
-  const totalBillExpenses = filteredBills.reduce((acc, curr) => acc + curr.total, 0);
-  const totalOperationalExpenses = filteredExpenses.reduce((acc, curr) => acc + Number(curr.amount), 0);
+  const totalSales = rollup ? rollup.kinds.sale.amount : filteredInvoices.reduce((acc, curr) => acc + curr.total, 0);
+  const totalBillExpenses = rollup ? rollup.kinds.purchase.amount : filteredBills.reduce((acc, curr) => acc + curr.total, 0);
+  const totalOperationalExpenses = rollup ? rollup.kinds.expense.amount : filteredExpenses.reduce((acc, curr) => acc + Number(curr.amount), 0);
   const totalExpenses = totalBillExpenses + totalOperationalExpenses;
   const totalCommission = filteredInvoices.reduce((acc, inv) => acc + (inv.commissionAmount || 0), 0);
   const totalCommissionPaid = filteredInvoices.reduce((acc, inv) => acc + (inv.commissionPaid || 0), 0);
@@ -285,6 +330,68 @@ const ReportsCenter: React.FC<ReportsCenterProps> = ({ invoices, bills, expenses
         </select>
       </div>
 
+      <div className="bg-white p-6 rounded border border-slate-300 shadow-sm">
+        <div className="flex justify-between items-center mb-6">
+           <h3 className="text-sm font-bold text-slate-600">Breakdown</h3>
+           <div className="flex items-center space-x-2">
+             <select
+               value={breakdownSource}
+               onChange={(e) => {
+                 const source = e.target.value as 'sales' | 'purchases' | 'inventory';
+                 setBreakdownSource(source);
+                 if (!breakdownDimensions[source].includes(breakdownDimension)) setBreakdownDimension('vendor');
+               }}
+               className="p-2 border rounded text-sm"
+             >
+               <option value="sales">Sales</option>
+               <option value="purchases">Purchases</option>
+               <option value="inventory">Stock Received</option>
+             </select>
+             <select value={breakdownDimension} onChange={(e) => setBreakdownDimension(e.target.value)} className="p-2 border rounded text-sm">
+               {breakdownDimensions[breakdownSource].map(d => (
+                 <option key={d} value={d}>By {d.replace('_', ' ')}</option>
+               ))}
+             </select>
+           </div>
+        </div>
+        <table className="w-full text-left text-[11px]">
+          <thead className="bg-slate-50 border-b border-slate-200">
+            <tr>
+              <th className="p-2 font-bold text-slate-500 uppercase">{breakdownDimension.replace('_', ' ')}</th>
+              {(breakdown?.measures || []).map((m: string) => (
+                <th key={m} className="p-2 font-bold text-slate-500 text-right uppercase">{m}</th>
+              ))}
+            </tr>
+          </thead>
+          <tbody>
+            {!breakdown || breakdown.groups.length === 0 ? (
+              <tr>
+                <td colSpan={6} className="p-10 text-center text-slate-400 italic">No data for this period</td>
+              </tr>
+            ) : (
+              breakdown.groups.map((group: any, idx: number) => (
+                <tr key={idx} className="border-b border-slate-100 hover:bg-slate-50">
+                  <td className="p-2">{breakdownLabel(group)}</td>
+                  {breakdown.measures.map((m: string) => (
+                    <td key={m} className="p-2 text-right">{Number(group[m]).toLocaleString()}</td>
+                  ))}
+                </tr>
+              ))
+            )}
+          </tbody>
+          {breakdown && breakdown.groups.length > 0 && (
+            <tfoot>
+              <tr className="font-bold bg-slate-50">
+                <td className="p-2">Total{breakdown.count > breakdown.groups.length ? ` (${breakdown.groups.length} of ${breakdown.count} groups shown)` : ''}</td>
+                {breakdown.measures.map((m: string) => (
+                  <td key={m} className="p-2 text-right">{Number(breakdown.totals[m]).toLocaleString()}</td>
+                ))}
+              </tr>
+            </tfoot>
+          )}
+        </table>
+      </div>
+
       <div className="bg-white p-6 rounded border border-slate-300 shadow-sm">
         <div className="flex justify-between items-center mb-6">
            <h3 className="text-sm font-bold text-slate-600">Cash Activity Log</h3>
@@ -14,9 +14,9 @@ export const INITIAL_CUSTOMERS: Customer[] = [
   { id: 'c3', name: 'Ahmad Baig', contact: '0345-9988776', balance: 27330, logs: [] },
 ];
 
-// Added missing required properties 'receivedDate' and 'isBilled' to satisfy InventoryItem interface
+// Added missing required properties 'receivedDate', 'isBilled' and 'availableMeters' to satisfy InventoryItem interface
 export const INITIAL_INVENTORY: InventoryItem[] = [
-  { id: 'i1', lotNumber: 'LOT-1021', type: 'Cotton Twill', meters: 450, unitPrice: 120, vendorId: 'v1', receivedDate: '2024-01-01', isBilled: true },
-  { id: 'i2', lotNumber: 'LOT-1022', type: 'Denim Heavy', meters: 200, unitPrice: 350, vendorId: 'v1', receivedDate: '2024-01-01', isBilled: true },
-  { id: 'i3', lotNumber: 'LOT-2005', type: 'Silk Smooth', meters: 85, unitPrice: 850, vendorId: 'v2', receivedDate: '2024-01-01', isBilled: true },
+  { id: 'i1', lotNumber: 'LOT-1021', type: 'Cotton Twill', meters: 450, unitPrice: 120, vendorId: 'v1', receivedDate: '2024-01-01', isBilled: true, availableMeters: 450 },
+  { id: 'i2', lotNumber: 'LOT-1022', type: 'Denim Heavy', meters: 200, unitPrice: 350, vendorId: 'v1', receivedDate: '2024-01-01', isBilled: true, availableMeters: 200 },
+  { id: 'i3', lotNumber: 'LOT-2005', type: 'Silk Smooth', meters: 85, unitPrice: 850, vendorId: 'v2', receivedDate: '2024-01-01', isBilled: true, availableMeters: 85 },
 ];
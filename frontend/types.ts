@@ -45,6 +45,7 @@ export interface InventoryItem {
   vendorId: string;
   receivedDate: string;
   isBilled: boolean;
+  availableMeters: number;
 }
 
 export interface Transaction {